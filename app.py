@@ -1,18 +1,118 @@
+import asyncio
+import time
+from datetime import datetime
+
 import chainlit as cl
 from dotenv import load_dotenv
-from google.adk.runners import InMemoryRunner
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import InMemoryRunner, Runner
 from google.genai import types
 from data_agent.agent import root_agent
+from data_agent.answer_cache import AnswerCache, TurnCapture
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.executor import get_tool_executor
+from data_agent.session_store import SessionStore
 
 # 1. Load environment variables
 load_dotenv()
 
 # 2. Instantiate the runner globally so it's created only once.
-# This runner holds the agent's state and manages sessions.
-runner = InMemoryRunner(
-    agent=root_agent,
-    app_name='data_agent_app',  # A name for your application
-)
+# This runner holds the agent's state and manages sessions. Sessions are kept in the session
+# store, which bounds their memory (see the `session_store` block of data_sources.yaml).
+session_store_settings = DataSourceManager().get_session_store_settings()
+session_store = SessionStore.from_settings(session_store_settings) if session_store_settings['enabled'] else None
+if session_store is not None:
+    runner = Runner(
+        agent=root_agent,
+        app_name='data_agent_app',  # A name for your application
+        session_service=session_store,
+        artifact_service=InMemoryArtifactService(),
+        memory_service=InMemoryMemoryService(),
+    )
+else:
+    runner = InMemoryRunner(
+        agent=root_agent,
+        app_name='data_agent_app',
+    )
+
+# 3. The answer cache: paraphrases of earlier questions re-run the stored query
+# instead of going through the planner and query agent again.
+answer_cache_settings = DataSourceManager().get_answer_cache_settings()
+answer_cache = AnswerCache.from_settings(answer_cache_settings) if answer_cache_settings['enabled'] else None
+
+
+def format_cached_answer(entry: dict, result: str) -> str:
+    """The reply for a cache hit: the re-run query's fresh result, and the earlier answer for context."""
+    args = entry['args']
+    answered_at = datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d %H:%M')
+    return (
+        f"This is close to an earlier question (\"{entry['question']}\", similarity {entry['similarity']:.2f}), "
+        f"so I re-ran its query on the current data.\n\n"
+        f"Source: {entry['source']}\n```sql\n{args['query']}\n```\n{result}\n\n"
+        f"Earlier answer ({answered_at}):\n{entry['answer']}"
+    )
+
+
+async def answer_from_cache(session, question: str, content: types.Content):
+    """Returns the reply for a cached paraphrase of `question`, or None to run the agents."""
+    if answer_cache is None or (answer_cache.first_turn_only and session.events):
+        return None
+    entry = answer_cache.lookup(question)
+    if entry is None:
+        return None
+    start = time.perf_counter()
+    result = await answer_cache.replay(entry)
+    if result.startswith("Error"):
+        # The stored query no longer works (e.g. the schema changed); answer it from scratch.
+        answer_cache.forget(entry['id'])
+        return None
+    replay_ms = (time.perf_counter() - start) * 1000
+    answer_cache.record_hit(entry, replay_ms)
+    stats = answer_cache.stats()
+    print(f"Answer cache hit (similarity {entry['similarity']:.2f}): replayed in {replay_ms:,.0f} ms "
+          f"instead of ~{entry['turn_ms'] or 0:,.0f} ms. Hit rate {stats['hit_rate']:.0%}, "
+          f"{stats['saved_ms'] / 1000:,.1f}s saved since start.")
+    reply = format_cached_answer(entry, result)
+    # Keep the session history complete, so follow-up questions have the context.
+    for author, text_content in (('user', content),
+                                 (root_agent.name, types.Content(role='model', parts=[types.Part(text=reply)]))):
+        await runner.session_service.append_event(
+            session, Event(invocation_id=f"cache-{entry['id']}", author=author, content=text_content))
+    return reply
+
+@cl.on_app_startup
+async def start_up():
+    """
+    Runs when the server starts: watches data_sources.yaml for changes, and connects to every
+    data source and loads its schema or API spec concurrently, so the first question doesn't
+    pay for it.
+    """
+    manager = DataSourceManager()
+    if manager.get_reload_settings()['enabled']:
+        manager.watch_config()
+    if not manager.get_warm_up_settings()['enabled']:
+        return
+    start = time.perf_counter()
+    readiness = await asyncio.get_running_loop().run_in_executor(get_tool_executor(), manager.warm_up)
+    print(f"Data sources warmed up in {(time.perf_counter() - start) * 1000:,.0f} ms:")
+    for name, status in readiness.items():
+        state = {True: "ready", False: "FAILED", None: "pending"}[status['ok']]
+        took = f" in {status['ms']:,.0f} ms" if status['ms'] is not None else ""
+        print(f"  {name}: {state}{took} ({status['detail']})")
+
+
+@cl.on_app_shutdown
+async def shut_down():
+    DataSourceManager().stop_watching_config()
+    DataSourceManager().close_pools()
+    DataSourceManager().flow_runner.close()
+    if answer_cache is not None:
+        answer_cache.close()
+    if session_store is not None:
+        session_store.close()
+
 
 @cl.on_chat_start
 async def start():
@@ -46,19 +146,49 @@ async def main(message: cl.Message):
     msg = cl.Message(content="")
     await msg.send()
 
-    # 4. Run the agent and stream the response.
+    # 4. Answer a paraphrase of an earlier question from the answer cache.
+    session = await runner.session_service.get_session(
+        app_name='data_agent_app', user_id='user', session_id=session_id
+    )
+    first_turn = not session.events
+    reply = await answer_from_cache(session, message.content, content)
+    if reply is not None:
+        await msg.stream_token(reply)
+        await msg.update()
+        return
+
+    # 5. Run the agent and stream the response.
     # The runner.run() method is an async generator that yields events.
     response_tokens = []
+    turn = TurnCapture(root_agent.name)
+    start = time.perf_counter()
     async for event in runner.run_async(
         user_id='user',
         session_id=session_id,
         new_message=content,
     ):
+        turn.add(event)
         # Check for text content in the event and stream it.
         if event.content and event.content.parts and event.content.parts[0].text:
             token = event.content.parts[0].text
             await msg.stream_token(token)
             response_tokens.append(token)
 
-    # 5. Finalize the message stream.
+    # 6. Remember answers that a stored query can reproduce.
+    if answer_cache is not None and turn.cacheable() and (first_turn or not answer_cache.first_turn_only):
+        name, args = turn.call
+        answer_cache.store(message.content, turn.source(), "\n".join(turn.plan), name, args, turn.answer,
+                           (time.perf_counter() - start) * 1000)
+
+    # 7. Report how large the session's history (what the model is sent per call) has grown.
+    if session_store is not None:
+        session_stats = session_store.session_stats('data_agent_app', 'user', session_id)
+        stats = session_store.stats()
+        if session_stats['in_memory']:
+            print(f"Session {session_id[:8]}: {session_stats['events']} events, "
+                  f"{session_stats['history_bytes'] / 1024:,.0f} KB of history. Store: "
+                  f"{stats['sessions_in_memory']} sessions in memory ({stats['memory_bytes'] / 1024:,.0f} KB), "
+                  f"{stats['compacted_outputs']} tool outputs compacted ({stats['compacted_bytes'] / 1024:,.0f} KB).")
+
+    # 8. Finalize the message stream.
     await msg.update()
\ No newline at end of file
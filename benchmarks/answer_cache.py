@@ -0,0 +1,130 @@
+"""
+Measures the answer cache: how often paraphrases of a cached question are answered from it,
+how often a different question is wrongly matched, and how long lookups and replays take.
+
+Each group below holds one question that is answered (and cached) and paraphrases that should
+reuse its query; the near misses differ in a number, a name or an ordering word and must not.
+Replays run against the local SQLite bank database.
+
+    python -m benchmarks.answer_cache [--filler 5000] [--min-similarity 0.85]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from data_agent.answer_cache import ANSWER_CACHE_DEFAULTS, AnswerCache
+
+SOURCE = "LOCAL_BANK_DB"
+GROUPS = [
+    {
+        "question": "Who are the 3 customers that spent the most?",
+        "query": "SELECT c.full_name, SUM(t.amount) AS spent FROM customers c JOIN transactions t "
+                 "ON t.customer_id = c.customer_id WHERE t.type = 'debit' GROUP BY c.customer_id ORDER BY spent DESC LIMIT 3",
+        "paraphrases": ["Which 3 customers spent the most money?", "Who are the 3 customers who spent the most?"],
+        "near_misses": ["Who are the 5 customers that spent the most?", "Who are the 3 customers that spent the least?"],
+    },
+    {
+        "question": "What is the total amount per transaction type?",
+        "query": "SELECT type, SUM(amount) AS total FROM transactions GROUP BY type",
+        "paraphrases": ["What's the total amount by transaction type?", "Total amount for each type of transaction"],
+        "near_misses": ["What is the average amount per transaction type?"],
+    },
+    {
+        "question": "List all debit transactions of Jane Doe",
+        "query": "SELECT t.* FROM transactions t JOIN customers c ON c.customer_id = t.customer_id "
+                 "WHERE c.full_name = 'Jane Doe' AND t.type = 'debit'",
+        "paraphrases": ["Show all of Jane Doe's debit transactions", "List the debit transactions of Jane Doe"],
+        "near_misses": ["List all debit transactions of John Smith", "List all credit transactions of Jane Doe"],
+    },
+    {
+        "question": "How many transactions does each customer have?",
+        "query": "SELECT customer_id, COUNT(*) FROM transactions GROUP BY customer_id",
+        "paraphrases": ["How many transactions does every customer have?", "Number of transactions for each customer"],
+        "near_misses": ["How many customers are there?"],
+    },
+    {
+        "question": "Show the average transaction amount per customer",
+        "query": "SELECT customer_id, AVG(amount) FROM transactions GROUP BY customer_id",
+        "paraphrases": ["Average transaction amount for each customer", "What is the average transaction amount per customer?"],
+        "near_misses": ["Show the maximum transaction amount per customer"],
+    },
+]
+FILLER_TOPICS = ["loans", "branches", "cards", "invoices", "merchants", "tickets", "suppliers", "campaigns"]
+FILLER_METRICS = ["count", "sum of balance", "number of open items", "share of late payments", "median value"]
+
+
+def fill(cache: AnswerCache, count: int):
+    """Adds unrelated cached questions, so lookups search an index of realistic size."""
+    for i in range(count):
+        topic, metric = FILLER_TOPICS[i % len(FILLER_TOPICS)], FILLER_METRICS[i % len(FILLER_METRICS)]
+        cache.store(f"What is the {metric} of {topic} in region {i}?", SOURCE, "", "run_sql_query",
+                    {"data_source_name": SOURCE, "query": f"SELECT {i}"}, "", 0.0)
+
+
+async def run(filler: int, min_similarity: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnswerCache(**{**ANSWER_CACHE_DEFAULTS, "path": os.path.join(tmp, "answers.db"),
+                               "min_similarity": min_similarity, "max_entries": filler + len(GROUPS)})
+        start = time.perf_counter()
+        fill(cache, filler)
+        print(f"Stored {filler:,} filler questions in {time.perf_counter() - start:.2f}s")
+        ids = {}
+        for group in GROUPS:
+            cache.store(group["question"], SOURCE, "", "run_sql_query",
+                        {"data_source_name": SOURCE, "query": group["query"]}, "", 0.0)
+            ids[group["question"]] = cache.lookup(group["question"])["id"]
+
+        hits, misses, wrong, rejected, false_hits = 0, [], 0, 0, []
+        lookup_ms, replay_ms = [], []
+        for group in GROUPS:
+            for paraphrase in group["paraphrases"]:
+                start = time.perf_counter()
+                entry = cache.lookup(paraphrase)
+                lookup_ms.append((time.perf_counter() - start) * 1000)
+                if entry is None:
+                    misses.append(paraphrase)
+                    continue
+                if entry["id"] != ids[group["question"]]:
+                    wrong += 1
+                    continue
+                hits += 1
+                start = time.perf_counter()
+                result = await cache.replay(entry)
+                replay_ms.append((time.perf_counter() - start) * 1000)
+                if result.startswith("Error"):
+                    print(f"Replay failed for '{paraphrase}': {result}")
+            for near_miss in group["near_misses"]:
+                entry = cache.lookup(near_miss)
+                if entry is None:
+                    rejected += 1
+                else:
+                    false_hits.append(f"{near_miss!r} -> {entry['question']!r} ({entry['similarity']:.2f})")
+        cache.close()
+
+    paraphrases = sum(len(g["paraphrases"]) for g in GROUPS)
+    near_misses = sum(len(g["near_misses"]) for g in GROUPS)
+    print(f"Paraphrases answered from the cache: {hits}/{paraphrases} (wrong entry: {wrong})")
+    for question in misses:
+        print(f"  missed: {question}")
+    print(f"Near misses correctly not answered: {rejected}/{near_misses}")
+    for line in false_hits:
+        print(f"  false hit: {line}")
+    print(f"Lookup: p50 {statistics.median(lookup_ms):.2f} ms, max {max(lookup_ms):.2f} ms "
+          f"over {filler + len(GROUPS):,} entries")
+    if replay_ms:
+        print(f"Replay (query on current data): p50 {statistics.median(replay_ms):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filler", type=int, default=5000, help="Unrelated cached questions.")
+    parser.add_argument("--min-similarity", type=float, default=ANSWER_CACHE_DEFAULTS['min_similarity'])
+    args = parser.parse_args()
+    asyncio.run(run(args.filler, args.min_similarity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Fan-out API calls: N `run_api_query` calls vs. one `run_api_batch` call.
+
+Scores N customer names against the mock credit API, once sequentially (what the query agent
+does today: one tool call, and one LLM round trip, per customer) and once as a single batch.
+The tool time is measured; the end-to-end estimate adds `--round-trip-ms` per LLM round trip
+(one per tool call). Against the local mock API on a single core the requests themselves are
+CPU-bound, so the concurrency gain shows up with real network latency.
+
+Start the mock API first (`python mock-api.py`), then:
+    python -m benchmarks.api_batch [--names 300] [--concurrency 8] [--rate-limit 0] [--round-trip-ms 800]
+"""
+import argparse
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.sub_agents.query_agent.tools import run_api_batch, run_api_query
+
+SOURCE_NAME = "BENCH_BATCH_API"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requests per second per host (0 = unlimited).")
+    parser.add_argument("--round-trip-ms", type=float, default=800, help="Assumed LLM latency per tool call.")
+    parser.add_argument("--api", default="http://127.0.0.1:8001")
+    args = parser.parse_args()
+
+    manager = DataSourceManager()
+    # cache_ttl 0 so that both modes really call the API.
+    manager.register_source({
+        "name": SOURCE_NAME, "type": "openapi", "description": "benchmark",
+        "spec_url": f"{args.api}/openapi.json", "base_url": args.api, "cache_ttl": 0,
+        "http": {"rate_limit": args.rate_limit or None, "pool_maxsize": max(10, args.concurrency)},
+        "batch": {"max_concurrency": args.concurrency, "max_requests": args.names},
+    })
+    endpoints = [f"/credit-score/?customer_name=Customer {i}" for i in range(args.names)]
+
+    start = time.perf_counter()
+    sequential = [run_api_query(SOURCE_NAME, endpoint) for endpoint in endpoints]
+    sequential_s = time.perf_counter() - start
+    errors = sum(1 for result in sequential if result.startswith("Error"))
+
+    start = time.perf_counter()
+    batch = run_api_batch(SOURCE_NAME, [{"endpoint": endpoint} for endpoint in endpoints], args.concurrency)
+    batch_s = time.perf_counter() - start
+
+    round_trip_s = args.round_trip_ms / 1000
+    sequential_total = sequential_s + args.names * round_trip_s
+    batch_total = batch_s + round_trip_s
+
+    print(f"{args.names} names, concurrency {args.concurrency}, {args.round_trip_ms:.0f} ms per LLM round trip\n")
+    print(f"{'mode':<20} {'tool calls':>10} {'tool s':>9} {'calls/s':>9} {'end-to-end s':>13}")
+    print(f"{'run_api_query x N':<20} {args.names:>10} {sequential_s:>9.2f} {args.names / sequential_s:>9.1f} "
+          f"{sequential_total:>13.1f}")
+    print(f"{'run_api_batch':<20} {1:>10} {batch_s:>9.2f} {args.names / batch_s:>9.1f} {batch_total:>13.1f}")
+    print(f"\nTool time speedup: {sequential_s / batch_s:.1f}x, end-to-end: {sequential_total / batch_total:.0f}x "
+          f"({args.names - 1} fewer LLM round trips), {errors} sequential errors")
+    print(f"Batch response: {batch.splitlines()[0]} ({len(batch)} chars)")
+    print(f"HttpClient stats: {manager.get_http_stats()[SOURCE_NAME]}")
+    manager.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load test: N concurrent chat sessions sharing one event loop.
+
+Each simulated session makes the tool calls of a typical turn (a slow SQL query against the
+local SQLite database and a call to the mock credit API), once with the blocking tools called
+directly on the event loop (what ADK does for plain functions) and once through `async_tool`.
+A heartbeat task stands in for token streaming and records how long the loop was stalled.
+
+Start the mock API first (`python mock-api.py`), then:
+    python -m benchmarks.concurrent_sessions [--sessions 20] [--turns 3]
+
+The default SQL query is CPU-bound SQLite work, which shows the event-loop stall but cannot
+run in parallel on a single core. To measure throughput for I/O-bound queries, point it at a
+configured network database, e.g.:
+    python -m benchmarks.concurrent_sessions --source BANK --query "SELECT pg_sleep(0.05), {session}"
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.executor import async_tool
+from data_agent.sub_agents.query_agent.tools import run_api_query, run_sql_query
+
+DB_SOURCE = "BENCH_LOCAL_DB"
+API_SOURCE = "BENCH_CREDIT_API"
+SLOW_QUERY = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < {n}) "
+    "SELECT count(*), {session} AS session FROM c"
+)
+HEARTBEAT_INTERVAL = 0.01
+
+
+def register_sources(db_file: str, api_base_url: str):
+    manager = DataSourceManager()
+    # cache_ttl 0 so that every call really hits the database/API.
+    manager.register_source({"name": DB_SOURCE, "type": "sqlite", "description": "benchmark",
+                             "db_file": db_file, "cache_ttl": 0, "pool": {"max_size": 32}})
+    manager.register_source({"name": API_SOURCE, "type": "openapi", "description": "benchmark",
+                             "spec_url": f"{api_base_url}/openapi.json", "base_url": api_base_url, "cache_ttl": 0})
+
+
+async def session(session_id: int, turns: int, source: str, query: str, sql_tool, api_tool, use_async: bool):
+    for turn in range(turns):
+        sql = query.format(session=session_id)
+        endpoint = f"/credit-score/?customer_name=Customer {session_id}-{turn}"
+        if use_async:
+            await sql_tool(source, sql)
+            await api_tool(API_SOURCE, endpoint)
+        else:
+            sql_tool(source, sql)
+            api_tool(API_SOURCE, endpoint)
+        await asyncio.sleep(0)
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - start - HEARTBEAT_INTERVAL)
+
+
+async def run_mode(use_async: bool, sessions: int, turns: int, source: str, query: str) -> dict:
+    sql_tool, api_tool = (async_tool(run_sql_query), async_tool(run_api_query)) if use_async else (run_sql_query, run_api_query)
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i, turns, source, query, sql_tool, api_tool, use_async) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return {
+        "elapsed_s": elapsed,
+        "turns_per_s": sessions * turns / elapsed,
+        "max_stall_ms": max(lags, default=0) * 1000,
+        "p95_stall_ms": (statistics.quantiles(lags, n=20)[-1] * 1000) if len(lags) >= 20 else max(lags, default=0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=200000, help="Size of the default slow recursive query.")
+    parser.add_argument("--db-file", default="mydatabase.db")
+    parser.add_argument("--source", default=DB_SOURCE, help="Data source for the SQL calls (default: --db-file).")
+    parser.add_argument("--query", help="SQL to run per turn; '{session}' is replaced by the session number.")
+    parser.add_argument("--api", default="http://127.0.0.1:8001")
+    args = parser.parse_args()
+
+    register_sources(args.db_file, args.api)
+    query = args.query or SLOW_QUERY.format(n=args.rows, session="{session}")
+    print(f"{args.sessions} sessions x {args.turns} turns\n")
+    print(f"{'mode':<8} {'elapsed s':>10} {'turns/s':>10} {'p95 stall ms':>14} {'max stall ms':>14}")
+    for use_async in (False, True):
+        result = asyncio.run(run_mode(use_async, args.sessions, args.turns, args.source, query))
+        print(f"{'async' if use_async else 'sync':<8} {result['elapsed_s']:>10.2f} {result['turns_per_s']:>10.1f} "
+              f"{result['p95_stall_ms']:>14.1f} {result['max_stall_ms']:>14.1f}")
+    DataSourceManager().close_pools()
+
+
+if __name__ == "__main__":
+    main()
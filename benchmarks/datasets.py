@@ -0,0 +1,113 @@
+"""
+Scaled versions of the bank database in `sql/schema.sql` for benchmarks.
+
+Generates `customers` and `transactions` with 10^3 to 10^7 transactions (one customer per
+ten transactions), deterministically from a seed, optionally with many extra tables (the
+many-table variant used for schema pruning). SQLite files are cached under
+`benchmarks/data`; Postgres tables are loaded with COPY into a configured source.
+
+    python -m benchmarks.datasets --rows 1000 100000 1000000 [--tables 240]
+    python -m benchmarks.datasets --rows 100000 --postgres BANK   # replaces its customers/transactions
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from scripts.bank_data import copy_postgres, format_stats, insert_sqlite, load_postgres, load_sqlite
+
+from .schema_pruning import ASPECTS, DOMAINS
+
+DATA_DIR = os.path.join("benchmarks", "data")
+EXTRA_TABLE_ROWS = 20
+
+
+def extra_tables(count: int, seed: int = 7):
+    """Yields `(name, create_statement, columns, rows)` for the many-table variant."""
+    rng = random.Random(seed + 2)
+    names = [(domain, aspect) for domain in DOMAINS for aspect in ASPECTS][:count]
+    for domain, aspect in names:
+        name = f"{domain}_{aspect}"
+        create = (f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {domain}_id INTEGER, {aspect}_code TEXT, "
+                  f"amount NUMERIC, recorded_at TEXT)")
+        rows = [(i, rng.randint(1, 1000), f"{aspect}-{i}", round(rng.uniform(1, 999), 2), "2025-07-02")
+                for i in range(1, EXTRA_TABLE_ROWS + 1)]
+        yield name, create, ("id", f"{domain}_id", f"{aspect}_code", "amount", "recorded_at"), rows
+
+
+def sqlite_path(transactions: int, tables: int = 0, seed: int = 7) -> str:
+    name = f"bank_{transactions}" + (f"_{tables}tables" if tables else "") + (f"_seed{seed}" if seed != 7 else "")
+    return os.path.join(DATA_DIR, f"{name}.db")
+
+
+def build_sqlite(path: str, transactions: int, tables: int = 0, seed: int = 7) -> list:
+    """Writes a scaled bank database to `path` (built under a temporary name, then renamed)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    try:
+        # A throwaway file: no rollback journal or fsyncs needed while loading.
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        with conn:
+            stats = load_sqlite(conn, transactions, seed)
+            for name, create, columns, rows in extra_tables(tables, seed):
+                conn.execute(create)
+                insert_sqlite(conn, name, columns, rows)
+    finally:
+        conn.close()
+    os.replace(partial, path)
+    return stats
+
+
+def ensure_sqlite(transactions: int, tables: int = 0, seed: int = 7) -> str:
+    """Returns the cached SQLite dataset, building it first if needed."""
+    path = sqlite_path(transactions, tables, seed)
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        stats = build_sqlite(path, transactions, tables, seed)
+        print(f"Built {path} ({transactions:,} transactions, {tables} extra tables) "
+              f"in {time.perf_counter() - start:.1f}s\n{format_stats(stats)}")
+    return path
+
+
+def build_postgres(source_name: str, transactions: int, tables: int = 0, seed: int = 7) -> list:
+    """Replaces the bank tables (and extra tables) of a configured Postgres source with a scaled dataset."""
+    db = DataSourceManager().get_db_connection(source_name)
+    db.connect()
+    try:
+        stats = load_postgres(db.conn, transactions, seed)
+        with db.conn.cursor() as cur:
+            for name, create, columns, rows in extra_tables(tables, seed):
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+                cur.execute(create)
+                copy_postgres(cur, name, columns, rows)
+        db.conn.commit()
+        return stats
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000], help="Transactions per dataset.")
+    parser.add_argument("--tables", type=int, default=0, help="Extra tables for the many-table variant.")
+    parser.add_argument("--postgres", help="Also load the dataset into this configured Postgres source.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for transactions in args.rows:
+        ensure_sqlite(transactions, args.tables, args.seed)
+        if args.postgres:
+            start = time.perf_counter()
+            stats = build_postgres(args.postgres, transactions, args.tables, args.seed)
+            print(f"Loaded {transactions:,} transactions into {args.postgres} in {time.perf_counter() - start:.1f}s\n"
+                  f"{format_stats(stats)}")
+
+
+if __name__ == "__main__":
+    main()
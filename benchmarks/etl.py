@@ -0,0 +1,95 @@
+"""
+Nightly loads of the transactions table: a full reload vs incremental, watermark-based syncs.
+
+Copies `transactions` of a scaled bank database (`benchmarks.datasets`) into a target table,
+then adds `--new` transactions and compares the time to bring the target up to date with a
+full reload and with `etl.incremental_sync`. The target is a SQLite file, or a table in a
+Postgres source (loaded with COPY).
+
+    python -m benchmarks.etl [--rows 1000000] [--new 10000] [--postgres BANK]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from etl import incremental_sync
+
+from .datasets import ensure_sqlite
+
+TARGET_TABLE = "etl_bench_transactions"
+COLUMNS = "transaction_id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL, amount NUMERIC NOT NULL, " \
+          "type TEXT NOT NULL, description TEXT NOT NULL, transaction_date TEXT"
+
+
+def reset_target(conn):
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TARGET_TABLE}")
+    cur.execute(f"CREATE TABLE {TARGET_TABLE} ({COLUMNS})")
+    conn.commit()
+
+
+def add_transactions(path: str, count: int, seed: int = 11):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    with conn:
+        customers = conn.execute("SELECT max(customer_id) FROM customers").fetchone()[0]
+        conn.executemany("INSERT INTO transactions (customer_id, amount, type, description) VALUES (?, ?, ?, ?)",
+                         [(rng.randint(1, customers), round(rng.uniform(1, 999), 2), rng.choice(("debit", "credit")),
+                           "benchmark transaction") for _ in range(count)])
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000, help="Transactions in the source.")
+    parser.add_argument("--new", type=int, default=10000, help="Transactions added before the second load.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--postgres", help="Load into a table of this Postgres source instead of a SQLite file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.db")
+        shutil.copy(ensure_sqlite(args.rows), source)
+        if args.postgres:
+            target = DataSourceManager().get_db_connection(args.postgres).conn
+        else:
+            target = sqlite3.connect(os.path.join(directory, "target.db"))
+        settings = {"state_path": os.path.join(directory, "etl_state.db"), "batch_size": args.batch_size,
+                    "source_name": "BENCH_SOURCE"}
+
+        def sync(**extra):
+            source_conn = sqlite3.connect(source)
+            try:
+                return incremental_sync("bench", source_conn, target, "transactions", "transaction_id",
+                                        ["transaction_id"], target_table=TARGET_TABLE, **settings, **extra)
+            finally:
+                source_conn.close()
+
+        reset_target(target)
+        initial = sync()
+        add_transactions(source, args.new)
+        start = time.perf_counter()
+        reset_target(target)
+        full = sync(full_refresh=True)
+        full_seconds = time.perf_counter() - start
+        add_transactions(source, args.new, seed=12)
+        incremental = sync()
+        if args.postgres:
+            target.cursor().execute(f"DROP TABLE {TARGET_TABLE}")
+            target.commit()
+        target.close()
+
+    print(f"\n{args.rows:,} transactions, {args.new:,} new per run, target: {args.postgres or 'sqlite'}")
+    print(f"{'load':<24} {'rows':>12} {'seconds':>9}")
+    print(f"{'initial load':<24} {initial['rows']:>12,} {initial['seconds']:>9.2f}")
+    print(f"{'full reload':<24} {full['rows']:>12,} {full_seconds:>9.2f}")
+    print(f"{'incremental':<24} {incremental['rows']:>12,} {incremental['seconds']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Running saved flows: a cold `python flow.py` per run (the old run_prefect_flow) vs the flow runner.
+
+Writes a small flow that imports the preload modules (Prefect, by default) and works for
+`--work` seconds, then reports the end-to-end time per run with a cold interpreter and with
+the runner's warm interpreters, how long the calling tool is blocked, and the wall time of
+a burst of runs on `--workers` workers. Runs are `--gap` seconds apart (by default, one cold
+start), the time a replacement interpreter has to get ready; back-to-back runs use
+interpreters that are still importing.
+
+    python -m benchmarks.flow_runner [--runs 10] [--work 0.5] [--workers 2] [--gap SECONDS] [--preload prefect dotenv]
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from data_agent.flow_runner import FLOW_RUNNER_DEFAULTS, FlowRunner
+
+FLOW = """
+import time
+{imports}
+print("working")
+time.sleep({work})
+print("done")
+"""
+
+
+def report(label: str, latencies: list):
+    print(f"{label:<44} {statistics.mean(latencies):>9.0f} {statistics.median(latencies):>9.0f} {max(latencies):>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--work", type=float, default=0.5, help="Seconds the flow works.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--gap", type=float, help="Seconds between runs (default: one cold start).")
+    parser.add_argument("--preload", nargs="*", default=FLOW_RUNNER_DEFAULTS["preload"])
+    args = parser.parse_args()
+
+    preload = [name for name in args.preload if importlib.util.find_spec(name.split(".")[0])]
+    missing = sorted(set(args.preload) - set(preload))
+    print(f"Flow imports: {', '.join(preload) or 'nothing'}" + (f" (not installed: {', '.join(missing)})" if missing else ""))
+    with tempfile.TemporaryDirectory() as directory:
+        flow_dir = os.path.join(directory, "flows")
+        os.makedirs(flow_dir)
+        with open(os.path.join(flow_dir, "bench.py"), "w") as f:
+            f.write(FLOW.format(imports="\n".join(f"import {name}" for name in preload), work=args.work))
+
+        cold = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(flow_dir, "bench.py")], capture_output=True, check=True)
+            cold.append((time.perf_counter() - start) * 1000)
+
+        runner = FlowRunner(**{**FLOW_RUNNER_DEFAULTS, "flow_dir": flow_dir, "log_dir": os.path.join(directory, "logs"),
+                               "max_workers": 1, "warm_interpreters": 1, "preload": preload})
+        gap = max(cold) / 1000 if args.gap is None else args.gap
+        runner.warm()
+        warm, blocked = [], []
+        for _ in range(args.runs):
+            time.sleep(gap)
+            start = time.perf_counter()
+            job = runner.submit("bench")
+            blocked.append((time.perf_counter() - start) * 1000)
+            runner.wait(job.id, 600)
+            warm.append((time.perf_counter() - start) * 1000)
+            assert job.status == "succeeded", runner.tail(job.id)
+        stats = runner.stats()
+        runner.close()
+
+        print(f"{'ms per run':<44} {'mean':>9} {'p50':>9} {'max':>9}")
+        report("cold interpreter (subprocess.run)", cold)
+        report("flow runner, warm interpreter", warm)
+        report("tool call blocked: cold run", cold)
+        report("tool call blocked: run_prefect_flow submit", blocked)
+        print(f"warm starts {stats['warm_starts']}, cold starts {stats['cold_starts']}")
+
+        runner = FlowRunner(**{**FLOW_RUNNER_DEFAULTS, "flow_dir": flow_dir, "log_dir": os.path.join(directory, "logs"),
+                               "max_workers": args.workers, "max_per_flow": args.workers,
+                               "warm_interpreters": args.workers, "preload": preload})
+        runner.warm()
+        time.sleep(gap)
+        start = time.perf_counter()
+        jobs = [runner.submit("bench") for _ in range(args.runs)]
+        for job in jobs:
+            runner.wait(job.id, 600)
+        burst = time.perf_counter() - start
+        runner.close()
+        print(f"{args.runs} runs submitted at once on {args.workers} workers: {burst:,.1f}s "
+              f"(one after another, cold: {sum(cold) / 1000:,.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency of OpenAPI calls: bare `requests` calls vs. the pooled per-source HttpClient.
+
+For each mode it fetches the spec and calls the credit-score endpoint N times, the way the
+planner (`get_api_schema`) and query agent (`run_api_query`) do, and reports per-call latency.
+
+Start the mock API first (`python mock-api.py`), then:
+    python -m benchmarks.http_client [--calls 200]
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from data_agent.data_source_manager import DataSourceManager
+
+SOURCE_NAME = "BENCH_HTTP_API"
+
+
+def measure(func, calls: int) -> list:
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else max(latencies)
+    print(f"{label:<34} {statistics.mean(latencies):>9.2f} {statistics.median(latencies):>9.2f} {p95:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--api", default="http://127.0.0.1:8001")
+    args = parser.parse_args()
+
+    spec_url = f"{args.api}/openapi.json"
+    endpoint = f"{args.api}/credit-score/"
+    manager = DataSourceManager()
+    manager.register_source({"name": SOURCE_NAME, "type": "openapi", "description": "benchmark",
+                             "spec_url": spec_url, "base_url": args.api, "cache_ttl": 0})
+    client = manager.get_http_client(SOURCE_NAME)
+
+    def bare_spec(_):
+        response = requests.get(spec_url)
+        response.raise_for_status()
+        return response.text
+
+    def bare_call(i):
+        response = requests.request("GET", endpoint, params={"customer_name": f"Customer {i}"})
+        response.raise_for_status()
+        return response.text
+
+    def pooled_spec(_):
+        return client.get_spec(spec_url).parsed
+
+    def pooled_call(i):
+        response = client.request("GET", endpoint, params={"customer_name": f"Customer {i}"})
+        response.raise_for_status()
+        return response.text
+
+    print(f"{args.calls} calls per row, latency in ms\n")
+    print(f"{'':<34} {'mean':>9} {'median':>9} {'p95':>9}")
+    report("spec: requests.get", measure(bare_spec, args.calls))
+    report("spec: HttpClient.get_spec (cached)", measure(pooled_spec, args.calls))
+    report("call: requests.request", measure(bare_call, args.calls))
+    report("call: HttpClient.request", measure(pooled_call, args.calls))
+    print(f"\nHttpClient stats: {client.stats()}")
+    manager.close_pools()
+
+
+if __name__ == "__main__":
+    main()
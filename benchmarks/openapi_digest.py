@@ -0,0 +1,94 @@
+"""
+Size of the raw OpenAPI spec vs. the compiled operation index handed to the planner.
+
+Builds a synthetic FastAPI application with many endpoints and nested models (or loads a spec
+file), then reports the characters/approximate tokens of the raw JSON and of the digest, plus
+the time to compile the digest.
+
+Usage:
+    python -m benchmarks.openapi_digest [--resources 40] [--spec path/to/openapi.json]
+"""
+import argparse
+import json
+import time
+from typing import List, Optional
+
+from fastapi import FastAPI, Query
+from pydantic import BaseModel, Field, create_model
+
+from data_agent.openapi import OpenAPIIndex
+
+CHARS_PER_TOKEN = 4
+
+
+class Address(BaseModel):
+    street: str = Field(..., description="Street name and number of the registered address.")
+    city: str = Field(..., description="City of the registered address.")
+    country: str = Field(..., description="ISO 3166-1 alpha-2 country code.", examples=["IL"])
+
+
+def build_spec(resources: int) -> dict:
+    app = FastAPI(title="Synthetic Banking API", version="1.0.0",
+                  description="A large synthetic API used to measure OpenAPI digest size. " * 5)
+    for i in range(resources):
+        name = f"Resource{i}"
+        model = create_model(
+            name,
+            id=(int, Field(..., description=f"Unique identifier of the {name}.")),
+            name=(str, Field(..., description=f"Display name of the {name}, shown in statements and reports.")),
+            amount=(float, Field(..., description="Monetary amount in the account currency.", examples=[1250.5])),
+            address=(Optional[Address], Field(None, description="Postal address, when known.")),
+            tags=(List[str], Field(default_factory=list, description="Free-form labels attached by operators.")),
+        )
+
+        def make_handlers(model):
+            def list_items(limit: int = Query(20, ge=1, le=500, description="Maximum number of items to return."),
+                           offset: int = Query(0, ge=0, description="Number of items to skip.")) -> List[model]:
+                """Lists the items of this resource, most recent first. Supports offset pagination."""
+                return []
+
+            def get_item(item_id: int) -> model:
+                """Returns one item by its identifier, or 404 when it does not exist."""
+                return None
+
+            def create_item(item: model) -> model:
+                """Creates a new item and returns it with its assigned identifier."""
+                return item
+            return list_items, get_item, create_item
+
+        list_items, get_item, create_item = make_handlers(model)
+        app.get(f"/resources-{i}/", tags=[name])(list_items)
+        app.get(f"/resources-{i}/{{item_id}}", tags=[name])(get_item)
+        app.post(f"/resources-{i}/", tags=[name])(create_item)
+    return app.openapi()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resources", type=int, default=40)
+    parser.add_argument("--spec", help="Path to an existing OpenAPI JSON file to measure instead.")
+    args = parser.parse_args()
+
+    if args.spec:
+        with open(args.spec, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    else:
+        spec = build_spec(args.resources)
+    raw = json.dumps(spec)
+
+    start = time.perf_counter()
+    index = OpenAPIIndex(spec)
+    digest = index.to_text()
+    compile_ms = (time.perf_counter() - start) * 1000
+    detail = index.operations[0].describe() if index.operations else ""
+
+    print(f"Operations:              {len(index.operations)}")
+    print(f"Raw spec:                {len(raw):>8} chars (~{len(raw) // CHARS_PER_TOKEN} tokens)")
+    print(f"Operation index:         {len(digest):>8} chars (~{len(digest) // CHARS_PER_TOKEN} tokens), "
+          f"{1 - len(digest) / len(raw):.0%} smaller")
+    print(f"One expanded operation:  {len(detail):>8} chars (~{len(detail) // CHARS_PER_TOKEN} tokens)")
+    print(f"Compile time:            {compile_ms:>8.1f} ms (once per spec version)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Offline end-to-end benchmark: replays recorded chat turns through the real agents, with a
+deterministic stand-in for Gemini, against scaled bank databases and the mock credit API.
+
+Each scenario (see `benchmarks/scenarios.json`) lists the model responses of each agent:
+tool calls (`{"call": name, "args": {...}}`), texts (`{"text": ...}`) or both; an argument
+"$1", "$2", ... stands for the first, second, ... result handle stored earlier in the turn
+(`store_result`). The replayed model returns them in order, so every turn runs the real tools, callbacks and agent transfer
+without network access or API keys. Per tool it reports latency (p50/p95/max), peak Python
+memory allocated while the tool ran, and the size of its output (what the next LLM call has
+to read).
+
+    python -m benchmarks.replay --rows 1000 100000 1000000 [--tables 240] [--repeat 5]
+    python -m benchmarks.replay --rows 100000 --postgres BANK          # loads the dataset into BANK
+    python -m benchmarks.replay --from-trace traces/spans.jsonl      # replay turns recorded by tracing
+
+The mock API (`mock-api.py`) is started automatically if it is not running.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import AsyncGenerator
+
+import requests
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from data_agent.agent import root_agent
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.sub_agents.query_agent.agent import query_agent
+from scripts.trace_report import percentile, read_turns
+
+from .datasets import build_postgres, ensure_sqlite
+from .schema_pruning import CHARS_PER_TOKEN
+
+SCENARIO_FILE = os.path.join("benchmarks", "scenarios.json")
+DB_SOURCE = "BENCH_DB"
+API_SOURCE = "BENCH_API"
+APP_NAME = "data_agent_replay"
+AGENTS = {agent.name: agent for agent in (root_agent, query_agent)}
+
+
+def _stored_handles(contents) -> list:
+    """The result handles returned by the tool calls so far, in order."""
+    handles = []
+    for content in contents or []:
+        for part in content.parts or []:
+            if part.function_response and isinstance(part.function_response.response, dict):
+                handles += re.findall(r"Stored result (r\d+)", str(part.function_response.response.get("result", "")))
+    return handles
+
+
+def _resolve_handles(value, handles: list):
+    if isinstance(value, str) and re.fullmatch(r"\$\d+", value):
+        return handles[int(value[1:]) - 1]
+    if isinstance(value, list):
+        return [_resolve_handles(item, handles) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve_handles(item, handles) for key, item in value.items()}
+    return value
+
+
+class ReplayLlm(BaseLlm):
+    """A deterministic model that answers with the next recorded step, whatever the prompt."""
+    steps: list = []
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        step = self.steps.pop(0) if self.steps else {"text": "Done."}
+        # A step is a text, a tool call, or both (e.g. a plan followed by the transfer).
+        parts = [types.Part(text=step["text"])] if "text" in step else []
+        if "call" in step:
+            args = _resolve_handles(step.get("args") or {}, _stored_handles(llm_request.contents))
+            parts.append(types.Part(function_call=types.FunctionCall(name=step["call"], args=args)))
+        prompt = "".join(str(c) for c in llm_request.contents or [])
+        yield LlmResponse(
+            content=types.Content(role="model", parts=parts),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=len(prompt) // CHARS_PER_TOKEN,
+                candidates_token_count=len(str(parts)) // CHARS_PER_TOKEN,
+            ),
+        )
+
+
+class Measurements:
+    """Collects per-tool and per-turn numbers from agent callbacks."""
+    def __init__(self):
+        self.tools = defaultdict(lambda: {"ms": [], "peak": [], "bytes": [], "errors": 0})
+        self.turns = defaultdict(lambda: {"ms": [], "llm_calls": [], "input_tokens": []})
+        self.memory = False
+        self._open = {}
+        self._turn = None
+
+    def start_turn(self):
+        self._turn = {"llm_calls": 0, "input_tokens": 0}
+
+    def end_turn(self, scenario: str, elapsed_ms: float):
+        turn = self.turns[scenario]
+        turn["ms"].append(elapsed_ms)
+        turn["llm_calls"].append(self._turn["llm_calls"])
+        turn["input_tokens"].append(self._turn["input_tokens"])
+
+    def after_model(self, callback_context, llm_response):
+        if self._turn is not None and llm_response.usage_metadata:
+            self._turn["llm_calls"] += 1
+            self._turn["input_tokens"] += llm_response.usage_metadata.prompt_token_count or 0
+        return None
+
+    def before_tool(self, tool, args, tool_context):
+        if self.memory:
+            tracemalloc.reset_peak()
+        self._open[tool_context.function_call_id] = time.perf_counter()
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        start = self._open.pop(tool_context.function_call_id, None)
+        if start is None:
+            return None
+        stats = self.tools[tool.name]
+        text = tool_response if isinstance(tool_response, str) else json.dumps(tool_response, default=str)
+        if self.memory:
+            # Memory runs are separate: tracing allocations slows every tool down.
+            stats["peak"].append(tracemalloc.get_traced_memory()[1])
+        else:
+            stats["ms"].append((time.perf_counter() - start) * 1000)
+            stats["bytes"].append(len(text.encode("utf-8")))
+            stats["errors"] += text.startswith("Error")
+        return None
+
+
+def attach(measurements: Measurements):
+    """Adds the measuring callbacks next to the agents' own (tracing) callbacks."""
+    for agent in AGENTS.values():
+        for name in ("after_model", "before_tool", "after_tool"):
+            attribute = f"{name}_callback"
+            existing = getattr(agent, attribute)
+            callbacks = existing if isinstance(existing, list) else [existing] if existing else []
+            setattr(agent, attribute, callbacks + [getattr(measurements, name)])
+
+
+def load_scenarios(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def scenarios_from_trace(path: str, db_source: str = None, api_source: str = None) -> list:
+    """
+    Rebuilds scenarios from the turns recorded by `data_agent.tracing`: the tool calls of
+    each agent, in order. Sources can be renamed to the benchmark sources. Calls whose
+    arguments were truncated in the trace are skipped.
+    """
+    renames = {name: target for name, target in ((db_source, DB_SOURCE), (api_source, API_SOURCE)) if name}
+    scenarios = []
+    for number, spans in enumerate(read_turns(path), 1):
+        agents, message = defaultdict(list), ""
+        for span in spans:
+            if span["parent"] is None:
+                message = span.get("data_agent.user_message", "")
+            if span.get("gen_ai.operation.name") != "execute_tool":
+                continue
+            try:
+                args = json.loads(span.get("data_agent.tool.arguments") or "{}")
+            except json.JSONDecodeError:
+                print(f"Skipping {span['gen_ai.tool.name']} in turn {number}: its arguments were truncated.")
+                continue
+            if args.get("data_source_name") in renames:
+                args["data_source_name"] = renames[args["data_source_name"]]
+            agents[span["gen_ai.agent.name"]].append({"call": span["gen_ai.tool.name"], "args": args})
+        if agents.get(query_agent.name) and not any(s.get("call") == "transfer_to_agent" for s in agents[root_agent.name]):
+            agents[root_agent.name].append({"call": "transfer_to_agent", "args": {"agent_name": query_agent.name}})
+        scenarios.append({"name": f"trace_turn_{number}", "message": message or "Replay", "agents": dict(agents)})
+    return scenarios
+
+
+def register_sources(db_source: dict, api_url: str):
+    manager = DataSourceManager()
+    manager.close_pools()
+    manager.invalidate_schema()
+    manager.result_cache.clear()
+    # cache_ttl 0 so that every call really hits the database/API.
+    manager.register_source({**db_source, "name": DB_SOURCE, "description": "Scaled bank database (benchmark)",
+                             "cache_ttl": 0})
+    manager.register_source({"name": API_SOURCE, "type": "openapi", "description": "Credit score API (benchmark)",
+                             "spec_url": f"{api_url}/openapi.json", "base_url": api_url, "cache_ttl": 0})
+
+
+def ensure_mock_api(api_url: str):
+    """Returns the mock API process if it had to be started, None if it was already running."""
+    try:
+        requests.get(f"{api_url}/openapi.json", timeout=1)
+        return None
+    except requests.exceptions.RequestException:
+        pass
+    process = subprocess.Popen([sys.executable, "mock-api.py"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        time.sleep(0.1)
+        try:
+            requests.get(f"{api_url}/openapi.json", timeout=1)
+            return process
+        except requests.exceptions.RequestException:
+            continue
+    process.terminate()
+    sys.exit(f"The mock API did not start at {api_url}; run `python mock-api.py` and retry.")
+
+
+async def run_scenario(runner: InMemoryRunner, scenario: dict, measurements: Measurements):
+    for name, agent in AGENTS.items():
+        agent.model = ReplayLlm(model="replay", steps=[dict(step) for step in scenario["agents"].get(name, [])])
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id="bench")
+    message = types.Content(role="user", parts=[types.Part(text=scenario["message"])])
+    measurements.start_turn()
+    start = time.perf_counter()
+    async for _ in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+        pass
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_dataset(scenarios: list, repeat: int) -> Measurements:
+    measurements = Measurements()
+    attach(measurements)
+    runner = InMemoryRunner(agent=root_agent, app_name=APP_NAME)
+    try:
+        for _ in range(repeat):
+            for scenario in scenarios:
+                measurements.end_turn(scenario["name"], await run_scenario(runner, scenario, measurements))
+        measurements.memory = True
+        tracemalloc.start()
+        for scenario in scenarios:
+            await run_scenario(runner, scenario, measurements)
+    finally:
+        tracemalloc.stop()
+        for agent in AGENTS.values():
+            for name in ("after_model", "before_tool", "after_tool"):
+                getattr(agent, f"{name}_callback").pop()
+    return measurements
+
+
+def _kib(values: list) -> str:
+    return f"{max(values) / 1024:,.0f}" if values else "-"
+
+
+def format_report(label: str, measurements: Measurements) -> str:
+    header = f"{'tool':<30} {'calls':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'peak KiB':>9} {'avg bytes':>10}"
+    lines = [label, header, "-" * len(header)]
+    for name, stats in sorted(measurements.tools.items(), key=lambda item: -sum(item[1]["ms"])):
+        durations = sorted(stats["ms"])
+        if not durations:
+            continue
+        lines.append(
+            f"{name[:30]:<30} {len(durations):>6} {stats['errors']:>4} {percentile(durations, 0.5):>9,.1f} "
+            f"{percentile(durations, 0.95):>9,.1f} {durations[-1]:>9,.1f} {_kib(stats['peak']):>9} "
+            f"{sum(stats['bytes']) / len(stats['bytes']):>10,.0f}")
+    header = f"{'turn':<30} {'runs':>6} {'p50 ms':>9} {'p95 ms':>9} {'llm calls':>10} {'input tokens':>13}"
+    lines += ["", header, "-" * len(header)]
+    for name, turn in measurements.turns.items():
+        durations = sorted(turn["ms"])
+        lines.append(
+            f"{name[:30]:<30} {len(durations):>6} {percentile(durations, 0.5):>9,.1f} "
+            f"{percentile(durations, 0.95):>9,.1f} {max(turn['llm_calls']):>10} {max(turn['input_tokens']):>13,}")
+    return "\n".join(lines)
+
+
+def summary(measurements: Measurements) -> dict:
+    return {
+        "tools": {name: {"calls": len(stats["ms"]), "errors": stats["errors"],
+                         "p50_ms": percentile(sorted(stats["ms"]), 0.5), "p95_ms": percentile(sorted(stats["ms"]), 0.95),
+                         "max_ms": max(stats["ms"], default=0), "peak_bytes": max(stats["peak"], default=0),
+                         "avg_output_bytes": sum(stats["bytes"]) / len(stats["bytes"]) if stats["bytes"] else 0}
+                  for name, stats in measurements.tools.items()},
+        "turns": {name: {"runs": len(turn["ms"]), "p50_ms": percentile(sorted(turn["ms"]), 0.5),
+                         "p95_ms": percentile(sorted(turn["ms"]), 0.95), "llm_calls": max(turn["llm_calls"]),
+                         "input_tokens": max(turn["input_tokens"])}
+                  for name, turn in measurements.turns.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000], help="Transactions per dataset.")
+    parser.add_argument("--tables", type=int, default=0, help="Extra tables for the many-table variant.")
+    parser.add_argument("--postgres", help="Load each dataset into this configured Postgres source instead of SQLite.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each scenario per dataset.")
+    parser.add_argument("--scenarios", default=SCENARIO_FILE)
+    parser.add_argument("--from-trace", help="Replay the turns of a tracing JSONL file instead.")
+    parser.add_argument("--trace-db-source", help="With --from-trace: the recorded database source to replace.")
+    parser.add_argument("--trace-api-source", help="With --from-trace: the recorded API source to replace.")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.from_trace:
+        scenarios = scenarios_from_trace(args.from_trace, args.trace_db_source, args.trace_api_source)
+    else:
+        scenarios = load_scenarios(args.scenarios)
+    if not scenarios:
+        sys.exit("No scenarios to replay.")
+
+    manager = DataSourceManager()
+    mock_api = ensure_mock_api(args.api_url)
+    results = {}
+    try:
+        for transactions in args.rows:
+            if args.postgres:
+                build_postgres(args.postgres, transactions, args.tables)
+                db_source = dict(manager.get_source(args.postgres))
+                label = f"{args.postgres} (postgres)"
+            else:
+                db_source = {"type": "sqlite", "db_file": ensure_sqlite(transactions, args.tables)}
+                label = "sqlite"
+            register_sources(db_source, args.api_url)
+            measurements = asyncio.run(run_dataset(scenarios, args.repeat))
+            label = f"{transactions:,} transactions, {args.tables} extra tables, {label}"
+            print(format_report(label, measurements) + "\n")
+            results[str(transactions)] = summary(measurements)
+    finally:
+        manager.close_pools()
+        if mock_api:
+            mock_api.terminate()
+            mock_api.wait()
+
+    # ru_maxrss is in KiB on Linux.
+    print(f"Peak process RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MiB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"tables": args.tables, "postgres": args.postgres, "datasets": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares the full schema dump against relevance-pruned schema context.
+
+Builds a synthetic SQLite warehouse with many tables, then for a few questions reports
+the size of what `get_db_schema_and_sample_data` and `get_relevant_schema` hand to the
+LLM, and how long each takes on a cold and a warm cache.
+
+Usage:
+    python -m benchmarks.schema_pruning [--tables 300]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.tools import get_db_schema_and_sample_data, get_relevant_schema
+
+SOURCE_NAME = "BENCH_WAREHOUSE"
+DOMAINS = ["customer", "account", "loan", "card", "branch", "employee", "product", "invoice",
+           "payment", "merchant", "campaign", "ticket", "shipment", "supplier", "warehouse"]
+ASPECTS = ["history", "status", "audit", "detail", "summary", "event", "note", "rating",
+           "address", "contact", "limit", "fee", "document", "segment", "score", "alert"]
+QUESTIONS = [
+    "What is the total payment amount per merchant this month?",
+    "Which customers have the highest loan score?",
+    "List open support tickets per branch employee",
+    "How many card alerts were raised for each customer segment?",
+]
+
+# Rough rule of thumb for English text and identifiers.
+CHARS_PER_TOKEN = 4
+
+
+def build_database(path: str, table_count: int, rows_per_table: int = 20):
+    random.seed(7)
+    conn = sqlite3.connect(path)
+    for domain in DOMAINS:
+        conn.execute(f"CREATE TABLE {domain} ({domain}_id INTEGER PRIMARY KEY, name TEXT, created_at TEXT)")
+        conn.executemany(f"INSERT INTO {domain} (name, created_at) VALUES (?, ?)",
+                         [(f"{domain} {i}", "2025-07-01") for i in range(rows_per_table)])
+    tables = [(d, a) for d in DOMAINS for a in ASPECTS][:max(0, table_count - len(DOMAINS))]
+    for domain, aspect in tables:
+        name = f"{domain}_{aspect}"
+        conn.execute(
+            f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {domain}_id INTEGER REFERENCES {domain}({domain}_id), "
+            f"{aspect}_code TEXT, amount NUMERIC, recorded_at TEXT)"
+        )
+        conn.executemany(f"INSERT INTO {name} ({domain}_id, {aspect}_code, amount, recorded_at) VALUES (?, ?, ?, ?)",
+                         [(random.randint(1, rows_per_table), f"{aspect}-{i}", round(random.uniform(1, 999), 2), "2025-07-02")
+                          for i in range(rows_per_table)])
+    conn.commit()
+    conn.close()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=len(DOMAINS) * (len(ASPECTS) + 1))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "warehouse.db")
+        build_database(db_file, args.tables)
+        manager = DataSourceManager()
+        manager.register_source({"name": SOURCE_NAME, "type": "sqlite", "description": "benchmark", "db_file": db_file})
+
+        full_text, full_cold_ms = timed(get_db_schema_and_sample_data, SOURCE_NAME)
+        _, full_warm_ms = timed(get_db_schema_and_sample_data, SOURCE_NAME)
+        table_count = len(manager.get_schema(SOURCE_NAME).tables)
+        print(f"Tables: {table_count}")
+        print(f"Full dump:   {len(full_text):>8} chars (~{len(full_text) // CHARS_PER_TOKEN} tokens), "
+              f"cold {full_cold_ms:.1f} ms, warm {full_warm_ms:.1f} ms\n")
+
+        print(f"{'question':<62} {'chars':>8} {'~tokens':>8} {'reduction':>10} {'cold ms':>8} {'warm ms':>8}")
+        manager.invalidate_schema(SOURCE_NAME)
+        for question in QUESTIONS:
+            text, cold_ms = timed(get_relevant_schema, SOURCE_NAME, question)
+            _, warm_ms = timed(get_relevant_schema, SOURCE_NAME, question)
+            reduction = 1 - len(text) / len(full_text)
+            print(f"{question[:60]:<62} {len(text):>8} {len(text) // CHARS_PER_TOKEN:>8} {reduction:>9.0%} "
+                  f"{cold_ms:>8.1f} {warm_ms:>8.1f}")
+        manager.close_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Long-running chat sessions: ADK's in-memory session service vs the session store.
+
+Replays the scenarios of `benchmarks/scenarios.json` turn after turn in one chat session,
+and reports how the prompt (input tokens per turn, counted by the replayed model) and the
+session history grow. Then opens many short sessions and compares the Python memory they
+hold, and the time to resume a session that was evicted from memory.
+
+    python -m benchmarks.sessions [--rows 100000] [--turns 30] [--sessions 300] [--max-sessions 50]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import InMemoryRunner, Runner
+from google.genai import types
+
+from data_agent.agent import root_agent
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.session_store import SESSION_STORE_DEFAULTS, SessionStore
+
+from .datasets import ensure_sqlite
+from .replay import (AGENTS, APP_NAME, SCENARIO_FILE, Measurements, ReplayLlm, attach, ensure_mock_api,
+                     load_scenarios, register_sources)
+
+
+def make_runner(store: SessionStore = None):
+    if store is None:
+        return InMemoryRunner(agent=root_agent, app_name=APP_NAME)
+    return Runner(agent=root_agent, app_name=APP_NAME, session_service=store,
+                  artifact_service=InMemoryArtifactService(), memory_service=InMemoryMemoryService())
+
+
+async def run_turn(runner, session_id: str, scenario: dict, measurements: Measurements) -> dict:
+    for name, agent in AGENTS.items():
+        agent.model = ReplayLlm(model="replay", steps=[dict(step) for step in scenario["agents"].get(name, [])])
+    measurements.start_turn()
+    start = time.perf_counter()
+    message = types.Content(role="user", parts=[types.Part(text=scenario["message"])])
+    async for _ in runner.run_async(user_id="bench", session_id=session_id, new_message=message):
+        pass
+    measurements.end_turn("turn", (time.perf_counter() - start) * 1000)
+    return {"ms": measurements.turns["turn"]["ms"][-1], "input_tokens": measurements.turns["turn"]["input_tokens"][-1]}
+
+
+async def long_session(scenarios: list, turns: int, store: SessionStore = None) -> list:
+    """Runs `turns` turns in one session; returns the per-turn numbers."""
+    measurements = Measurements()
+    attach(measurements)
+    runner = make_runner(store)
+    try:
+        session = await runner.session_service.create_session(app_name=APP_NAME, user_id="bench")
+        results = []
+        for number in range(turns):
+            result = await run_turn(runner, session.id, scenarios[number % len(scenarios)], measurements)
+            current = await runner.session_service.get_session(app_name=APP_NAME, user_id="bench",
+                                                               session_id=session.id)
+            result["history_bytes"] = sum(len(event.model_dump_json(exclude_none=True)) for event in current.events)
+            results.append(result)
+        return results
+    finally:
+        for agent in AGENTS.values():
+            for name in ("after_model", "before_tool", "after_tool"):
+                getattr(agent, f"{name}_callback").pop()
+
+
+async def many_sessions(scenario: dict, sessions: int, store: SessionStore = None) -> dict:
+    """Opens `sessions` one-turn sessions; returns the Python memory still held, and resume times."""
+    measurements = Measurements()
+    attach(measurements)
+    runner = make_runner(store)
+    try:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        ids = []
+        for _ in range(sessions):
+            session = await runner.session_service.create_session(app_name=APP_NAME, user_id="bench")
+            await run_turn(runner, session.id, scenario, measurements)
+            ids.append(session.id)
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        # The oldest session: evicted from the store's memory, still in memory otherwise.
+        start = time.perf_counter()
+        await runner.session_service.get_session(app_name=APP_NAME, user_id="bench", session_id=ids[0])
+        return {"held_bytes": held, "resume_ms": (time.perf_counter() - start) * 1000}
+    finally:
+        for agent in AGENTS.values():
+            for name in ("after_model", "before_tool", "after_tool"):
+                getattr(agent, f"{name}_callback").pop()
+
+
+def format_long_session(label: str, results: list) -> str:
+    header = f"{'turn':>5} {'ms':>8} {'input tokens':>13} {'history KiB':>12}"
+    lines = [label, header, "-" * len(header)]
+    for number, result in enumerate(results, 1):
+        if number in (1, 2, 3) or number % 5 == 0 or number == len(results):
+            lines.append(f"{number:>5} {result['ms']:>8,.1f} {result['input_tokens']:>13,} "
+                         f"{result['history_bytes'] / 1024:>12,.0f}")
+    lines.append(f"total input tokens: {sum(r['input_tokens'] for r in results):,}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Transactions in the benchmark database.")
+    parser.add_argument("--turns", type=int, default=30, help="Turns in the long session.")
+    parser.add_argument("--sessions", type=int, default=300, help="Sessions opened for the memory comparison.")
+    parser.add_argument("--max-sessions", type=int, default=50, help="The store's in-memory session limit.")
+    parser.add_argument("--scenarios", default=SCENARIO_FILE)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8001")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    wide = next((s for s in scenarios if s["name"] == "wide_result"), scenarios[0])
+    mock_api = ensure_mock_api(args.api_url)
+    register_sources({"type": "sqlite", "db_file": ensure_sqlite(args.rows)}, args.api_url)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            def store(**settings):
+                return SessionStore.from_settings({**SESSION_STORE_DEFAULTS, **settings,
+                                                   "path": os.path.join(directory, f"{time.monotonic_ns()}.db")})
+
+            print(format_long_session("In-memory sessions", asyncio.run(long_session(scenarios, args.turns))) + "\n")
+            session_store = store()
+            print(format_long_session("Session store (tool outputs of older turns compacted)",
+                                      asyncio.run(long_session(scenarios, args.turns, session_store))))
+            print(f"store: {session_store.stats()}\n")
+            session_store.close()
+
+            in_memory = asyncio.run(many_sessions(wide, args.sessions))
+            session_store = store(max_sessions=args.max_sessions)
+            stored = asyncio.run(many_sessions(wide, args.sessions, session_store))
+            print(f"{args.sessions} sessions, Python memory held: in-memory {in_memory['held_bytes'] / 2**20:,.1f} MiB, "
+                  f"session store {stored['held_bytes'] / 2**20:,.1f} MiB (max {args.max_sessions} in memory)")
+            print(f"resuming the oldest session: in-memory {in_memory['resume_ms']:,.2f} ms, "
+                  f"session store {stored['resume_ms']:,.2f} ms (loaded from the file)")
+            print(f"store: {session_store.stats()}")
+            session_store.close()
+    finally:
+        DataSourceManager().close_pools()
+        if mock_api:
+            mock_api.terminate()
+            mock_api.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Queries in the wrong dialect: run_sql_query without and with the `sql_dialect` checks.
+
+Runs typical agent queries written for Postgres (and a few with misspelled names) through
+`run_sql_query` against a scaled SQLite bank database (`benchmarks.datasets`), registered once
+with `sql_dialect` disabled and once with the defaults, and reports the queries that fail (each
+one an error -> LLM -> retry round trip) and whether the error names the fix, the estimated
+time per answered question with `--llm-seconds` per round trip, and the cost of
+`prepare_query` with a cold and a warm parse cache.
+
+    python -m benchmarks.sql_dialect [--rows 100000] [--llm-seconds 2.0] [--repeat 1000]
+"""
+import argparse
+import time
+
+from data_agent.data_source_manager import DataSourceManager
+from data_agent.sql_dialect import SQL_DIALECT_DEFAULTS, _transpile, parse, prepare_query
+from data_agent.sub_agents.query_agent.tools import run_sql_query
+
+from .datasets import ensure_sqlite
+
+PLAIN_SOURCE = "BENCH_DIALECT_OFF"
+CHECKED_SOURCE = "BENCH_DIALECT_ON"
+
+QUERIES = [
+    "SELECT c.full_name, SUM(t.amount)::numeric AS total FROM customers c JOIN transactions t "
+    "ON t.customer_id = c.customer_id GROUP BY c.full_name ORDER BY total DESC FETCH FIRST 10 ROWS ONLY",
+    "SELECT count(*) FROM customers WHERE full_name ILIKE '%smith%'",
+    "SELECT date_trunc('month', transaction_date) AS month, SUM(amount) FROM transactions GROUP BY 1 ORDER BY 1",
+    "SELECT count(*) FROM transactions WHERE transaction_date >= NOW() - INTERVAL '30 days'",
+    "SELECT EXTRACT(YEAR FROM transaction_date) AS year, count(*) FROM transactions GROUP BY 1",
+    "SELECT customer_id, string_agg(type, ', ') FROM transactions GROUP BY customer_id LIMIT 5",
+    "SELECT to_char(transaction_date, 'YYYY-MM') AS month, AVG(amount) FROM transactions GROUP BY 1",
+    "SELECT type, count(*), SUM(amount) FROM transactions GROUP BY type",
+    "SELECT c.fullname, count(*) FROM customers c JOIN transactions t ON t.customer_id = c.customer_id GROUP BY 1",
+    "SELECT customer_id, SUM(total_amount) FROM transactions GROUP BY customer_id",
+]
+
+
+def run(source_name: str, query: str):
+    """Runs a query through run_sql_query, returning `(seconds, output)`."""
+    start = time.perf_counter()
+    output = run_sql_query(source_name, query)
+    return time.perf_counter() - start, output
+
+
+def outcome(output: str) -> str:
+    if not output.startswith("Error"):
+        return "ok"
+    return "error with hints" if "Did you mean" in output else "error"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Transactions in the database.")
+    parser.add_argument("--llm-seconds", type=float, default=2.0, help="Seconds per LLM round trip.")
+    parser.add_argument("--repeat", type=int, default=1000, help="prepare_query calls per query for timing.")
+    args = parser.parse_args()
+
+    path = ensure_sqlite(args.rows)
+    manager = DataSourceManager()
+    for name, dialect in ((PLAIN_SOURCE, {"transpile": False, "validate": False}), (CHECKED_SOURCE, {})):
+        manager.register_source({"name": name, "type": "sqlite", "db_file": path, "cache_ttl": 0,
+                                 "description": "Scaled bank database (benchmark)", "sql_dialect": dialect})
+    schema = manager.get_schema(CHECKED_SOURCE)
+
+    totals = {PLAIN_SOURCE: [0, 0.0], CHECKED_SOURCE: [0, 0.0]}  # failures, seconds
+    print(f"{'query':<64} {'as written':<18} {'with sql_dialect'}")
+    for query in QUERIES:
+        outcomes = []
+        for name in (PLAIN_SOURCE, CHECKED_SOURCE):
+            seconds, output = run(name, query)
+            totals[name][0] += output.startswith("Error")
+            totals[name][1] += seconds
+            outcomes.append(outcome(output))
+        print(f"{query[:62]:<64} {outcomes[0]:<18} {outcomes[1]}")
+
+    parse.cache_clear()
+    _transpile.cache_clear()
+    start = time.perf_counter()
+    for query in QUERIES:
+        try:
+            prepare_query(query, "sqlite", SQL_DIALECT_DEFAULTS, schema)
+        except ValueError:
+            pass
+    cold = (time.perf_counter() - start) / len(QUERIES)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for query in QUERIES:
+            try:
+                prepare_query(query, "sqlite", SQL_DIALECT_DEFAULTS, schema)
+            except ValueError:
+                pass
+    warm = (time.perf_counter() - start) / (args.repeat * len(QUERIES))
+
+    # A failed query costs one more LLM round trip.
+    print(f"\n{len(QUERIES)} queries, {args.rows:,} transactions, {args.llm_seconds}s per LLM round trip")
+    print(f"{'':<24} {'retries':>8} {'seconds per question':>21}")
+    for label, name in (("as written", PLAIN_SOURCE), ("with sql_dialect", CHECKED_SOURCE)):
+        failures, seconds = totals[name]
+        print(f"{label:<24} {failures:>8} {(seconds + failures * args.llm_seconds) / len(QUERIES):>21.2f}")
+    print(f"prepare_query: {cold * 1e6:,.0f} us per query uncached, {warm * 1e6:,.1f} us with the parse cache")
+
+
+if __name__ == "__main__":
+    main()
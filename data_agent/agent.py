@@ -1,10 +1,20 @@
 from google.adk.agents import Agent
+from .executor import async_tool
+from .tracing import agent_callbacks
 from .tools import (
     list_available_data_sources,
     get_db_schema_and_sample_data,
+    get_relevant_schema,
     get_data_source_credentials,
     get_api_schema,
+    get_api_operation,
     read_file_data_source,
+    save_prefect_flow,
+    run_prefect_flow,
+    get_flow_job_status,
+    tail_flow_job_log,
+    cancel_flow_job,
+    list_flow_jobs,
 )
 from .sub_agents.query_agent.agent import query_agent
 
@@ -17,11 +27,18 @@ instruction = (
     "1.  **Analyze the Request:** First, carefully deconstruct the user's query to identify the core information needed."
     "2.  **Discover Sources:** Use the `list_available_data_sources` tool to see all potential data sources."
     "3.  **Select & Inspect:** Based on the source names and the user's query, select the single most promising data source. "
-    "Then, use the appropriate tool (`get_db_schema_and_sample_data`, `get_api_schema`, or `read_file_data_source`) "
-    "to inspect its structure and confirm it contains the relevant data."
+    "Then, use the appropriate tool (`get_relevant_schema`, `get_db_schema_and_sample_data`, `get_api_schema`, or `read_file_data_source`) "
+    "to inspect its structure and confirm it contains the relevant data. For databases, start with `get_relevant_schema`, "
+    "which returns only the tables related to the question; fall back to `get_db_schema_and_sample_data` if it misses something. "
+    "For APIs, `get_api_schema` lists the operations; use `get_api_operation` to see the details of the ones you plan to call. "
+    "File and JSON sources with tabular data (JSON, CSV, NDJSON, Parquet) can also be queried with SQL: "
+    "`get_db_schema_and_sample_data` shows the tables they are loaded into, so plan aggregations as SQL instead of reading the raw file. "
+    "If the answer needs data from several sources (e.g. a database table and a blacklist file, or customers and their "
+    "credit scores from an API), inspect each of them and plan a single federated query: one SQLite query that names "
+    "tables as `SOURCE_NAME.table`, with API results declared as `api_tables` (optionally called once per row of a `for_each` query)."
     "4.  **Formulate the Plan:** This is your most critical step. BEFORE delegating, you must create a clear, step-by-step execution plan. "
     "The plan must explicitly state:\n"
-    "    - The name of the chosen data source.\n"
+    "    - The name of the chosen data source (or sources, for a federated query).\n"
     "    - The specific tables, API endpoints, or file sections to be used.\n"
     "    - The high-level logic of the query (e.g., 'Join users table with orders table on user_id, filter for 'completed' status, and then aggregate by product_category')."
     "5.  **Delegate Execution:** Once your plan is complete, delegate the task to the `query_agent`. You must pass it both the original user query and your detailed plan for context."
@@ -30,6 +47,9 @@ instruction = (
     "- **Autonomy First:** Be proactive. Strive to complete the task without asking the user for clarification. Only ask if the request is critically ambiguous and cannot be resolved by inspecting the data schemas."
     "- **Efficiency is Key:** Do not waste resources. Do not inspect the schema of every data source; only inspect the one you have identified as most relevant."
     "- **Handle Failure Gracefully:** If you inspect the most likely source and determine the request cannot be answered with the available data, inform the user clearly, stating why the request cannot be fulfilled."
+    "- **Data Pipelines:** If the user asks for a recurring or batch job (e.g. a nightly load), write a Prefect flow with `save_prefect_flow` "
+    "and start it with `run_prefect_flow`, which returns a job ID if the flow is still running. Follow the job with `get_flow_job_status` "
+    "and `tail_flow_job_log`, stop it with `cancel_flow_job`, and use `list_flow_jobs` to find earlier runs."
 )
 
 root_agent = Agent(
@@ -37,14 +57,25 @@ root_agent = Agent(
     model="gemini-2.0-flash",
     description="An agent that can interact with various data sources And plan how to query them.",
     instruction=instruction,
+    # Tools do blocking database/HTTP I/O, so they run on the shared tool executor
+    # instead of stalling the event loop that serves every chat session.
     tools=[
-        list_available_data_sources,
-        get_db_schema_and_sample_data,
-        get_data_source_credentials,
-        get_api_schema,
-        read_file_data_source,
+        async_tool(list_available_data_sources),
+        async_tool(get_db_schema_and_sample_data),
+        async_tool(get_relevant_schema),
+        async_tool(get_data_source_credentials),
+        async_tool(get_api_schema),
+        async_tool(get_api_operation),
+        async_tool(read_file_data_source),
+        async_tool(save_prefect_flow),
+        async_tool(run_prefect_flow),
+        async_tool(get_flow_job_status),
+        async_tool(tail_flow_job_log),
+        async_tool(cancel_flow_job),
+        async_tool(list_flow_jobs),
     ],
     sub_agents=[
         query_agent,
     ],
+    **agent_callbacks(),
 )
\ No newline at end of file
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from .cache import is_read_only_query
+from .executor import async_tool
+from .schema_index import tokenize
+
+# Defaults for the top-level `answer_cache` block in the YAML file.
+ANSWER_CACHE_DEFAULTS = {
+    'enabled': True,
+    'path': "answer_cache.db",    # SQLite file holding the cached answers.
+    'min_similarity': 0.85,       # Cosine similarity needed to reuse an answer.
+    'max_entries': 5000,          # Oldest entries are dropped beyond this.
+    'ttl': 7 * 24 * 3600,         # Seconds an entry is reused.
+    'first_turn_only': True,      # Only standalone questions (the first of a chat) are cached/answered.
+}
+# Tools whose call can be replayed to answer the question again on current data.
+REPLAYABLE_TOOLS = ("run_sql_query", "run_federated_query")
+
+# Sparse hashed n-gram embeddings: words, word pairs and character trigrams, each hashed into
+# one of EMBEDDING_BUCKETS dimensions with a hash-derived sign (so collisions cancel out).
+EMBEDDING_BUCKETS = 1 << 20
+WORD_WEIGHT, BIGRAM_WEIGHT, TRIGRAM_WEIGHT = 1.0, 0.7, 0.25
+
+# Words that flip or narrow the answer although they barely move the embedding
+# ("most" vs "least", "this month" vs "last month"); they are part of the signature.
+SIGNATURE_WORDS = {
+    "most", "least", "top", "bottom", "highest", "lowest", "largest", "smallest", "biggest", "max", "maximum",
+    "min", "minimum", "more", "less", "fewer", "above", "below", "over", "under", "before", "after", "first",
+    "last", "latest", "oldest", "newest", "earliest", "ascending", "descending", "not", "no", "without", "never",
+    "except", "this", "next", "previous", "current", "today", "yesterday", "tomorrow", "average", "total", "count",
+    "credit", "debit",
+}
+_LITERAL_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*")
+_WORD_RE = re.compile(r"[A-Za-z][\w-]*")
+
+
+def _feature(name: str) -> tuple:
+    digest = int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % EMBEDDING_BUCKETS, 1.0 if digest >> 63 else -1.0
+
+
+def _stem(term: str) -> str:
+    for suffix in ("ing", "ed"):
+        if len(term) > len(suffix) + 3 and term.endswith(suffix):
+            return term[:-len(suffix)]
+    return term
+
+
+def embed(text: str) -> dict:
+    """A unit-length sparse vector `{dimension: weight}` for a question; paraphrases land close together."""
+    terms = [_stem(term) for term in tokenize(text)]
+    features = [(term, WORD_WEIGHT) for term in terms]
+    features += [(f"{a} {b}", BIGRAM_WEIGHT) for a, b in zip(terms, terms[1:])]
+    for term in terms:
+        padded = f"#{term}#"
+        features += [(f"#3{padded[i:i + 3]}", TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+    vector = defaultdict(float)
+    for name, weight in features:
+        dimension, sign = _feature(name)
+        vector[dimension] += sign * weight
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {d: v / norm for d, v in vector.items() if v} if norm else {}
+
+
+def signature(text: str) -> str:
+    """
+    The literals of a question: numbers, quoted strings, names (capitalized words that do
+    not start a sentence, and identifiers like LOCAL_BANK_DB) and SIGNATURE_WORDS. Questions
+    only share an answer if these match exactly ("top 10" is not "top 5", "Jane" is not "John").
+    """
+    literals = {m.lower() for m in _LITERAL_RE.findall(text)}
+    literals |= {word for word in re.findall(r"[a-z]+", text.lower()) if word in SIGNATURE_WORDS}
+    for sentence in re.split(r"[.!?]\s+", _LITERAL_RE.sub(" ", text)):
+        for position, word in enumerate(_WORD_RE.findall(sentence)):
+            if word.isupper() and len(word) > 1 or "_" in word or (position and word[0].isupper()):
+                literals.add(word.lower())
+    return json.dumps(sorted(literals))
+
+
+class AnswerCache:
+    """
+    Answers paraphrases of earlier questions without the planner and query LLM calls.
+
+    Each answered question is stored with the data source, the plan, the final replayable
+    tool call (a read-only SQL or federated query) and the answer. A new question is embedded
+    locally and matched against an inverted index over the stored embeddings; on a close
+    enough match with the same literals, the stored query is run again on current data.
+    Entries persist in a SQLite file.
+    """
+    def __init__(self, path: str = "answer_cache.db", min_similarity: float = 0.85, max_entries: int = 5000,
+                 ttl: float = 7 * 24 * 3600, enabled: bool = True, first_turn_only: bool = True):
+        self.min_similarity = float(min_similarity)
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self.enabled = enabled
+        self.first_turn_only = first_turn_only
+        self._lock = threading.Lock()
+        self._vectors = {}                   # entry id -> (embedding, signature, expires_at)
+        # Only entries with the same literals can match, so postings are kept per signature.
+        self._postings = defaultdict(dict)   # (signature, dimension) -> {entry id: weight}
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "replay_errors": 0, "saved_ms": 0.0}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Losing the last few entries in a crash is fine; an fsync per answered question is not.
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, question TEXT NOT NULL, signature TEXT NOT NULL, embedding TEXT NOT NULL, "
+            "source TEXT, plan TEXT, tool TEXT NOT NULL, args TEXT NOT NULL, answer TEXT, turn_ms REAL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+            "saved_ms REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("DELETE FROM answers WHERE expires_at < ?", (time.time(),))
+        self._db.commit()
+        for entry_id, embedding, entry_signature, expires_at in self._db.execute(
+                "SELECT id, embedding, signature, expires_at FROM answers"):
+            self._index(entry_id, {int(d): w for d, w in json.loads(embedding).items()}, entry_signature, expires_at)
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "AnswerCache":
+        return cls(**{**ANSWER_CACHE_DEFAULTS, **(settings or {})})
+
+    def _index(self, entry_id: int, vector: dict, entry_signature: str, expires_at: float):
+        self._vectors[entry_id] = (vector, entry_signature, expires_at)
+        for dimension, weight in vector.items():
+            self._postings[(entry_signature, dimension)][entry_id] = weight
+
+    def _unindex(self, entry_id: int):
+        vector, entry_signature, _ = self._vectors.pop(entry_id, ({}, None, None))
+        for dimension in vector:
+            postings = self._postings.get((entry_signature, dimension))
+            if postings is not None:
+                postings.pop(entry_id, None)
+                if not postings:
+                    del self._postings[(entry_signature, dimension)]
+
+    def _nearest(self, vector: dict, entry_signature: str, now: float):
+        """The best `(entry id, similarity)` among live entries with the same literals. Must hold the lock."""
+        scores = defaultdict(float)
+        for dimension, weight in vector.items():
+            for entry_id, entry_weight in self._postings.get((entry_signature, dimension), {}).items():
+                scores[entry_id] += weight * entry_weight
+        best = None
+        for entry_id, score in scores.items():
+            if self._vectors[entry_id][2] > now and (best is None or score > best[1]):
+                best = (entry_id, score)
+        return best
+
+    def lookup(self, question: str):
+        """Returns the cached entry (a dict, with its `similarity`) for a paraphrase of `question`, or None."""
+        vector, entry_signature, now = embed(question), signature(question), time.time()
+        with self._lock:
+            self._stats["lookups"] += 1
+            best = self._nearest(vector, entry_signature, now) if vector else None
+            if best is None or best[1] < self.min_similarity:
+                return None
+            row = self._db.execute(
+                "SELECT id, question, source, plan, tool, args, answer, turn_ms, created_at FROM answers WHERE id = ?",
+                (best[0],)).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "question", "source", "plan", "tool", "args", "answer", "turn_ms", "created_at")
+        entry = dict(zip(keys, row))
+        entry["args"] = json.loads(entry["args"])
+        entry["similarity"] = best[1]
+        return entry
+
+    def store(self, question: str, source: str, plan: str, tool: str, args: dict, answer: str, turn_ms: float):
+        """Caches an answered question, replacing the entry of an identical question."""
+        if tool not in REPLAYABLE_TOOLS or not is_read_only_query(args.get("query", "")):
+            return
+        vector, entry_signature, now = embed(question), signature(question), time.time()
+        if not vector:
+            return
+        with self._lock:
+            duplicate = self._nearest(vector, entry_signature, now)
+            if duplicate is not None and duplicate[1] > 0.999:
+                self._delete(duplicate[0])
+            cursor = self._db.execute(
+                "INSERT INTO answers (question, signature, embedding, source, plan, tool, args, answer, turn_ms, "
+                "created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (question, entry_signature, json.dumps(vector), source, plan, tool, json.dumps(args), answer,
+                 turn_ms, now, now + self.ttl))
+            self._index(cursor.lastrowid, vector, entry_signature, now + self.ttl)
+            if len(self._vectors) > self.max_entries:
+                for (entry_id,) in self._db.execute("SELECT id FROM answers ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                                                    (self.max_entries,)).fetchall():
+                    self._delete(entry_id)
+            self._db.commit()
+            self._stats["stores"] += 1
+
+    def _delete(self, entry_id: int):
+        self._unindex(entry_id)
+        self._db.execute("DELETE FROM answers WHERE id = ?", (entry_id,))
+
+    def forget(self, entry_id: int):
+        """Drops an entry whose query no longer runs (e.g. the schema changed)."""
+        with self._lock:
+            self._delete(entry_id)
+            self._db.commit()
+            self._stats["replay_errors"] += 1
+
+    def record_hit(self, entry: dict, replay_ms: float):
+        """Counts a served hit and the time saved compared with the turn that produced the entry."""
+        saved = max(0.0, (entry.get("turn_ms") or 0.0) - replay_ms)
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["saved_ms"] += saved
+            self._db.execute("UPDATE answers SET hits = hits + 1, saved_ms = saved_ms + ? WHERE id = ?",
+                             (saved, entry["id"]))
+            self._db.commit()
+
+    async def replay(self, entry: dict) -> str:
+        """Runs the entry's stored tool call again, off the event loop."""
+        from .sub_agents.query_agent.tools import run_federated_query, run_sql_query
+        tools = {"run_sql_query": run_sql_query, "run_federated_query": run_federated_query}
+        return await async_tool(tools[entry["tool"]])(**entry["args"])
+
+    def stats(self) -> dict:
+        """Hit rate and time saved in this process, plus totals over the stored entries."""
+        with self._lock:
+            entries, hits, saved_ms = self._db.execute(
+                "SELECT count(*), coalesce(sum(hits), 0), coalesce(sum(saved_ms), 0) FROM answers").fetchone()
+            lookups = self._stats["lookups"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "stored_hits": hits,
+                "stored_saved_ms": saved_ms,
+            }
+
+    def close(self):
+        self._db.close()
+
+
+class TurnCapture:
+    """
+    Follows the events of one agent turn to find what can be cached: the plan (the root
+    agent's text), the last successful replayable tool call and the final answer. A turn
+    whose last data tool was not replayable (e.g. an API call) cannot be answered by
+    replaying a query, so it is not cached.
+    """
+    def __init__(self, root_agent_name: str):
+        self.root_agent_name = root_agent_name
+        self.plan = []
+        self.answer = ""
+        self.call = None
+        self._pending = {}
+
+    def add(self, event):
+        for call in event.get_function_calls():
+            if call.name == "transfer_to_agent":
+                continue
+            self._pending[call.id] = (call.name, dict(call.args or {}))
+        for response in event.get_function_responses():
+            name, args = self._pending.pop(response.id, (response.name, {}))
+            if name == "transfer_to_agent":
+                continue
+            result = response.response or {}
+            text = str(result.get("result", result)) if isinstance(result, dict) else str(result)
+            if name in REPLAYABLE_TOOLS and not text.startswith("Error"):
+                self.call = (name, args)
+            elif name in REPLAYABLE_TOOLS or not name.startswith(("get_", "list_", "explain_")):
+                # A failed query or a data call whose result the answer may depend on.
+                self.call = None
+        text = "".join(p.text or "" for p in (event.content.parts or [])) if event.content else ""
+        if text and not event.partial:
+            if event.author == self.root_agent_name:
+                self.plan.append(text)
+            self.answer = text
+
+    def cacheable(self) -> bool:
+        return self.call is not None and bool(self.answer)
+
+    def source(self) -> str:
+        return self.call[1].get("data_source_name", "federated") if self.call else None
@@ -0,0 +1,159 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults for the top-level `result_cache` block in the YAML file.
+RESULT_CACHE_DEFAULTS = {
+    'max_entries': 512,
+    'max_bytes': 32 * 1024 * 1024,
+    'disk_path': None,
+}
+# Seconds a cached tool result stays valid when a source sets no `cache_ttl`.
+DEFAULT_CACHE_TTL = 60
+# The pseudo-source of run_federated_query results, which are dropped whenever any source is invalidated.
+FEDERATED_SOURCE = "__federated__"
+
+_SQL_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+# A keyword followed by "(" is a function call (replace(), insert() in MySQL), not a statement.
+# 'into' catches SELECT ... INTO, which creates a table.
+_WRITE_KEYWORDS_RE = re.compile(
+    r"\b(insert|update|delete|merge|upsert|replace|create|drop|alter|truncate|grant|revoke|vacuum|attach|detach|copy"
+    r"|into)\b(?!\s*\()")
+_READ_STATEMENTS = ("select", "with", "values", "table")
+
+
+def normalize_sql(query: str) -> str:
+    """Lowercases and collapses whitespace outside quoted literals/identifiers and drops trailing semicolons."""
+    parts = []
+    for token in _SQL_TOKEN_RE.findall(query.strip().rstrip(";").strip()):
+        if token[0] in "'\"":
+            parts.append(token)
+        elif token.isspace():
+            parts.append(" ")
+        else:
+            parts.append(token.lower())
+    return "".join(parts)
+
+
+def is_read_only_query(query: str) -> bool:
+    """Returns True if the statement only reads data, judging by its keywords outside literals and function calls."""
+    normalized = normalize_sql(query)
+    if normalized.split(" ", 1)[0] not in _READ_STATEMENTS:
+        return False
+    unquoted = _SQL_TOKEN_RE.sub(lambda m: "" if m.group(0)[0] in "'\"" else m.group(0), normalized)
+    return ";" not in unquoted and not _WRITE_KEYWORDS_RE.search(unquoted)
+
+
+class ResultCache:
+    """
+    A two-tier cache for tool results, keyed by (source, key).
+
+    The memory tier is an LRU bounded by entry count and total size. The optional disk tier
+    is a SQLite file that survives restarts; memory misses fall through to it. Every entry
+    carries its own expiry, so each source can use a different TTL.
+    """
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024, disk_path: str = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (source, key) -> (value, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "invalidations": 0}
+        self._disk = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "source TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (source, key))"
+            )
+            self._disk.execute("DELETE FROM result_cache WHERE expires_at < ?", (time.time(),))
+            self._disk.commit()
+
+    def get(self, source: str, key: str):
+        """Returns the cached value, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((source, key))
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end((source, key))
+                    self._stats["hits"] += 1
+                    return value
+                self._remove((source, key))
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM result_cache WHERE source = ? AND key = ? AND expires_at > ?",
+                    (source, key, now),
+                ).fetchone()
+                if row:
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    self._store((source, key), row[0], row[1])
+                    return row[0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, source: str, key: str, value: str, ttl: float):
+        """Caches a value for `ttl` seconds. Values larger than the whole memory budget are skipped."""
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store((source, key), value, expires_at)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO result_cache (source, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (source, key, value, expires_at),
+                )
+                self._disk.commit()
+
+    def invalidate_source(self, source: str):
+        """Drops every cached entry for a source, and the federated results that may read it, in memory and on disk."""
+        sources = (source, FEDERATED_SOURCE)
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] in sources]:
+                self._remove(entry_key)
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM result_cache WHERE source IN (?, ?)", sources)
+                self._disk.commit()
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM result_cache")
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current memory usage."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _store(self, entry_key, value, expires_at):
+        """Inserts into the memory tier and evicts least recently used entries. Must hold the lock."""
+        if entry_key in self._entries:
+            self._remove(entry_key)
+        self._entries[entry_key] = (value, expires_at)
+        self._bytes += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, entry_key):
+        value, _ = self._entries.pop(entry_key)
+        self._bytes -= len(value)
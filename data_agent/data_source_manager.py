@@ -1,6 +1,74 @@
 import yaml
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from .db import PostgresDB, SQLiteDB
+from .answer_cache import ANSWER_CACHE_DEFAULTS
+from .cache import DEFAULT_CACHE_TTL, RESULT_CACHE_DEFAULTS, ResultCache
+from .federation import FEDERATION_DEFAULTS
+from .file_reader import READ_LIMIT_DEFAULTS, ByteSource, is_url
+from .flow_runner import FLOW_RUNNER_DEFAULTS, FlowRunner
+from .http_client import HTTP_DEFAULTS, HttpClient
+from .local_engine import LOCAL_ENGINE_DEFAULTS, LocalEngine
+from .openapi import OpenAPIIndex
+from .pool import ConnectionPool
+from .query_guard import QUERY_GUARD_DEFAULTS
+from .result_store import RESULT_STORE_DEFAULTS, ResultStore
+from .results import RESULT_LIMIT_DEFAULTS
+from .sampling import SAMPLING_DEFAULTS, SAMPLING_MODES, format_table_samples, sample_tables_parallel
+from .schema import CachedSchema, DatabaseSchema
+from .schema_index import SchemaIndex
+from .session_store import SESSION_STORE_DEFAULTS
+from .sql_dialect import SQL_DIALECT_DEFAULTS
+
+DB_SOURCE_TYPES = ('postgres', 'sqlite')
+# File sources that are loaded into the local engine (an in-memory SQLite database) for SQL.
+LOCAL_SOURCE_TYPES = ('file', 'json')
+SQL_SOURCE_TYPES = DB_SOURCE_TYPES + LOCAL_SOURCE_TYPES
+
+# Defaults for the per-source `pool` block in the YAML file.
+POOL_DEFAULTS = {
+    'postgres': {'max_size': 5, 'idle_timeout': 300, 'checkout_timeout': 30},
+    'sqlite': {'max_size': 8, 'idle_timeout': 300, 'checkout_timeout': 30},
+    'local': {'max_size': 8, 'idle_timeout': 300, 'checkout_timeout': 30},
+}
+
+# Seconds a cached schema is trusted before its fingerprint is re-checked.
+DEFAULT_SCHEMA_CACHE_TTL = 60
+
+# Defaults for the top-level `warm_up` block in the YAML file.
+WARM_UP_DEFAULTS = {
+    'enabled': True,
+    'max_workers': 8,        # Sources warmed up concurrently.
+    'timeout': 60,           # Seconds startup waits; slower sources keep warming in the background.
+    'schema_index': True,    # Also sample tables and build the index used by get_relevant_schema.
+}
+
+# Defaults for the top-level `reload` block in the YAML file.
+RELOAD_DEFAULTS = {
+    'enabled': True,
+    'interval': 2,           # Seconds between checks of the file's mtime and size.
+}
+
+
+class SourceRegistry:
+    """
+    An immutable snapshot of the configured sources. Reloading builds a new registry and
+    swaps it in with one assignment, so readers see either the old or the new sources,
+    never a mix.
+    """
+    def __init__(self, sources: dict):
+        self.sources = sources
+        self.by_lower_name = {name.lower(): name for name in sources}
+        self.text = None     # The rendered list_sources_as_text, built on first use.
+
+    def resolve(self, name: str):
+        """Returns the configured spelling of a source name, matched case-insensitively, or None."""
+        return name if name in self.sources else self.by_lower_name.get(name.lower())
+
 
 class DataSourceManager:
     """Loads and manages data sources from a YAML configuration file."""
@@ -14,14 +82,38 @@ class DataSourceManager:
     def __init__(self, config_path="data_sources.yaml"):
         if not hasattr(self, '_initialized'):
             self.config_path = config_path
-            self.sources = self._load_sources()
+            self.config = self._load_config()
+            self.registry = SourceRegistry({source['name']: source for source in self.config.get('data_sources', [])})
+            self._runtime_sources = set()
+            self._config_stamp = self._stat_config()
+            self._reload_lock = threading.Lock()
+            self._watcher = None
+            self.result_cache = ResultCache(**{**RESULT_CACHE_DEFAULTS, **(self.config.get('result_cache') or {})})
+            self.result_store = ResultStore(**{**RESULT_STORE_DEFAULTS, **(self.config.get('result_store') or {})})
+            self.flow_runner = FlowRunner(**{**FLOW_RUNNER_DEFAULTS, **(self.config.get('flow_runner') or {})})
+            self._pools = {}
+            self._pools_lock = threading.Lock()
+            self._schema_cache = {}
+            self._schema_indexes = {}
+            self._http_clients = {}
+            self._api_indexes = {}
+            self.local_engine = LocalEngine()
+            self.readiness = {}
             self._initialized = True
 
-    def _load_sources(self):
+    def _read_config(self) -> dict:
+        with open(self.config_path, 'r') as f:
+            config = yaml.safe_load(f) or {}
+        if not isinstance(config, dict):
+            raise ValueError("the top level must be a mapping")
+        for source in config.get('data_sources') or []:
+            if not isinstance(source, dict) or not source.get('name') or not source.get('type'):
+                raise ValueError(f"every data source needs a 'name' and a 'type', got {source!r}")
+        return config
+
+    def _load_config(self):
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            return {source['name']: source for source in config.get('data_sources', [])}
+            return self._read_config()
         except FileNotFoundError:
             print(f"Error: Configuration file not found at '{self.config_path}'")
             return {}
@@ -29,32 +121,173 @@ class DataSourceManager:
             print(f"Error parsing YAML file: {e}")
             return {}
 
+    @property
+    def sources(self) -> dict:
+        """The configured sources by name (a snapshot: don't modify it, use `register_source`)."""
+        return self.registry.sources
+
     def get_source(self, name: str):
         """Returns the configuration for a named data source."""
-        source = self.sources.get(name)
+        source = self.registry.sources.get(name)
         if not source:
             raise ValueError(f"Data source '{name}' not found in configuration.")
         return source
 
+    def resolve_source_name(self, name: str):
+        """Returns the configured name of a source given in any letter case, or None."""
+        return self.registry.resolve(name)
+
+    def register_source(self, source: dict):
+        """
+        Adds (or replaces) a data source at runtime, e.g. for benchmarks and tests. It is
+        kept across reloads of the YAML file unless the file defines the same name.
+        """
+        if not source.get('name') or not source.get('type'):
+            raise ValueError("A data source needs at least a 'name' and a 'type'.")
+        with self._reload_lock:
+            self.registry = SourceRegistry({**self.registry.sources, source['name']: source})
+            self._runtime_sources.add(source['name'])
+
     def list_sources_as_text(self) -> str:
         """Returns a formatted string of available data sources for the LLM."""
-        if not self.sources:
+        registry = self.registry
+        if registry.text is not None:
+            return registry.text
+        if not registry.sources:
             return "No data sources are configured."
-        
-        output = "Here are the available data sources:\n\n"
-        for name, details in self.sources.items():
-            output += f"- Name: {name}\n"
-            output += f"  Type: {details['type']}\n"
-            output += f"  Description: {details['description']}\n\n"
-        return output
+
+        lines = ["Here are the available data sources:", ""]
+        for name, details in registry.sources.items():
+            lines.append(f"- Name: {name}")
+            lines.append(f"  Type: {details['type']}")
+            if details['type'] in LOCAL_SOURCE_TYPES:
+                lines.append("  Queryable with SQL (run_sql_query) as a local table.")
+            status = self.readiness.get(name)
+            if status and status['ok'] is False:
+                lines.append(f"  Status: unavailable at startup ({status['detail']})")
+            lines.append(f"  Description: {details['description']}")
+            lines.append("")
+        registry.text = "\n".join(lines) + "\n"
+        return registry.text
+
+    def get_reload_settings(self) -> dict:
+        """Returns the hot-reload settings (the top-level `reload` block over the defaults)."""
+        return {**RELOAD_DEFAULTS, **(self.config.get('reload') or {})}
+
+    def _stat_config(self):
+        try:
+            stat = os.stat(self.config_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def reload_config(self) -> dict:
+        """
+        Re-reads the YAML file and swaps in the new source registry. Sources that were
+        removed or whose configuration changed (including their credential env mapping) are
+        drained: their pools and HTTP clients are closed (connections in use are closed when
+        they are returned), and their cached schemas, results, loaded files and readiness are
+        dropped, so the next use starts from the new configuration. Unchanged sources keep
+        everything. If the file can't be read or parsed, the current registry stays.
+
+        Returns:
+            dict: The 'added', 'changed' and 'removed' source names, or an 'error'.
+        """
+        with self._reload_lock:
+            stamp = self._stat_config()
+            try:
+                config = self._read_config()
+            except Exception as e:
+                print(f"Error reloading '{self.config_path}', keeping the current data sources: {e}")
+                self._config_stamp = stamp
+                return {'error': str(e)}
+            old = self.registry.sources
+            new = {source['name']: source for source in config.get('data_sources') or []}
+            self._runtime_sources -= set(new)
+            for name in self._runtime_sources:
+                new[name] = old[name]
+            changes = {
+                'added': [name for name in new if name not in old],
+                'changed': [name for name in new if name in old and new[name] != old[name]],
+                'removed': [name for name in old if name not in new],
+            }
+            self.config = config
+            self.registry = SourceRegistry(new)
+            self._config_stamp = stamp
+        for name in changes['changed'] + changes['removed']:
+            self._drain_source(name)
+        if any(changes.values()):
+            print(f"Reloaded '{self.config_path}': " + "; ".join(
+                f"{kind} {', '.join(names[:10])}" + (f" and {len(names) - 10} more" if len(names) > 10 else "")
+                for kind, names in changes.items() if names))
+        return changes
+
+    def check_config(self) -> dict:
+        """Reloads the YAML file if its mtime or size changed; returns the changes, or None."""
+        if self._stat_config() == self._config_stamp:
+            return None
+        return self.reload_config()
+
+    def watch_config(self, interval: float = None):
+        """
+        Starts a daemon thread that calls `check_config` every `interval` seconds (the
+        `reload` block's, by default) and warms up the sources it adds or changes. Does
+        nothing if it is already running.
+        """
+        if self._watcher is not None:
+            return
+        interval = float(interval if interval is not None else self.get_reload_settings()['interval'])
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    changes = self.check_config()
+                    # New and changed sources get the same warm-up as at startup.
+                    names = (changes or {}).get('added', []) + (changes or {}).get('changed', [])
+                    if names and self.get_warm_up_settings()['enabled']:
+                        self.warm_up(names)
+                except Exception as e:
+                    print(f"Error checking '{self.config_path}' for changes: {e}")
+
+        thread = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watcher = (thread, stop)
+        thread.start()
+
+    def stop_watching_config(self):
+        if self._watcher is not None:
+            self._watcher[1].set()
+            self._watcher = None
+
+    def _drain_source(self, source_name: str):
+        """Releases everything held for a source, after it was changed or removed."""
+        with self._pools_lock:
+            pool = self._pools.pop(source_name, None)
+            client = self._http_clients.pop(source_name, None)
+        if pool is not None:
+            pool.close()
+        if client is not None:
+            client.close()
+        self.invalidate_schema(source_name)
+        self.result_cache.invalidate_source(source_name)
+        self.local_engine.drop(source_name)
+        self.readiness.pop(source_name, None)
+
+    @staticmethod
+    def _engine_type(db_type: str) -> str:
+        """The key for a source type in the pool/sampling defaults ('local' for file sources)."""
+        return 'local' if db_type in LOCAL_SOURCE_TYPES else db_type
 
     def get_db_connection(self, source_name: str):
-        """Creates and returns a database connection for a given source."""
+        """
+        Creates and returns a new database connection for a given source.
+        Tools should borrow pooled connections through `connection()` instead.
+        """
         source_config = self.get_source(source_name)
         db_type = source_config.get('type')
 
-        if db_type not in ['postgres', 'sqlite']:
-            raise ValueError(f"Data source '{source_name}' is of type '{db_type}', not a supported database. Use the appropriate tool for this data source type (e.g., 'read_file_data_source').")
+        if db_type not in SQL_SOURCE_TYPES:
+            raise ValueError(f"Data source '{source_name}' is of type '{db_type}', not a supported database. Use the appropriate tool for this data source type (e.g., 'run_api_query').")
 
         if db_type == 'postgres':
             cred_keys = source_config.get('credentials')
@@ -73,10 +306,356 @@ class DataSourceManager:
             if missing_params:
                 raise ConnectionError(f"Missing environment variables for data source '{source_name}'. Please set: {missing_params}")
 
-            return PostgresDB(**db_params)
+            db = PostgresDB(**db_params)
+            db.connect()
+            return db
         
         elif db_type == 'sqlite':
             db_file = source_config.get('db_file')
             if not db_file:
                 raise ValueError(f"Configuration for SQLite source '{source_name}' is missing the 'db_file' path.")
             return SQLiteDB(db_file=db_file)
+
+        else:
+            return SQLiteDB(db_file=self.load_local_source(source_name).uri, uri=True)
+
+    def load_local_source(self, source_name: str):
+        """
+        Loads a 'file' or 'json' source into the local engine, or returns the loaded copy if
+        the file has not changed. When it has, the source's pooled connections, cached schema
+        and cached results are dropped, since they belong to the previous version.
+        """
+        source_config = self.get_source(source_name)
+        path = source_config.get('path')
+        if not path:
+            raise ValueError(f"Data source '{source_name}' is missing the 'path' attribute in the configuration.")
+        settings = {**LOCAL_ENGINE_DEFAULTS, **(source_config.get('local_engine') or {})}
+        http_client = self.get_http_client(source_name) if is_url(path) else None
+        source = ByteSource(path, http_client, int(self.get_read_limits(source_name)['chunk_size']))
+        database, reloaded = self.local_engine.database(source_name, source, settings)
+        if reloaded:
+            with self._pools_lock:
+                pool = self._pools.pop(source_name, None)
+            if pool is not None:
+                pool.close()
+            self.invalidate_schema(source_name)
+            self.result_cache.invalidate_source(source_name)
+        return database
+
+    def get_cache_ttl(self, source_name: str) -> float:
+        """Returns how long tool results for a source may be cached (its `cache_ttl`, 0 disables caching)."""
+        return float(self.get_source(source_name).get('cache_ttl', DEFAULT_CACHE_TTL))
+
+    def get_cache_stats(self) -> dict:
+        """Returns the result cache's hit/miss counters and memory usage."""
+        return self.result_cache.stats()
+
+    def get_result_limits(self, source_name: str) -> dict:
+        """Returns the result size limits for a source (its `result_limits` block over the defaults)."""
+        return {**RESULT_LIMIT_DEFAULTS, **(self.get_source(source_name).get('result_limits') or {})}
+
+    def get_query_guard_settings(self, source_name: str) -> dict:
+        """Returns the plan check thresholds for a source (its `query_guard` block over the defaults)."""
+        return {**QUERY_GUARD_DEFAULTS, **(self.get_source(source_name).get('query_guard') or {})}
+
+    def get_sql_dialect_settings(self, source_name: str) -> dict:
+        """Returns the dialect checks for a source (its `sql_dialect` block over the defaults)."""
+        return {**SQL_DIALECT_DEFAULTS, **(self.get_source(source_name).get('sql_dialect') or {})}
+
+    def get_federation_settings(self) -> dict:
+        """Returns the settings for federated queries (the top-level `federation` block over the defaults)."""
+        return {**FEDERATION_DEFAULTS, **(self.config.get('federation') or {})}
+
+    def get_answer_cache_settings(self) -> dict:
+        """Returns the settings of the answer cache (the top-level `answer_cache` block over the defaults)."""
+        return {**ANSWER_CACHE_DEFAULTS, **(self.config.get('answer_cache') or {})}
+
+    def get_session_store_settings(self) -> dict:
+        """Returns the settings of the chat session store (the top-level `session_store` block over the defaults)."""
+        return {**SESSION_STORE_DEFAULTS, **(self.config.get('session_store') or {})}
+
+    def get_warm_up_settings(self) -> dict:
+        """Returns the startup warm-up settings (the top-level `warm_up` block over the defaults)."""
+        return {**WARM_UP_DEFAULTS, **(self.config.get('warm_up') or {})}
+
+    def _warm_up_source(self, source_name: str, schema_index: bool) -> str:
+        """Does the first-use work for one source; returns what is ready."""
+        source_config = self.get_source(source_name)
+        db_type = source_config.get('type')
+        if db_type == 'openapi':
+            return f"{len(self.get_api_index(source_name).operations)} API operations"
+        if db_type not in SQL_SOURCE_TYPES:
+            return "nothing to warm up"
+        path = source_config.get('path') or source_config.get('db_file')
+        if path and not is_url(path) and not os.path.exists(path):
+            raise ValueError(f"File '{path}' not found.")
+        try:
+            # Opens the pool's first connection (validating credentials) and caches the schema;
+            # file sources are loaded into the local engine first.
+            schema = self.get_schema(source_name)
+        except ValueError as e:
+            if db_type not in LOCAL_SOURCE_TYPES:
+                raise
+            return f"readable, not loaded for SQL: {e}"
+        if schema_index:
+            # The same index get_relevant_schema asks for.
+            self.get_schema_index(source_name, ignore_tables=["vectors"] if db_type == 'postgres' else [])
+        return f"{len(schema.tables)} tables" + (", schema index built" if schema_index else "")
+
+    def warm_up(self, source_names=None, settings: dict = None) -> dict:
+        """
+        Prepares sources before the first question: opens connection pools (which validates
+        credentials), introspects schemas and builds schema indexes, and downloads and compiles
+        OpenAPI specs, for all sources concurrently. Returns (and keeps in `readiness`) a
+        status per source with `ok`, `ms` and `detail`; failed sources are marked as
+        unavailable in `list_sources_as_text`.
+        """
+        settings = {**self.get_warm_up_settings(), **(settings or {})}
+        names = list(source_names or self.sources)
+
+        def warm(name):
+            start = time.perf_counter()
+            try:
+                status = {'ok': True, 'detail': self._warm_up_source(name, bool(settings['schema_index']))}
+            except Exception as e:
+                status = {'ok': False, 'detail': str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__}
+            status['ms'] = (time.perf_counter() - start) * 1000
+            self.readiness[name] = status
+            self.registry.text = None
+            return status
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(int(settings['max_workers']), len(names) or 1)),
+                                      thread_name_prefix="warm-up")
+        futures = {name: executor.submit(warm, name) for name in names}
+        wait(futures.values(), timeout=float(settings['timeout']))
+        # Sources still warming up finish in the background.
+        executor.shutdown(wait=False)
+        return {name: future.result() if future.done() else {'ok': None, 'ms': None, 'detail': "still warming up"}
+                for name, future in futures.items()}
+
+    def get_read_limits(self, source_name: str) -> dict:
+        """Returns the file reading limits for a source (its `read_limits` block over the defaults)."""
+        return {**READ_LIMIT_DEFAULTS, **(self.get_source(source_name).get('read_limits') or {})}
+
+    def get_pool(self, source_name: str) -> ConnectionPool:
+        """Returns the connection pool for a database source, creating it on first use."""
+        pool = self._pools.get(source_name)
+        if pool is not None:
+            return pool
+
+        source_config = self.get_source(source_name)
+        db_type = source_config.get('type')
+        if db_type not in SQL_SOURCE_TYPES:
+            raise ValueError(f"Data source '{source_name}' is of type '{db_type}', not a supported database. Use the appropriate tool for this data source type (e.g., 'run_api_query').")
+
+        with self._pools_lock:
+            pool = self._pools.get(source_name)
+            if pool is None:
+                settings = {**POOL_DEFAULTS[self._engine_type(db_type)], **(source_config.get('pool') or {})}
+                pool = ConnectionPool(
+                    name=source_name,
+                    factory=lambda: self.get_db_connection(source_name),
+                    max_size=int(settings['max_size']),
+                    idle_timeout=float(settings['idle_timeout']),
+                    checkout_timeout=float(settings['checkout_timeout']),
+                    per_thread=(db_type != 'postgres'),
+                )
+                self._pools[source_name] = pool
+            return pool
+
+    def get_http_client(self, source_name: str) -> HttpClient:
+        """Returns the pooled HTTP client for a source (configured by its `http` block)."""
+        client = self._http_clients.get(source_name)
+        if client is None:
+            settings = {**HTTP_DEFAULTS, **(self.get_source(source_name).get('http') or {})}
+            with self._pools_lock:
+                client = self._http_clients.get(source_name)
+                if client is None:
+                    client = HttpClient(name=source_name, **settings)
+                    self._http_clients[source_name] = client
+        return client
+
+    def get_api_index(self, source_name: str) -> OpenAPIIndex:
+        """Returns the compiled operation index of an 'openapi' source, rebuilt only when its spec changes."""
+        source_config = self.get_source(source_name)
+        if source_config.get('type') != 'openapi':
+            raise ValueError(f"Data source '{source_name}' is not an OpenAPI source.")
+        spec_url = source_config['spec_url']
+        spec = self.get_http_client(source_name).get_spec(spec_url)
+        entry = self._api_indexes.get(spec_url)
+        if entry and entry[0] == spec.digest:
+            return entry[1]
+        index = OpenAPIIndex(spec.parsed)
+        self._api_indexes[spec_url] = (spec.digest, index)
+        return index
+
+    def call_api(self, source_name: str, endpoint: str, method: str = "GET", data: dict = None) -> str:
+        """
+        Sends one request to an 'openapi' source through its pooled client and returns the
+        response text; raises on HTTP errors. Cacheable methods (`cache_methods`, GET by
+        default) are served from the result cache; other methods may change server state,
+        so they drop the source's cached responses.
+        """
+        source_config = self.get_source(source_name)
+        if source_config.get('type') != 'openapi':
+            raise ValueError(f"Data source '{source_name}' is not an OpenAPI source.")
+        full_url = f"{source_config['base_url'].rstrip('/')}/{endpoint.lstrip('/')}"
+
+        method = method.upper()
+        cacheable = method in [m.upper() for m in source_config.get('cache_methods', ['GET'])]
+        cache_key = f"api:{method} {full_url} {json.dumps(data, sort_keys=True)}"
+        if cacheable:
+            cached = self.result_cache.get(source_name, cache_key)
+            if cached is not None:
+                return cached
+        else:
+            self.result_cache.invalidate_source(source_name)
+
+        response = self.get_http_client(source_name).request(method, full_url, json=data)
+        response.raise_for_status()
+        if cacheable:
+            self.result_cache.put(source_name, cache_key, response.text, self.get_cache_ttl(source_name))
+        return response.text
+
+    def get_http_stats(self) -> dict:
+        """Returns request and spec-cache counters for every HTTP client."""
+        return {name: client.stats() for name, client in list(self._http_clients.items())}
+
+    @contextmanager
+    def connection(self, source_name: str):
+        """Borrows a pooled database connection for a given source."""
+        if self.get_source(source_name).get('type') in LOCAL_SOURCE_TYPES:
+            self.load_local_source(source_name)
+        with self.get_pool(source_name).connection() as db:
+            yield db
+
+    def get_pool_stats(self) -> dict:
+        """Returns usage counters (in-use, waits, created, recycled, ...) for every open pool."""
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
+
+    def close_pools(self):
+        """Closes every connection pool and HTTP client."""
+        with self._pools_lock:
+            pools, self._pools = self._pools, {}
+            clients, self._http_clients = self._http_clients, {}
+        for pool in pools.values():
+            pool.close()
+        for client in clients.values():
+            client.close()
+
+    def get_schema(self, source_name: str, refresh: bool = False) -> DatabaseSchema:
+        """Returns the structured schema of a database source, served from cache when unchanged."""
+        return self._get_cached_schema(source_name, refresh=refresh).schema
+
+    def get_schema_text(self, source_name: str, ignore_tables=(), refresh: bool = False) -> str:
+        """Returns the rendered schema text of a database source, served from cache when unchanged."""
+        return self._get_cached_schema(source_name, refresh=refresh).text(ignore_tables)
+
+    def invalidate_schema(self, source_name: str = None):
+        """Drops the cached schema (and schema index) of one source, or of all sources."""
+        if source_name is None:
+            self._schema_cache.clear()
+            self._schema_indexes.clear()
+        else:
+            self._schema_cache.pop(source_name, None)
+            for key in [key for key in self._schema_indexes if key[0] == source_name]:
+                del self._schema_indexes[key]
+
+    def get_schema_index(self, source_name: str, ignore_tables=()) -> SchemaIndex:
+        """
+        Returns the relevance index over a source's tables, built once per schema version
+        from the cached schema and one round of table samples.
+        """
+        cached = self._get_cached_schema(source_name)
+        key = (source_name, tuple(sorted(ignore_tables or ())))
+        entry = self._schema_indexes.get(key)
+        if entry and entry[0] == cached.fingerprint:
+            return entry[1]
+        samples = self.get_table_samples(source_name, ignore_tables=ignore_tables)
+        index = SchemaIndex(cached.schema.without(ignore_tables), samples)
+        self._schema_indexes[key] = (cached.fingerprint, index)
+        return index
+
+    def _get_cached_schema(self, source_name: str, refresh: bool = False) -> CachedSchema:
+        """
+        Within the source's `schema_cache_ttl` the cached entry is returned without touching
+        the database. After that, only the cheap schema fingerprint is re-read, and the full
+        introspection runs again only if the fingerprint changed.
+        """
+        source_config = self.get_source(source_name)
+        ttl = float(source_config.get('schema_cache_ttl', DEFAULT_SCHEMA_CACHE_TTL))
+        cached = self._schema_cache.get(source_name)
+        if cached and not refresh and time.monotonic() - cached.checked_at < ttl:
+            return cached
+
+        with self.connection(source_name) as db:
+            fingerprint = db.get_schema_fingerprint()
+            if cached and not refresh and cached.fingerprint == fingerprint:
+                cached.checked_at = time.monotonic()
+                return cached
+            cached = CachedSchema(schema=db.get_schema(), fingerprint=fingerprint)
+        self._schema_cache[source_name] = cached
+        return cached
+
+    def get_table_samples_text(self, source_name: str, ignore_tables=()) -> str:
+        """Samples every table of a database source and formats the rows as text."""
+        return format_table_samples(self.get_table_samples(source_name, ignore_tables=ignore_tables))
+
+    def get_table_samples(self, source_name: str, ignore_tables=(), tables=None) -> dict:
+        """
+        Samples the tables of a database source.
+
+        The source's `sampling` block picks the strategy: 'serial' (one table at a time on a
+        single connection), 'parallel' (up to `max_workers` tables at once on pooled
+        connections) or 'batched' (Postgres only: all tables in one UNION ALL round trip,
+        falling back to 'parallel' if the batch fails).
+
+        Args:
+            ignore_tables: Tables to skip.
+            tables: Optional subset of tables to sample; defaults to all tables.
+
+        Returns:
+            dict: Table name -> `(column_names, rows)` or the exception raised while sampling it.
+        """
+        source_config = self.get_source(source_name)
+        db_type = source_config.get('type')
+        if db_type not in SQL_SOURCE_TYPES:
+            raise ValueError(f"Data source '{source_name}' is of type '{db_type}', not a supported database.")
+        settings = {**SAMPLING_DEFAULTS[self._engine_type(db_type)], **(source_config.get('sampling') or {})}
+        mode = settings['mode']
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{mode}' for data source '{source_name}'. Use one of {SAMPLING_MODES}.")
+        if mode == 'batched' and db_type != 'postgres':
+            mode = 'parallel'
+
+        schema = self.get_schema(source_name).without(ignore_tables)
+        if tables is not None:
+            schema = schema.subset(tables)
+        table_names = sorted(schema.tables)
+        options = {
+            'limit': int(settings['limit']),
+            'statement_timeout_ms': settings['statement_timeout_ms'],
+            'tablesample_percent': settings['tablesample_percent'],
+        }
+
+        if mode == 'batched':
+            columns = {name: [c.name for c in table.columns] for name, table in schema.tables.items()}
+            try:
+                with self.connection(source_name) as db:
+                    return db.sample_tables_batched(table_names, columns=columns, **options)
+            except Exception as e:
+                print(f"Batched sampling failed for '{source_name}', sampling tables individually: {e}")
+                mode = 'parallel'
+
+        if mode == 'parallel':
+            return sample_tables_parallel(
+                lambda: self.connection(source_name), table_names, max_workers=int(settings['max_workers']), **options)
+
+        samples = {}
+        with self.connection(source_name) as db:
+            for table_name in table_names:
+                try:
+                    samples[table_name] = db.sample_table(table_name, **options)
+                except Exception as e:
+                    samples[table_name] = e
+        return samples
@@ -1,24 +1,95 @@
-import psycopg2
-from psycopg2.extensions import AsIs
+import json
+import time
+import uuid
+
 import sqlite3
 
+from .cache import is_read_only_query
+from .sampling import format_table_samples
+from .schema import ColumnInfo, DatabaseSchema, ForeignKey, TableInfo
+
+# psycopg2 is imported by the first PostgresDB, so processes without Postgres sources never load it.
+psycopg2 = sql = None
+
+
+def _import_psycopg2():
+    global psycopg2, sql
+    if psycopg2 is None:
+        import psycopg2 as driver
+        from psycopg2 import sql as driver_sql
+        psycopg2, sql = driver, driver_sql
+
+
+class _NeverRaised(Exception):
+    """Stands in for psycopg2.Error while psycopg2 is not imported (so nothing can raise it)."""
+
+
+def streams_on_server(query: str) -> bool:
+    """
+    True for the queries `PostgresDB.stream_query` runs on a named (server-side) cursor: plain
+    reads. Postgres can't open a cursor for data-modifying CTEs or SELECT ... INTO.
+    """
+    return is_read_only_query(query)
+
+
+def postgres_error() -> type:
+    """The base exception of Postgres failures, for `except` clauses: `except (ValueError, postgres_error()):`."""
+    return psycopg2.Error if psycopg2 is not None else _NeverRaised
+
+
+class QueryError(ValueError):
+    """A statement SQLite rejected. A ValueError, so callers that catch ValueError still do."""
+
+
 class SQLiteDB:
     """A wrapper for a SQLite database connection."""
-    def __init__(self, db_file: str):
+    def __init__(self, db_file: str, uri: bool = False):
         """
         Initializes the connection to the SQLite database.
         
         Args:
             db_file (str): The path to the SQLite database file.
+            uri (bool): Whether `db_file` is a `file:` URI (e.g. a shared in-memory database).
         """
         try:
             self.db_file = db_file
-            self.conn = sqlite3.connect(db_file)
+            # Pooled handles are borrowed by one thread at a time, so cross-thread
+            # use is safe and lets the pool close idle handles from any thread.
+            self.conn = sqlite3.connect(db_file, check_same_thread=False, uri=uri)
             self.cursor = self.conn.cursor()
             print(f"Successfully connected to SQLite database: {db_file}")
         except sqlite3.Error as e:
             raise ConnectionError(f"Failed to connect to SQLite database at {db_file}: {e}")
 
+    def get_schema(self) -> DatabaseSchema:
+        """
+        Introspects all user tables, their columns, primary keys and foreign keys.
+
+        Returns:
+            DatabaseSchema: The structured schema, keeping each table's CREATE statement.
+        """
+        schema = DatabaseSchema(dialect='sqlite')
+        tables = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid;"
+        ).fetchall()
+        for table_name, create_sql in tables:
+            quoted = table_name.replace('"', '""')
+            table = TableInfo(name=table_name, ddl=create_sql)
+            for _, name, data_type, notnull, _, pk in self.conn.execute(f'PRAGMA table_info("{quoted}")'):
+                table.columns.append(ColumnInfo(name=name, data_type=data_type, nullable=not notnull, primary_key=pk > 0))
+            foreign_keys = {}
+            for fk_id, _, ref_table, from_col, to_col, *_ in self.conn.execute(f'PRAGMA foreign_key_list("{quoted}")'):
+                fk = foreign_keys.setdefault(fk_id, ForeignKey(columns=[], ref_table=ref_table, ref_columns=[]))
+                fk.columns.append(from_col)
+                fk.ref_columns.append(to_col)
+            table.foreign_keys = list(foreign_keys.values())
+            schema.tables[table_name] = table
+        return schema
+
+    def get_schema_fingerprint(self) -> str:
+        """Returns a value that changes whenever the schema changes (SQLite's schema_version)."""
+        return str(self.conn.execute("PRAGMA schema_version").fetchone()[0])
+
     def get_schema_as_text(self) -> str:
         """
         Retrieves the schema of all tables in the database and formats it as a string.
@@ -27,19 +98,55 @@ class SQLiteDB:
             str: A formatted string describing the table schemas.
         """
         try:
-            self.cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table';")
-            tables = self.cursor.fetchall()
-            if not tables:
-                return "No tables found in the database."
-            
-            schema_str = "Database Schema:\n\n"
-            for table_name, create_sql in tables:
-                schema_str += f"-- Schema for table: {table_name}\n"
-                schema_str += f"{create_sql};\n\n"
-            return schema_str
+            return self.get_schema().to_text()
         except sqlite3.Error as e:
             return f"Error retrieving schema: {e}"
 
+    def list_tables(self) -> list:
+        """Returns the names of all user tables."""
+        rows = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name;"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def sample_table(self, table_name: str, limit: int = 10, statement_timeout_ms=None, tablesample_percent=None):
+        """
+        Fetches up to `limit` rows from a table.
+
+        Args:
+            table_name (str): The table to sample.
+            limit (int): The maximum number of rows to return.
+            statement_timeout_ms (int): Abort the read after this many milliseconds.
+            tablesample_percent: Ignored; SQLite has no TABLESAMPLE clause.
+
+        Returns:
+            tuple: `(column_names, rows)`.
+        """
+        quoted = table_name.replace('"', '""')
+        if statement_timeout_ms:
+            deadline = time.monotonic() + statement_timeout_ms / 1000
+            self.conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            cursor = self.conn.execute(f'SELECT * FROM "{quoted}" LIMIT ?', (limit,))
+            column_names = [desc[0] for desc in cursor.description]
+            return column_names, cursor.fetchall()
+        finally:
+            if statement_timeout_ms:
+                self.conn.set_progress_handler(None, 0)
+
+    def get_table_samples_as_text(self, limit=10, ignore_tables=None, statement_timeout_ms=None):
+        """Samples every table serially and formats the rows as text."""
+        ignore_set = set(ignore_tables or [])
+        samples = {}
+        for table_name in self.list_tables():
+            if table_name in ignore_set:
+                continue
+            try:
+                samples[table_name] = self.sample_table(table_name, limit=limit, statement_timeout_ms=statement_timeout_ms)
+            except sqlite3.Error as e:
+                samples[table_name] = e
+        return format_table_samples(samples)
+
     def execute_query(self, query: str):
         """
         Executes a given SQL query and fetches all results.
@@ -54,7 +161,95 @@ class SQLiteDB:
             self.cursor.execute(query)
             return self.cursor.fetchall()
         except sqlite3.Error as e:
-            raise ValueError(f"Error executing query: {e}")
+            raise QueryError(f"Error executing query: {e}")
+
+    def ping(self) -> bool:
+        """Returns True if the connection is still usable."""
+        try:
+            self.conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        """Discards any open transaction so the connection can be reused."""
+        self.conn.rollback()
+
+    def stream_query(self, query: str, fetch_size: int = 1000, statement_timeout_ms=None):
+        """
+        Executes a query and streams its rows with `fetchmany` instead of `fetchall`.
+
+        Args:
+            query (str): The SQL query to execute.
+            fetch_size (int): Rows fetched per batch.
+            statement_timeout_ms (int): Interrupt the statement (including the fetching of its
+                rows) after this many milliseconds.
+
+        Returns:
+            tuple: `(column_names, batches)` for statements that return rows, where `batches`
+            is a generator of row lists; `(None, rowcount)` for statements that don't, which
+            are committed.
+        """
+        if statement_timeout_ms:
+            deadline = time.monotonic() + statement_timeout_ms / 1000
+            self.conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            cursor = self.conn.execute(query)
+        except sqlite3.Error as e:
+            self.conn.set_progress_handler(None, 0)
+            raise QueryError(f"Error executing query: {self._error_message(e, statement_timeout_ms)}")
+        if cursor.description is None:
+            self.conn.set_progress_handler(None, 0)
+            self.conn.commit()
+            return None, cursor.rowcount
+
+        def batches():
+            try:
+                while True:
+                    try:
+                        rows = cursor.fetchmany(fetch_size)
+                    except sqlite3.OperationalError as e:
+                        raise QueryError(f"Error executing query: {self._error_message(e, statement_timeout_ms)}")
+                    if not rows:
+                        return
+                    yield rows
+            finally:
+                cursor.close()
+                self.conn.set_progress_handler(None, 0)
+
+        return [desc[0] for desc in cursor.description], batches()
+
+    @staticmethod
+    def _error_message(error, statement_timeout_ms) -> str:
+        if statement_timeout_ms and str(error) == "interrupted":
+            return f"canceling statement due to statement timeout ({statement_timeout_ms} ms)"
+        return str(error)
+
+    def explain(self, query: str) -> list:
+        """Returns the `EXPLAIN QUERY PLAN` rows of a query as `(id, parent, detail)` tuples."""
+        try:
+            return [(row[0], row[1], row[3]) for row in self.conn.execute(f"EXPLAIN QUERY PLAN {query}")]
+        except sqlite3.Error as e:
+            raise QueryError(f"Error executing query: {e}")
+
+    def estimate_table_rows(self, tables) -> dict:
+        """
+        Returns rough row counts for the given tables (table -> rows) without scanning them:
+        the largest rowid, which is read from the end of the table's b-tree.
+        """
+        known = {name.lower(): name for name in self.list_tables()}
+        estimates = {}
+        for table in tables:
+            name = known.get(table.lower())
+            if name is None:
+                continue
+            quoted = name.replace('"', '""')
+            try:
+                estimates[table] = self.conn.execute(f'SELECT max(rowid) FROM "{quoted}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                # WITHOUT ROWID tables have no rowid to read.
+                estimates[table] = self.conn.execute(f'SELECT count(*) FROM "{quoted}"').fetchone()[0]
+        return estimates
 
     def close(self):
         """Closes the database connection."""
@@ -65,6 +260,7 @@ class SQLiteDB:
 class PostgresDB:
     """A reusable class to interact with a specific PostgreSQL database."""
     def __init__(self, host, port, dbname, user, password):
+        _import_psycopg2()
         self.db_params = {
             "host": host, "port": port, "dbname": dbname, "user": user, "password": password
         }
@@ -83,6 +279,26 @@ class PostgresDB:
             self.conn.close()
             self.conn = None
 
+    def close(self):
+        self.disconnect()
+
+    def ping(self) -> bool:
+        """Returns True if the connection is open and answers a trivial query."""
+        if self.conn is None or self.conn.closed:
+            return False
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            self.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def reset(self):
+        """Ends the implicit transaction left open by SELECTs so pooled connections don't sit 'idle in transaction'."""
+        if self.conn is not None and not self.conn.closed:
+            self.conn.rollback()
+
     def query(self, query, params=None):
         if self.conn is None: self.connect()
         try:
@@ -92,48 +308,244 @@ class PostgresDB:
                 else: self.conn.commit(); return None
         except psycopg2.Error as e: self.conn.rollback(); raise e
     
-    def get_schema_as_text(self, ignore_tables=None):
+    def stream_query(self, query, fetch_size=1000, statement_timeout_ms=None):
+        """
+        Executes a query and streams its rows in batches. Read-only queries run on a
+        server-side (named) cursor, so only `fetch_size` rows are held client-side at a time;
+        anything else runs on a plain cursor and is committed.
+        With `statement_timeout_ms`, Postgres cancels the statement when it runs longer.
+        Returns `(column_names, batches)` for statements that return rows, where `batches` is
+        a generator of row lists, or `(None, rowcount)` for committed write statements.
+        """
+        if self.conn is None: self.connect()
+        if statement_timeout_ms:
+            try:
+                with self.conn.cursor() as cur:
+                    # Local to the transaction that runs (and streams) the statement.
+                    cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(statement_timeout_ms)),))
+            except psycopg2.Error:
+                self.conn.rollback()
+                raise
+        if streams_on_server(query):
+            cur = self.conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+            cur.itersize = fetch_size
+        else:
+            cur = self.conn.cursor()
+        try:
+            cur.execute(query)
+            first = cur.fetchmany(fetch_size) if cur.name or cur.description else None
+        except psycopg2.Error:
+            cur.close()
+            self.conn.rollback()
+            raise
+        if cur.description is None:
+            rowcount = cur.rowcount
+            cur.close()
+            self.conn.commit()
+            return None, rowcount
+        if not cur.name:
+            # A write returning rows (RETURNING, a data-modifying CTE); its rows are already client-side.
+            self.conn.commit()
+
+        def batches():
+            try:
+                rows = first
+                while rows:
+                    yield rows
+                    rows = cur.fetchmany(fetch_size)
+            finally:
+                try:
+                    cur.close()
+                finally:
+                    self.conn.rollback()
+
+        return [desc[0] for desc in cur.description], batches()
+
+    def explain(self, query) -> dict:
+        """
+        Returns the planner's estimate for a query: the root node of `EXPLAIN (FORMAT JSON)`.
+        Queries that `stream_query` runs on a server-side cursor are explained as a cursor,
+        since Postgres plans cursors differently (e.g. without parallel workers).
+        """
+        if self.conn is None: self.connect()
+        statement = f"DECLARE explained CURSOR FOR {query}" if streams_on_server(query) else query
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"EXPLAIN (FORMAT JSON) {statement}")
+                plan = cur.fetchone()[0]
+        finally:
+            self.conn.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def estimate_table_rows(self, tables) -> dict:
+        """Returns the planner's row counts (`pg_class.reltuples`) for the given 'public' tables."""
+        if self.conn is None: self.connect()
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relname, GREATEST(c.reltuples, 0)::bigint FROM pg_class c
+                    JOIN pg_namespace ns ON ns.oid = c.relnamespace
+                    WHERE ns.nspname = 'public' AND c.relname = ANY(%s)
+                """, (list(tables),))
+                return dict(cur.fetchall())
+        finally:
+            self.conn.rollback()
+
+    def get_schema(self, ignore_tables=None) -> DatabaseSchema:
+        """Introspects the tables, columns, primary keys and foreign keys of the 'public' schema."""
         if self.conn is None: self.connect()
-        if ignore_tables is None: ignore_tables = []
+        ignore_set = set(ignore_tables or [])
+        schema = DatabaseSchema(dialect='postgres')
         with self.conn.cursor() as cur:
             cur.execute("""
-                SELECT table_name, column_name, data_type FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name NOT IN %s ORDER BY table_name, ordinal_position;
-            """, (tuple(ignore_tables),))
-            rows = cur.fetchall()
-            schema = {}
-            for table_name, column_name, data_type in rows:
-                if table_name not in schema: schema[table_name] = []
-                schema[table_name].append(f"{column_name} ({data_type})")
-            schema_text = ""
-            for table_name, columns in schema.items():
-                schema_text += f"Table: {table_name}\nColumns:\n"
-                for column in columns: schema_text += f"  - {column}\n"
-                schema_text += "\n"
-            return schema_text
-
-    def get_table_samples_as_text(self, limit=10, ignore_tables=None):
+                SELECT c.table_name, c.column_name, c.data_type, c.is_nullable,
+                       col_description(cl.oid, c.ordinal_position::int), obj_description(cl.oid, 'pg_class')
+                FROM information_schema.columns c
+                JOIN pg_namespace ns ON ns.nspname = c.table_schema
+                JOIN pg_class cl ON cl.relnamespace = ns.oid AND cl.relname = c.table_name
+                WHERE c.table_schema = 'public' ORDER BY c.table_name, c.ordinal_position;
+            """)
+            for table_name, column_name, data_type, is_nullable, column_comment, table_comment in cur.fetchall():
+                if table_name in ignore_set: continue
+                table = schema.tables.setdefault(table_name, TableInfo(name=table_name, comment=table_comment))
+                table.columns.append(ColumnInfo(name=column_name, data_type=data_type, nullable=is_nullable == 'YES',
+                                                comment=column_comment))
+
+            cur.execute("""
+                SELECT con.contype, cl.relname::text,
+                       array_agg(att.attname::text ORDER BY k.ord),
+                       ref.relname::text,
+                       array_agg(ratt.attname::text ORDER BY k.ord)
+                FROM pg_constraint con
+                JOIN pg_class cl ON cl.oid = con.conrelid
+                JOIN pg_namespace ns ON ns.oid = cl.relnamespace
+                CROSS JOIN LATERAL unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+                LEFT JOIN pg_class ref ON ref.oid = con.confrelid
+                LEFT JOIN pg_attribute ratt ON ratt.attrelid = con.confrelid AND ratt.attnum = con.confkey[k.ord]
+                WHERE ns.nspname = 'public' AND con.contype IN ('p', 'f')
+                GROUP BY con.oid, con.contype, cl.relname, ref.relname;
+            """)
+            for contype, table_name, columns, ref_table, ref_columns in cur.fetchall():
+                table = schema.tables.get(table_name)
+                if table is None: continue
+                if contype == 'p':
+                    for column in table.columns:
+                        if column.name in columns: column.primary_key = True
+                else:
+                    table.foreign_keys.append(ForeignKey(columns=columns, ref_table=ref_table, ref_columns=ref_columns))
+        self.conn.rollback()
+        return schema
+
+    def get_schema_fingerprint(self) -> str:
+        """Returns a hash of the 'public' catalog (tables, columns, types and constraints)."""
+        if self.conn is None: self.connect()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT md5(
+                    coalesce((
+                        SELECT string_agg(c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':' || a.atttypid::text,
+                                          ',' ORDER BY c.oid, a.attnum)
+                        FROM pg_class c
+                        JOIN pg_namespace n ON n.oid = c.relnamespace
+                        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+                    ), '') || '|' ||
+                    coalesce((
+                        SELECT string_agg(con.oid::text, ',' ORDER BY con.oid)
+                        FROM pg_constraint con JOIN pg_namespace n ON n.oid = con.connamespace
+                        WHERE n.nspname = 'public'
+                    ), '')
+                );
+            """)
+            fingerprint = cur.fetchone()[0]
+        self.conn.rollback()
+        return fingerprint
+
+    def get_schema_as_text(self, ignore_tables=None):
+        return self.get_schema(ignore_tables=ignore_tables).to_text()
+
+    def list_tables(self) -> list:
         if self.conn is None: self.connect()
-        if ignore_tables is None: ignore_tables = []
         with self.conn.cursor() as cur:
             cur.execute("SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname = 'public' ORDER BY tablename;")
-            all_tables = [row[0] for row in cur.fetchall()]
-        ignore_set = set(ignore_tables)
-        tables_to_query = [t for t in all_tables if t not in ignore_set]
-        output_text = ""
-        for table_name in tables_to_query:
-            output_text += f"--- Sample data from table: {table_name} ---\n"
+            tables = [row[0] for row in cur.fetchall()]
+        self.conn.rollback()
+        return tables
+
+    def _sample_query(self, table_name, limit, tablesample_percent=None):
+        if tablesample_percent:
+            return sql.SQL("SELECT * FROM {} TABLESAMPLE SYSTEM ({}) LIMIT {}").format(
+                sql.Identifier(table_name), sql.Literal(float(tablesample_percent)), sql.Literal(int(limit)))
+        return sql.SQL("SELECT * FROM {} LIMIT {}").format(sql.Identifier(table_name), sql.Literal(int(limit)))
+
+    def sample_table(self, table_name, limit=10, statement_timeout_ms=None, tablesample_percent=None):
+        """
+        Fetches up to `limit` rows from a table, optionally via TABLESAMPLE SYSTEM, under a
+        per-statement timeout. Returns `(column_names, rows)`.
+        """
+        if self.conn is None: self.connect()
+        try:
+            with self.conn.cursor() as cur:
+                if statement_timeout_ms:
+                    cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(statement_timeout_ms)),))
+                cur.execute(self._sample_query(table_name, limit, tablesample_percent))
+                column_names = [desc[0] for desc in cur.description]
+                rows = cur.fetchall()
+            return column_names, rows
+        finally:
+            self.conn.rollback()
+
+    def sample_tables_batched(self, tables, limit=10, statement_timeout_ms=None, tablesample_percent=None, columns=None):
+        """
+        Samples many tables in a single round trip with one UNION ALL over `row_to_json`.
+
+        Args:
+            tables (list): The table names to sample.
+            columns (dict): Optional table -> column names, used to label tables that return no rows.
+
+        Returns:
+            dict: Table name -> `(column_names, rows)`, in input order.
+        """
+        if self.conn is None: self.connect()
+        if not tables:
+            return {}
+        parts = [
+            sql.SQL("(SELECT {} AS t, row_to_json(s)::text FROM ({}) s)").format(
+                sql.Literal(table_name), self._sample_query(table_name, limit, tablesample_percent))
+            for table_name in tables
+        ]
+        samples = {table_name: ([], []) for table_name in tables}
+        try:
+            with self.conn.cursor() as cur:
+                if statement_timeout_ms:
+                    cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(int(statement_timeout_ms)),))
+                cur.execute(sql.SQL(" UNION ALL ").join(parts))
+                for table_name, row_json in cur.fetchall():
+                    record = json.loads(row_json)
+                    column_names, rows = samples[table_name]
+                    if not column_names:
+                        column_names.extend(record.keys())
+                    rows.append(tuple(record.values()))
+        finally:
+            self.conn.rollback()
+        for table_name, (column_names, rows) in samples.items():
+            if not column_names and columns and table_name in columns:
+                column_names.extend(columns[table_name])
+        return samples
+
+    def get_table_samples_as_text(self, limit=10, ignore_tables=None, statement_timeout_ms=None, tablesample_percent=None):
+        """Samples every table serially on this connection and formats the rows as text."""
+        ignore_set = set(ignore_tables or [])
+        samples = {}
+        for table_name in self.list_tables():
+            if table_name in ignore_set:
+                continue
             try:
-                with self.conn.cursor() as sample_cur:
-                    query = "SELECT * FROM %s LIMIT %s"
-                    sample_cur.execute(query, (AsIs(table_name), limit))
-                    column_names = [desc[0] for desc in sample_cur.description]
-                    output_text += ", ".join(column_names) + "\n"
-                    rows = sample_cur.fetchall()
-                    for row in rows:
-                        output_text += ", ".join([str(cell) if cell is not None else 'NULL' for cell in row]) + "\n"
-                    output_text += "\n"
+                samples[table_name] = self.sample_table(table_name, limit=limit, statement_timeout_ms=statement_timeout_ms,
+                                                        tablesample_percent=tablesample_percent)
             except psycopg2.Error as e:
-                output_text += f"[Could not retrieve samples for table {table_name}: {e}]\n\n"
-                self.conn.rollback()
-        return output_text
\ No newline at end of file
+                samples[table_name] = e
+        return format_table_samples(samples)
@@ -0,0 +1,44 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on tool calls doing blocking I/O at the same time, across all sessions.
+DEFAULT_TOOL_WORKERS = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Returns the shared, bounded thread pool that blocking tool calls run on."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv("DATA_AGENT_TOOL_WORKERS", DEFAULT_TOOL_WORKERS))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="data-agent-tool")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking function on the tool executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_tool_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def async_tool(func):
+    """
+    Wraps a blocking tool function as a coroutine that runs on the tool executor.
+
+    The wrapper keeps the original name, signature and docstring, so the ADK agent
+    exposes exactly the same tool declaration to the model; ADK awaits coroutine tools
+    instead of calling them on the event loop.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,336 @@
+import datetime
+import decimal
+import json
+import os
+import re
+import sqlite3
+import string
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from urllib.parse import quote
+
+
+from .local_engine import TableWriter, flatten_record
+
+# Defaults for the top-level `federation` block in the YAML file.
+FEDERATION_DEFAULTS = {
+    'max_rows_per_table': 1000000,   # Rows copied from one Postgres table or API call set.
+    'fetch_size': 5000,              # Rows fetched from Postgres per round trip.
+    'max_api_calls': 500,            # Requests made for one API table.
+    'max_concurrency': 8,            # Parallel requests for an API table.
+}
+
+IDENTIFIER = r'(?:"(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_$]*)'
+QUALIFIED_NAME = re.compile(rf'({IDENTIFIER})\s*\.\s*({IDENTIFIER})')
+TABLE_REFERENCE = re.compile(
+    rf'\b(?:FROM|JOIN)\s+({IDENTIFIER})\s*\.\s*({IDENTIFIER})(?:\s+(?:AS\s+)?({IDENTIFIER}))?', re.IGNORECASE)
+CLAUSE_END = re.compile(r'\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|UNION|INTERSECT|EXCEPT|WINDOW)\b', re.IGNORECASE)
+LITERAL = r"(?:'(?:[^']|'')*'|-?\d+(?:\.\d+)?)"
+PREDICATE = re.compile(
+    rf'^\s*(?:({IDENTIFIER})\s*\.\s*)?({IDENTIFIER})\s*'
+    rf'(?:(=|<>|!=|<=|>=|<|>|NOT\s+LIKE|LIKE)\s*({LITERAL})|(NOT\s+IN|IN)\s*\(\s*({LITERAL}(?:\s*,\s*{LITERAL})*)\s*\)|(IS\s+NOT\s+NULL))\s*$',
+    re.IGNORECASE)
+STAR_PROJECTION = re.compile(rf'(?:\bSELECT\b(?:\s+DISTINCT\b)?|,)\s*(?:({IDENTIFIER})\s*\.\s*)?\*', re.IGNORECASE)
+KEYWORDS = {'where', 'join', 'on', 'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural', 'group', 'order',
+            'limit', 'having', 'union', 'using', 'window', 'intersect', 'except'}
+
+
+def _unquote(identifier: str) -> str:
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _literal_value(literal: str):
+    if literal.startswith("'"):
+        return literal[1:-1].replace("''", "'")
+    return float(literal) if "." in literal else int(literal)
+
+
+def _split_top_level(text: str, keyword: str) -> list:
+    """Splits `text` on a keyword outside parentheses and string literals."""
+    pattern = re.compile(rf'{keyword}\b', re.IGNORECASE)
+    parts, depth, start, in_string, i = [], 0, 0, False, 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            in_string = char != "'"     # A doubled quote ('') closes and reopens the literal.
+        elif char == "'":
+            in_string = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] == "_")):
+            match = pattern.match(text, i)
+            if match:
+                parts.append(text[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _convert(value):
+    """Turns a value fetched from Postgres into one SQLite can store."""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return str(value)
+
+
+class FederatedQuery:
+    """
+    Runs one SQL query across several configured data sources.
+
+    Tables are referenced as `<SOURCE>.<table>` and the query runs in a scratch in-memory
+    SQLite database (so it uses SQLite syntax) to which each referenced source is attached:
+
+    - 'sqlite' sources are attached read-only in place and 'file'/'json' sources through
+      their local-engine database, so SQLite evaluates filters on them directly;
+    - 'postgres' tables are copied into an attached schema, fetching only the referenced
+      columns and the rows that pass the query's simple `WHERE` conditions on that table
+      (`col = 'x'`, `col > 5`, `col IN (...)`, `col LIKE '...'`, ...), pushed down to Postgres;
+    - 'openapi' sources contribute tables declared in `api_tables`, filled from (cached)
+      API responses, optionally with one request per row of a `for_each` query.
+    """
+    def __init__(self, manager, query: str, api_tables: list = None, settings: dict = None):
+        self.manager = manager
+        self.query = query
+        self.api_tables = api_tables or []
+        self.settings = {**FEDERATION_DEFAULTS, **(settings or {})}
+        self.conn = sqlite3.connect(f"file:federated_{uuid.uuid4().hex}?mode=memory&cache=private",
+                                    uri=True, check_same_thread=False)
+        self.attached = {}      # lower-case source name -> source name
+        self.report = []        # How each source was brought in, for the tool output.
+
+    def close(self):
+        self.conn.close()
+
+    def referenced_tables(self) -> dict:
+        """Returns {source name: set of table names} for every `<SOURCE>.<table>` in the query."""
+        tables = {}
+        for source, table in QUALIFIED_NAME.findall(self.query):
+            source_name = self.manager.resolve_source_name(_unquote(source))
+            if source_name and self.manager.get_source(source_name).get('type') != 'openapi':
+                tables.setdefault(source_name, set()).add(_unquote(table))
+        return tables
+
+    def _attach(self, source_name: str, target: str):
+        self.conn.execute(f"ATTACH DATABASE ? AS {_quote(source_name)}", (target,))
+        self.attached[source_name.lower()] = source_name
+
+    def _schema_for(self, source_name: str):
+        if source_name.lower() not in self.attached:
+            self._attach(source_name, f"file:scratch_{uuid.uuid4().hex}?mode=memory")
+
+    def prepare(self):
+        """Attaches or copies every source the query (and its API tables) refers to."""
+        for spec in self.api_tables:
+            self._load_api_table(spec)
+        for source_name, tables in self.referenced_tables().items():
+            db_type = self.manager.get_source(source_name).get('type')
+            if source_name.lower() in self.attached and db_type != 'postgres':
+                continue
+            if db_type == 'sqlite':
+                path = os.path.abspath(self.manager.get_source(source_name)['db_file'])
+                if not os.path.exists(path):
+                    raise ValueError(f"SQLite file for '{source_name}' not found: {path}")
+                self._attach(source_name, f"file:{quote(path)}?mode=ro")
+                self.report.append(f"{source_name}: attached SQLite file")
+            elif db_type in ('file', 'json'):
+                self._attach(source_name, self.manager.load_local_source(source_name).uri)
+                self.report.append(f"{source_name}: attached local-engine tables")
+            elif db_type == 'postgres':
+                for table in sorted(tables):
+                    self._copy_postgres_table(source_name, table)
+            else:
+                raise ValueError(f"Data source '{source_name}' of type '{db_type}' cannot be used in a federated query.")
+
+    def _aliases(self) -> dict:
+        """Maps every alias (and `SOURCE.table`) in FROM/JOIN clauses to (source, table)."""
+        aliases = {}
+        for source, table, alias in TABLE_REFERENCE.findall(self.query):
+            key = (_unquote(source).lower(), _unquote(table).lower())
+            aliases[f"{key[0]}.{key[1]}"] = key
+            if alias and _unquote(alias).lower() not in KEYWORDS:
+                aliases[_unquote(alias).lower()] = key
+            aliases.setdefault(key[1], key)
+        return aliases
+
+    def pushdown_filters(self, source_name: str, table: str, columns: set, all_columns: dict) -> list:
+        """
+        Returns the WHERE conditions of the query that only involve `source_name.table`, as
+        `(column, operator, value)` tuples that Postgres can evaluate before the copy.
+        Only plain conjunctions in a query without subqueries are considered, and only
+        conditions that reject NULLs, so that pushing them below outer joins is safe.
+        """
+        if len(re.findall(r'\bSELECT\b', self.query, re.IGNORECASE)) != 1:
+            return []
+        where = re.search(r'\bWHERE\b', self.query, re.IGNORECASE)
+        if not where:
+            return []
+        clause = self.query[where.end():]
+        end = CLAUSE_END.search(clause)
+        clause = clause[:end.start()] if end else clause
+        if len(_split_top_level(clause, "OR")) > 1 or re.search(r'\bBETWEEN\b', clause, re.IGNORECASE):
+            return []
+
+        aliases = self._aliases()
+        me = (source_name.lower(), table.lower())
+        filters = []
+        for condition in _split_top_level(clause, "AND"):
+            match = PREDICATE.match(condition)
+            if not match:
+                continue
+            qualifier, column, operator, literal, in_operator, in_list, not_null = match.groups()
+            column = _unquote(column)
+            if qualifier:
+                if aliases.get(_unquote(qualifier).lower()) != me:
+                    continue
+            elif sum(column.lower() in cols for cols in all_columns.values()) != 1 or column.lower() not in all_columns.get(me, ()):
+                continue    # Unqualified and not unique to this table.
+            if column.lower() not in columns:
+                continue
+            if not_null:
+                filters.append((column, "IS NOT NULL", None))
+            elif in_operator:
+                values = [_literal_value(v) for v in re.findall(LITERAL, in_list)]
+                filters.append((column, " ".join(in_operator.upper().split()), values))
+            else:
+                operator = " ".join(operator.upper().split())
+                # SQLite's LIKE is case-insensitive (for ASCII), so ILIKE keeps the same matches.
+                operator = {"LIKE": "ILIKE", "NOT LIKE": "NOT ILIKE", "!=": "<>"}.get(operator, operator)
+                filters.append((column, operator, _literal_value(literal)))
+        return filters
+
+    def _copy_postgres_table(self, source_name: str, table: str):
+        """Copies the referenced columns and pushed-down rows of a Postgres table into the scratch database."""
+        from psycopg2 import sql  # Only federated queries over Postgres sources need it.
+        schema = self.manager.get_schema(source_name)
+        table_info = next((t for name, t in schema.tables.items() if name.lower() == table.lower()), None)
+        if table_info is None:
+            raise ValueError(f"Table '{table}' not found in data source '{source_name}'.")
+        table_columns = {c.name.lower(): c.name for c in table_info.columns}
+
+        # Column names known for every referenced table, to tell which one an unqualified column belongs to.
+        all_columns = {}
+        for other_source, other_tables in self.referenced_tables().items():
+            other_schema = self.manager.get_schema(other_source)
+            for name, info in other_schema.tables.items():
+                if name.lower() in {t.lower() for t in other_tables}:
+                    all_columns[(other_source.lower(), name.lower())] = {c.name.lower() for c in info.columns}
+
+        star = any(not qualifier or _unquote(qualifier).lower() in (table.lower(), *[
+            alias for alias, key in self._aliases().items() if key == (source_name.lower(), table.lower())])
+            for qualifier in STAR_PROJECTION.findall(self.query))
+        words = {w.lower() for w in re.findall(r'[A-Za-z_][A-Za-z0-9_$]*', self.query)}
+        words |= {_unquote(w).lower() for w in re.findall(r'"(?:[^"]|"")+"', self.query)}
+        if star:
+            columns = list(table_columns.values())
+        else:
+            columns = [name for key, name in table_columns.items() if key in words] or [table_info.columns[0].name]
+        filters = self.pushdown_filters(source_name, table, {c.lower() for c in columns}, all_columns)
+
+        conditions = []
+        for column, operator, value in filters:
+            if operator == "IS NOT NULL":
+                conditions.append(sql.SQL("{} IS NOT NULL").format(sql.Identifier(table_columns[column.lower()])))
+            elif operator in ("IN", "NOT IN"):
+                conditions.append(sql.SQL("{} {} ({})").format(
+                    sql.Identifier(table_columns[column.lower()]), sql.SQL(operator),
+                    sql.SQL(", ").join(sql.Literal(v) for v in value)))
+            else:
+                conditions.append(sql.SQL("{} {} {}").format(
+                    sql.Identifier(table_columns[column.lower()]), sql.SQL(operator), sql.Literal(value)))
+        statement = sql.SQL("SELECT {} FROM {}").format(
+            sql.SQL(", ").join(sql.Identifier(c) for c in columns), sql.Identifier(table_info.name))
+        if conditions:
+            statement += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+        statement += sql.SQL(" LIMIT {}").format(sql.Literal(int(self.settings['max_rows_per_table']) + 1))
+
+        self._schema_for(source_name)
+        target = f"{_quote(source_name)}.{_quote(table_info.name)}"
+        self.conn.execute(f"CREATE TABLE {target} ({', '.join(_quote(c) for c in columns)})")
+        insert = f"INSERT INTO {target} VALUES ({', '.join('?' for _ in columns)})"
+        start, copied = time.perf_counter(), 0
+        with self.manager.connection(source_name) as db:
+            _, batches = db.stream_query(statement.as_string(db.conn), fetch_size=int(self.settings['fetch_size']))
+            with closing(batches):
+                for batch in batches:
+                    copied += len(batch)
+                    if copied > int(self.settings['max_rows_per_table']):
+                        raise ValueError(
+                            f"More than {self.settings['max_rows_per_table']} rows would be copied from "
+                            f"{source_name}.{table_info.name}; add filters on that table to the WHERE clause.")
+                    self.conn.executemany(insert, ([_convert(v) for v in row] for row in batch))
+        pushed = f", pushed down: {' AND '.join(f'{c} {o}' + ('' if v is None else f' {v!r}') for c, o, v in filters)}" if filters else ""
+        self.report.append(f"{source_name}.{table_info.name}: copied {copied} rows x {len(columns)} columns "
+                           f"from Postgres in {time.perf_counter() - start:.2f}s{pushed}")
+
+    def _load_api_table(self, spec: dict):
+        """
+        Loads an API table: `{"source", "table", "endpoint", "method", "data", "for_each"}`.
+        `endpoint` may hold `{column}` placeholders filled from each row of the `for_each`
+        query (which runs on the federated database); those columns are added to the rows.
+        """
+        source_name = spec.get('source')
+        table = spec.get('table')
+        endpoint = spec.get('endpoint')
+        if not (source_name and table and endpoint):
+            raise ValueError(f"API tables need 'source', 'table' and 'endpoint', got {spec!r}.")
+        source_name = self.manager.resolve_source_name(source_name) or source_name
+        if self.manager.get_source(source_name).get('type') != 'openapi':
+            raise ValueError(f"Data source '{source_name}' is not an OpenAPI source.")
+
+        params = [{}]
+        if spec.get('for_each'):
+            inner = FederatedQuery(self.manager, spec['for_each'], settings=self.settings)
+            try:
+                inner.prepare()
+                cursor = inner.conn.execute(spec['for_each'])
+                names = [d[0] for d in cursor.description]
+                params = [dict(zip(names, row)) for row in cursor.fetchmany(int(self.settings['max_api_calls']) + 1)]
+            finally:
+                inner.close()
+            if len(params) > int(self.settings['max_api_calls']):
+                raise ValueError(f"The for_each query of API table '{table}' returns more than "
+                                 f"{self.settings['max_api_calls']} rows; narrow it down.")
+        placeholders = {name for _, name, _, _ in string.Formatter().parse(endpoint) if name}
+
+        def call(row):
+            missing = placeholders - set(row)
+            if missing:
+                raise ValueError(f"Endpoint placeholders {sorted(missing)} are not columns of the for_each query.")
+            url = endpoint.format(**{k: quote(str(v), safe='') for k, v in row.items()})
+            return json.loads(self.manager.call_api(source_name, url, spec.get('method', 'GET'), spec.get('data')))
+
+        start = time.perf_counter()
+        workers = max(1, min(int(self.settings['max_concurrency']), len(params)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="federated-api") as pool:
+            responses = list(pool.map(call, params))
+
+        self._schema_for(source_name)
+        writer = TableWriter(self.conn, table, schema=source_name)
+        for row, response in zip(params, responses):
+            records = response if isinstance(response, list) else [response]
+            for record in records:
+                flat = flatten_record(record)
+                writer.add({**{k: _convert(v) for k, v in row.items() if k not in flat}, **flat})
+        rows = writer.close()
+        self.report.append(f"{source_name}.{table}: {rows} rows from {len(params)} API calls "
+                           f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,514 @@
+import codecs
+import json
+import mmap
+import os
+import re
+from contextlib import contextmanager
+
+# Defaults for the per-source `read_limits` block in the YAML file.
+READ_LIMIT_DEFAULTS = {
+    'chunk_size': 65536,      # Bytes read from the file or HTTP response at a time.
+    'max_bytes': 20000,       # Characters returned to the LLM per call.
+    'page_size': 50,          # Lines / JSON items returned when no limit is given.
+    'preview_lines': 20,      # Lines (or JSON items) in the preview of a large source.
+    'max_paths': 200,         # JSON paths kept in a structural summary.
+    'max_value_bytes': 10000000,  # Largest single JSON value decoded at once.
+}
+
+TOKEN = re.compile(
+    r'\s*(?:([{}\[\]:,])|("(?:[^"\\]|\\.)*")|(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)|(true|false|null))'
+)
+LITERALS = {"true": True, "false": False, "null": None}
+TOO_LARGE = object()    # Returned by `JsonReader.read_value()` for a value over its size cap.
+
+
+def is_url(path: str) -> bool:
+    return path.startswith('http://') or path.startswith('https://')
+
+
+class ByteSource:
+    """A local file (read through mmap) or URL (streamed in chunks) that is read without loading it whole."""
+    def __init__(self, path: str, http_client=None, chunk_size: int = 65536):
+        self.path = path
+        self.http_client = http_client
+        self.chunk_size = chunk_size
+
+    def size(self):
+        """Size in bytes, or None when a server does not report it."""
+        if not is_url(self.path):
+            return os.path.getsize(self.path)
+        response = self.http_client.request("HEAD", self.path, allow_redirects=True)
+        length = response.headers.get("Content-Length") if response.ok else None
+        return int(length) if length and length.isdigit() else None
+
+    @contextmanager
+    def chunks(self):
+        """Yields an iterator over the source's bytes in `chunk_size` pieces."""
+        if is_url(self.path):
+            response = self.http_client.get(self.path, stream=True)
+            try:
+                response.raise_for_status()
+                yield response.iter_content(chunk_size=self.chunk_size)
+            finally:
+                response.close()
+            return
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield iter(())
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield (mapped[i:i + self.chunk_size] for i in range(0, len(mapped), self.chunk_size))
+
+
+def decode_chunks(chunks):
+    """Decodes UTF-8 byte chunks to text incrementally (a multi-byte character may span chunks)."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_lines(chunks):
+    """Yields the lines (without line endings) of a stream of byte chunks."""
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b'\r').decode('utf-8', errors='replace')
+    if pending:
+        yield pending.rstrip(b'\r').decode('utf-8', errors='replace')
+
+
+def _child_prefix(prefix: str, name: str) -> str:
+    return f"{prefix}.{name}" if prefix else name
+
+
+class JsonReader:
+    """
+    An incremental JSON parser over byte chunks.
+
+    `events` yields ijson-style `(prefix, event, value)` tuples; array members have the prefix
+    `<array>.item`. Right after a `start_map`/`start_array` event, `read_value()` decodes that
+    whole container with the C `json` decoder instead (no further events are produced for
+    it), which is how array items are built or skipped quickly. Memory use is bounded by the
+    largest value decoded at once, not by the document.
+    """
+    def __init__(self, chunks):
+        self._texts = decode_chunks(chunks)
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._token_start = 0
+        self._eof = False
+        self._stack = []        # [kind, prefix, key_prefix, expecting_key]
+        self.events = self._events()
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """Appends chunks to the unread part of the buffer until it holds `min_size` characters."""
+        buffer = self._buffer[self._pos:]
+        self._token_start -= self._pos
+        self._pos = 0
+        added = False
+        while True:
+            chunk = next(self._texts, None)
+            if chunk is None:
+                self._eof = True
+                break
+            buffer += chunk
+            added = True
+            if len(buffer) >= min_size:
+                break
+        self._buffer = buffer
+        return added
+
+    def _value_prefix(self) -> str:
+        if not self._stack:
+            return ""
+        top = self._stack[-1]
+        return _child_prefix(top[1], "item") if top[0] == "array" else top[2]
+
+    def _events(self):
+        while True:
+            match = TOKEN.match(self._buffer, self._pos)
+            # A token that reaches the end of the buffer may be cut off: read more first
+            # (a number needs two characters of lookahead, e.g. "2" followed by ".5" or "e+3").
+            if not self._eof and (match is None or match.end() + (2 if match.group(3) else 0) >= len(self._buffer)):
+                self._fill()
+                continue
+            if match is None:
+                rest = self._buffer[self._pos:]
+                if rest.strip():
+                    raise ValueError(f"Invalid JSON near: {rest[:40]!r}")
+                if self._stack:
+                    raise ValueError("Unexpected end of JSON document.")
+                return
+            self._pos = match.end()
+            self._token_start = match.start(match.lastindex)
+            punct, string, number, literal = match.groups()
+            if punct:
+                if punct in "{[":
+                    prefix = self._value_prefix()
+                    kind = "map" if punct == "{" else "array"
+                    self._stack.append([kind, prefix, None, kind == "map"])
+                    yield prefix, f"start_{kind}", None
+                elif punct in "}]":
+                    if not self._stack:
+                        raise ValueError(f"Unexpected '{punct}' in JSON document.")
+                    kind, prefix = self._stack.pop()[:2]
+                    yield prefix, f"end_{kind}", None
+                elif punct == "," and self._stack and self._stack[-1][0] == "map":
+                    self._stack[-1][3] = True
+            elif string is not None:
+                value = json.loads(string)
+                top = self._stack[-1] if self._stack else None
+                if top and top[0] == "map" and top[3]:
+                    top[2], top[3] = _child_prefix(top[1], value), False
+                    yield top[1], "map_key", value
+                else:
+                    yield self._value_prefix(), "string", value
+            elif number is not None:
+                value = float(number) if any(c in number for c in ".eE") else int(number)
+                yield self._value_prefix(), "number", value
+            else:
+                value = LITERALS[literal]
+                yield self._value_prefix(), "null" if value is None else "boolean", value
+
+    def read_value(self, max_size: int = None):
+        """
+        Decodes the container whose start event was just yielded and returns it. If it is
+        larger than `max_size` characters, returns `TOO_LARGE` instead and leaves the
+        container to be read through further events.
+        """
+        entry = self._stack.pop()
+        token_length = self._pos - self._token_start
+        self._pos = self._token_start
+        while True:
+            try:
+                value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+            except json.JSONDecodeError as e:
+                # Errors in the last few characters may just be a token cut off by the chunk
+                # boundary (e.g. 'tru' or '1.5e+'); a real error stays put when more is read.
+                incomplete = e.pos >= len(self._buffer) - 6 or e.msg.startswith("Unterminated string")
+                if not incomplete or self._eof:
+                    raise ValueError(f"Invalid JSON: {e.msg}") from None
+                if max_size and len(self._buffer) - self._pos > max_size:
+                    self._stack.append(entry)
+                    self._pos += token_length
+                    return TOO_LARGE
+                # Grow geometrically so a large value is not re-decoded once per chunk.
+                self._fill(2 * (len(self._buffer) - self._pos))
+
+    def skip_value(self, max_size: int = None):
+        """Skips the rest of the container whose start event was just yielded."""
+        depth = 1
+        for _, event, _ in self.events:
+            if event in ("start_map", "start_array"):
+                # Children are skipped by decoding them, unless they are too large too.
+                if self.read_value(max_size) is TOO_LARGE:
+                    depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+def json_events(chunks):
+    """Yields the ijson-style events of a JSON document read from byte chunks."""
+    return JsonReader(chunks).events
+
+
+def normalize_json_path(path: str) -> str:
+    """Accepts 'a.b', '$.a.b', 'a[*].b' or 'a[].b' and returns the ijson-style prefix 'a.b' / 'a.item.b'."""
+    path = (path or "").strip()
+    if path.startswith("$"):
+        path = path[1:]
+    path = re.sub(r"\[(\*|\d*)\]", ".item", path)
+    return ".".join(part for part in path.split(".") if part)
+
+
+def _container_value(reader: JsonReader, prefix: str, event: str, max_size: int):
+    """Decodes a container value, or skips it and returns a placeholder when it is too large."""
+    value = reader.read_value(max_size)
+    if value is TOO_LARGE:
+        reader.skip_value(max_size)
+        kind = "object" if event == "start_map" else "array"
+        if prefix == "item" or prefix.endswith(".item"):
+            return f"<{kind} larger than {max_size} bytes: select its fields with json_path '{prefix}.<field>'>"
+        return f"<{kind} larger than {max_size} bytes: select it with json_path '{prefix}'>"
+    return value
+
+
+def select_json(reader: JsonReader, path: str, offset: int = 0, limit: int = 50, max_value_bytes: int = None):
+    """
+    Returns `(values, has_more)` for the value at `path`, reading only as far as needed.
+
+    An array yields its items `offset`..`offset+limit`, an object its members as one-key
+    objects, and a scalar itself. A path through arrays ('a.item.b') matches one value per
+    item, which are paged the same way. Values over `max_value_bytes` are replaced by a note.
+    """
+    prefix = normalize_json_path(path)
+    many = "item" in prefix.split(".")
+    values, seen = [], 0
+    events = reader.events
+    for event_prefix, event, value in events:
+        if event_prefix != prefix or event in ("end_map", "end_array", "map_key"):
+            continue
+        if event == "start_array" and not many:
+            item_prefix = _child_prefix(prefix, "item")
+            for item_path, item_event, item in events:
+                if item_event == "end_array" and item_path == prefix:
+                    break
+                if len(values) >= limit:
+                    return values, True
+                if item_event in ("start_map", "start_array"):
+                    item = _container_value(reader, item_path, item_event, max_value_bytes)
+                if seen >= offset:
+                    values.append(item)
+                seen += 1
+            return values, False
+        if event == "start_map" and not many:
+            key = None
+            for member_path, member_event, member in events:
+                if member_event == "end_map" and member_path == prefix:
+                    break
+                if member_event == "map_key":
+                    key = member
+                    continue
+                if len(values) >= limit:
+                    return values, True
+                if member_event in ("start_map", "start_array"):
+                    member = _container_value(reader, member_path, member_event, max_value_bytes)
+                if seen >= offset:
+                    values.append({key: member})
+                seen += 1
+            return values, False
+        # A scalar, or one of the values matched by a path through arrays.
+        if len(values) >= limit:
+            return values, True
+        if event in ("start_map", "start_array"):
+            value = _container_value(reader, event_prefix, event, max_value_bytes)
+        if seen >= offset:
+            values.append(value)
+        seen += 1
+        if not many:
+            return values, False
+    if seen == 0 and not many:
+        raise ValueError(f"JSON path '{path}' not found.")
+    return values, False
+
+
+class _StructureSummary:
+    """Per-path statistics of a JSON document: types, value counts and a few examples."""
+    def __init__(self, max_paths: int):
+        self.max_paths = max_paths
+        self.paths = {}
+        self.dropped = 0
+
+    def record(self, prefix: str, kind: str, value=None):
+        entry = self.paths.get(prefix)
+        if entry is None:
+            if len(self.paths) >= self.max_paths:
+                self.dropped += 1
+                return
+            entry = self.paths[prefix] = {"types": {}, "count": 0, "examples": []}
+        entry["types"][kind] = entry["types"].get(kind, 0) + 1
+        entry["count"] += 1
+        if kind not in ("object", "array") and entry["count"] <= 20 and len(entry["examples"]) < 3:
+            text = json.dumps(value, ensure_ascii=False)
+            text = text if len(text) <= 40 else text[:37] + "..."
+            if text not in entry["examples"]:
+                entry["examples"].append(text)
+
+    def walk(self, prefix: str, value):
+        if isinstance(value, dict):
+            self.record(prefix, "object")
+            for key, child in value.items():
+                self.walk(_child_prefix(prefix, key), child)
+        elif isinstance(value, list):
+            self.record(prefix, "array")
+            item_prefix = _child_prefix(prefix, "item")
+            for child in value:
+                self.walk(item_prefix, child)
+        elif isinstance(value, str):
+            self.record(prefix, "string", value)
+        elif isinstance(value, bool):
+            self.record(prefix, "boolean", value)
+        elif value is None:
+            self.record(prefix, "null")
+        else:
+            self.record(prefix, "number", value)
+
+    def to_text(self) -> str:
+        lines = []
+        for prefix, entry in self.paths.items():
+            line = f"- {prefix or '(root)'}: {' | '.join(entry['types'])}"
+            if "array" in entry["types"]:
+                items = self.paths.get(_child_prefix(prefix, "item"), {}).get("count", 0)
+                arrays = entry["types"]["array"]
+                line += f" ({items} items)" if arrays == 1 else f" ({arrays} arrays, {items} items in total)"
+            elif entry["count"] > 1:
+                line += f" ({entry['count']} values)"
+            if entry["examples"]:
+                line += f", e.g. {', '.join(entry['examples'])}"
+            lines.append(line)
+        if self.dropped:
+            lines.append(f"... {self.dropped} values under further paths not listed.")
+        return "\n".join(lines)
+
+
+def summarize_json(reader: JsonReader, max_paths: int = 200, max_value_bytes: int = None) -> str:
+    """
+    Describes the structure of a JSON document: every path with its type(s), the number of
+    values seen, array sizes and a few example values. Array members up to `max_value_bytes`
+    are decoded whole, which is much faster than walking their events.
+    """
+    summary = _StructureSummary(max_paths)
+    for prefix, event, value in reader.events:
+        if event in ("end_map", "end_array", "map_key"):
+            continue
+        if event in ("start_map", "start_array"):
+            value = reader.read_value(max_value_bytes) if prefix == "item" or prefix.endswith(".item") else TOO_LARGE
+            if value is TOO_LARGE:
+                summary.record(prefix, "object" if event == "start_map" else "array")
+            else:
+                summary.walk(prefix, value)
+        else:
+            summary.record(prefix, event, value)
+    return summary.to_text()
+
+
+def format_json_page(values: list, has_more: bool, offset: int, max_bytes: int, label: str) -> str:
+    """Renders selected JSON values one compact document per line within `max_bytes`."""
+    lines, used = [], 0
+    for i, value in enumerate(values):
+        line = json.dumps(value, ensure_ascii=False)
+        if used + len(line) > max_bytes and lines:
+            has_more = True
+            values = values[:i]
+            break
+        lines.append(line if len(line) <= max_bytes else line[:max_bytes] + " ... (value truncated)")
+        used += len(line) + 1
+    end = offset + len(lines)
+    header = f"{label}: items {offset}-{end - 1}" if lines else f"{label}: no items at offset {offset}"
+    if has_more:
+        header += f" (more available, continue with offset={end})"
+    return header + "\n" + "\n".join(lines)
+
+
+def read_text_page(lines, offset: int, limit: int, max_bytes: int, label: str) -> str:
+    """Returns lines `offset`..`offset+limit` of a line iterator within `max_bytes`."""
+    page, used, has_more = [], 0, False
+    for number, line in enumerate(lines):
+        if number < offset:
+            continue
+        if len(page) >= limit or (used + len(line) > max_bytes and page):
+            has_more = True
+            break
+        page.append(line if len(line) <= max_bytes else line[:max_bytes] + " ... (line truncated)")
+        used += len(line) + 1
+    end = offset + len(page)
+    header = f"{label}: lines {offset}-{end - 1}" if page else f"{label}: no lines at offset {offset}"
+    if has_more:
+        header += f" (more available, continue with offset={end})"
+    return header + "\n" + "\n".join(page)
+
+
+def summarize_text(source: ByteSource, preview_lines: int, max_bytes: int) -> str:
+    """Counts the lines and bytes of a text source and returns them with its first lines."""
+    line_count = size = 0
+    last = b''
+    with source.chunks() as chunks:
+        for chunk in chunks:
+            size += len(chunk)
+            line_count += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last and last != b'\n':
+        line_count += 1
+    with source.chunks() as chunks:
+        preview = read_text_page(iter_lines(chunks), 0, preview_lines, max_bytes, "Preview")
+    return f"Size: {size} bytes, {line_count} lines.\n{preview}"
+
+
+def sniff_json(source: ByteSource) -> bool:
+    """Whether the source looks like a JSON document (by extension or first character)."""
+    if source.path.split('?')[0].lower().endswith('.json'):
+        return True
+    with source.chunks() as chunks:
+        for text in decode_chunks(chunks):
+            stripped = text.lstrip('\ufeff \t\r\n')
+            if stripped:
+                return stripped[0] in '{['
+    return False
+
+
+def _counting(chunks, counter: list):
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def read_head(source: ByteSource, max_bytes: int) -> bytes:
+    """Returns at most `max_bytes` bytes from the start of the source."""
+    head = b''
+    with source.chunks() as chunks:
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= max_bytes:
+                break
+    return head[:max_bytes]
+
+
+def read_source(source: ByteSource, label: str, limits: dict, offset: int = 0, limit: int = 0,
+                json_path: str = "", as_json: bool = None, format_small=None) -> str:
+    """
+    Reads a file or URL with bounded memory and returns at most `limits['max_bytes']` characters.
+
+    Without paging arguments, a source that fits the budget is returned whole (through
+    `format_small` if given); a larger one gets a structural summary and a preview instead.
+    `offset`/`limit` page through lines of text, or through the items of the JSON array at
+    `json_path` ('' is the document root).
+    """
+    max_bytes = int(limits['max_bytes'])
+    max_value = int(limits['max_value_bytes'])
+    paging = bool(offset or limit or json_path)
+    limit = int(limit or limits['page_size'])
+    if as_json is None:
+        as_json = sniff_json(source)
+
+    if not paging:
+        head = read_head(source, max_bytes + 1)
+        if len(head) <= max_bytes:
+            text = head.decode('utf-8', errors='replace')
+            return format_small(text) if format_small else text
+
+    if paging:
+        with source.chunks() as chunks:
+            if as_json:
+                values, has_more = select_json(JsonReader(chunks), json_path, offset, limit, max_value)
+                return format_json_page(values, has_more, offset, max_bytes, f"{label} {json_path or '(root)'}")
+            if json_path:
+                raise ValueError(f"'{label}' is not a JSON document; json_path cannot be used.")
+            return read_text_page(iter_lines(chunks), offset, limit, max_bytes, label)
+
+    if not as_json:
+        return f"{label} is too large to return whole. {summarize_text(source, int(limits['preview_lines']), max_bytes)}"
+
+    size = [0]
+    with source.chunks() as chunks:
+        structure = summarize_json(JsonReader(_counting(chunks, size)), int(limits['max_paths']), max_value)
+    output = (f"{label} is a JSON document of {size[0]} bytes, too large to return whole.\n"
+              f"Structure (paths use 'item' for array members):\n{structure}\n")
+    if read_head(source, 64).decode('utf-8', errors='replace').lstrip('\ufeff \t\r\n').startswith('['):
+        with source.chunks() as chunks:
+            preview, has_more = select_json(JsonReader(chunks), "", 0, int(limits['preview_lines']), max_value)
+        output += format_json_page(preview, has_more, 0, max_bytes // 2, "Preview") + "\n"
+    output += "Use json_path with offset/limit to read the items you need."
+    return output[:max_bytes]
+
@@ -0,0 +1,337 @@
+import itertools
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Defaults for the top-level `flow_runner` block in the YAML file.
+FLOW_RUNNER_DEFAULTS = {
+    'flow_dir': 'flows',                # Where save_prefect_flow writes flows and run_prefect_flow finds them.
+    'log_dir': 'flow_logs',             # One log file (stdout and stderr) per job.
+    'max_workers': 2,                   # Flows running at the same time.
+    'max_per_flow': 1,                  # Runs of the same flow at the same time.
+    'max_queued': 20,                   # Jobs waiting for a worker; more are rejected.
+    'warm_interpreters': 2,             # Idle interpreters kept ready with `preload` imported (0 disables).
+    'preload': ['prefect', 'dotenv'],   # Modules the warm interpreters import ahead of a job.
+    'timeout': 3600,                    # Seconds a job may run before it is killed (0 = no limit).
+    'max_jobs': 200,                    # Finished jobs remembered (their logs stay on disk).
+    'tail_lines': 20,                   # Log lines returned with a job's status.
+}
+
+# The project root, so flows can import its modules (e.g. `from etl import incremental_sync`).
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled", "timed_out")
+FINISHED_STATES = ("succeeded", "failed", "cancelled", "timed_out")
+
+# Runs in each warm interpreter: imports the preload modules, then waits for one job on stdin,
+# points stdout/stderr at the job's log file and runs the flow file as `python <file>` would.
+BOOTSTRAP = """
+import importlib, json, os, runpy, sys
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        pass
+line = sys.stdin.readline()
+if not line:
+    sys.exit(0)
+job = json.loads(line)
+log = os.open(job["log"], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+os.dup2(log, 1)
+os.dup2(log, 2)
+sys.argv = [job["path"]]
+sys.path[0] = os.path.dirname(os.path.abspath(job["path"]))
+runpy.run_path(job["path"], run_name="__main__")
+"""
+
+
+class FlowJob:
+    __slots__ = ("id", "flow_name", "path", "log_path", "status", "exit_code", "submitted_at", "started_at",
+                 "finished_at", "process", "cancel_requested", "done")
+
+    def __init__(self, job_id: str, flow_name: str, path: str, log_path: str):
+        self.id = job_id
+        self.flow_name = flow_name
+        self.path = path
+        self.log_path = log_path
+        self.status = "queued"
+        self.exit_code = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.cancel_requested = False
+        self.done = threading.Event()
+
+    def describe(self) -> dict:
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "flow": self.flow_name,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "queued_s": round((self.started_at or self.finished_at or now) - self.submitted_at, 1),
+            "running_s": round((self.finished_at or now) - self.started_at, 1) if self.started_at else None,
+            "log": self.log_path,
+        }
+
+
+def tail_file(path: str, lines: int, block_size: int = 8192) -> str:
+    """The last `lines` lines of a file, read backwards from its end."""
+    if lines <= 0 or not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position, data = f.tell(), b""
+        while position > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return b"\n".join(data.rstrip(b"\n").split(b"\n")[-lines:]).decode("utf-8", "replace")
+
+
+class FlowRunner:
+    """
+    Runs saved Prefect flows as background jobs, so a long ETL flow doesn't hold up the
+    agent's turn or hit a fixed timeout.
+
+    Submitted jobs wait in a queue with an ID; `max_workers` worker threads take them in
+    order, skipping flows that already run `max_per_flow` times. Each job runs in its own
+    Python process, taken from a small pool of interpreters that were started ahead of time
+    and have already imported `preload` (Prefect's import alone takes seconds); a used
+    interpreter is replaced by a fresh one when its job ends. The flow's stdout and stderr
+    go straight to a log file, so output is never buffered in the app and can be tailed
+    while it runs.
+    Jobs can be polled, waited for and cancelled (the flow's whole process group is killed).
+    """
+    def __init__(self, flow_dir: str = "flows", log_dir: str = "flow_logs", max_workers: int = 2,
+                 max_per_flow: int = 1, max_queued: int = 20, warm_interpreters: int = 2, preload=(),
+                 timeout: float = 3600, max_jobs: int = 200, tail_lines: int = 20):
+        self.flow_dir = flow_dir
+        self.log_dir = log_dir
+        self.max_workers = max(1, int(max_workers))
+        self.max_per_flow = max(1, int(max_per_flow))
+        self.max_queued = int(max_queued)
+        self.warm_interpreters = int(warm_interpreters)
+        self.preload = list(preload or [])
+        self.timeout = float(timeout)
+        self.max_jobs = int(max_jobs)
+        self.tail_lines = int(tail_lines)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue = deque()
+        self._jobs = OrderedDict()        # job ID -> FlowJob, oldest first
+        self._running = {}                # flow name -> jobs running
+        self._idle = deque()              # warm interpreters waiting for a job
+        self._workers = []
+        self._counter = itertools.count(1)
+        self._closed = False
+        self._stats = {"submitted": 0, "warm_starts": 0, "cold_starts": 0}
+
+    def flow_path(self, flow_name: str) -> str:
+        """The file of a saved flow, raising ValueError for names that aren't plain file names."""
+        if not flow_name or os.path.basename(flow_name) != flow_name or flow_name.startswith("."):
+            raise ValueError(f"Invalid flow name '{flow_name}'.")
+        return os.path.join(self.flow_dir, f"{flow_name}.py")
+
+    def _spawn(self) -> subprocess.Popen:
+        posix = os.name == "posix"
+        return subprocess.Popen(
+            [sys.executable, "-c", BOOTSTRAP, *self.preload],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            env={**os.environ, "PYTHONUNBUFFERED": "1",
+                 "PYTHONPATH": os.pathsep.join(filter(None, [PROJECT_ROOT, os.environ.get("PYTHONPATH")]))},
+            # Its own process group, so cancelling also stops whatever the flow started.
+            start_new_session=posix,
+        )
+
+    def warm(self):
+        """Starts the workers, and the warm interpreters that aren't running yet."""
+        with self._lock:
+            if self._closed:
+                return
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"flow-runner-{len(self._workers) + 1}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._idle = deque(process for process in self._idle if process.poll() is None)
+            while len(self._idle) < self.warm_interpreters:
+                self._idle.append(self._spawn())
+
+    def _interpreter(self) -> subprocess.Popen:
+        with self._lock:
+            while self._idle:
+                process = self._idle.popleft()
+                if process.poll() is None:
+                    self._stats["warm_starts"] += 1
+                    return process
+            self._stats["cold_starts"] += 1
+        return self._spawn()
+
+    def submit(self, flow_name: str) -> FlowJob:
+        """Queues a run of a saved flow; raises ValueError if it doesn't exist or the queue is full."""
+        path = self.flow_path(flow_name)
+        if not os.path.exists(path):
+            raise ValueError(f"Flow file '{flow_name}.py' not found.")
+        os.makedirs(self.log_dir, exist_ok=True)
+        with self._lock:
+            if self._closed:
+                raise ValueError("The flow runner is shut down.")
+            if len(self._queue) >= self.max_queued:
+                raise ValueError(f"Too many queued flow runs ({len(self._queue)}); wait for some to finish "
+                                 f"or cancel them.")
+            job_id = f"job-{next(self._counter)}"
+            log_path = os.path.join(self.log_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{job_id}-{flow_name}.log")
+            job = FlowJob(job_id, flow_name, path, log_path)
+            self._jobs[job_id] = job
+            self._queue.append(job)
+            self._stats["submitted"] += 1
+            self._forget_finished()
+            self._changed.notify_all()
+        if not self._workers:
+            self.warm()
+        return job
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        for job in self._queue:
+            if self._running.get(job.flow_name, 0) < self.max_per_flow:
+                self._queue.remove(job)
+                return job
+        return None
+
+    def _finish(self, job: FlowJob, status: str, exit_code: int = None):
+        with self._lock:
+            if job.started_at is not None:
+                self._running[job.flow_name] -= 1
+            job.status = status
+            job.exit_code = exit_code
+            job.finished_at = time.time()
+            job.process = None
+            self._changed.notify_all()
+            # Replace the used interpreter now, so its imports don't compete with running flows.
+            if not self._closed and len(self._idle) < self.warm_interpreters:
+                self._idle.append(self._spawn())
+        job.done.set()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job = None
+                while not self._closed and (job := self._next_job()) is None:
+                    self._changed.wait()
+                if job is None:
+                    return
+                job.status = "running"
+                job.started_at = time.time()
+                self._running[job.flow_name] = self._running.get(job.flow_name, 0) + 1
+            process = self._interpreter()
+            with self._lock:
+                job.process = process
+                cancelled = job.cancel_requested
+            if cancelled:
+                self._kill(process)
+                self._finish(job, "cancelled")
+                continue
+            try:
+                process.stdin.write((json.dumps({"path": job.path, "log": job.log_path}) + "\n").encode())
+                process.stdin.close()
+                exit_code = process.wait(timeout=self.timeout or None)
+            except subprocess.TimeoutExpired:
+                self._kill(process)
+                with open(job.log_path, "a") as log:
+                    log.write(f"\n[flow runner] Killed after {self.timeout:,.0f} seconds.\n")
+                self._finish(job, "timed_out")
+                continue
+            except OSError as e:
+                self._kill(process)
+                with open(job.log_path, "a") as log:
+                    log.write(f"\n[flow runner] Could not start the flow: {e}\n")
+                self._finish(job, "failed")
+                continue
+            if job.cancel_requested:
+                self._finish(job, "cancelled", exit_code)
+            else:
+                self._finish(job, "succeeded" if exit_code == 0 else "failed", exit_code)
+
+    @staticmethod
+    def _kill(process: subprocess.Popen):
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.wait()
+
+    def get(self, job_id: str) -> FlowJob:
+        """Returns a job, raising ValueError (with the jobs there are) if it is unknown."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            recent = ", ".join(list(self._jobs)[-10:]) or "none"
+            raise ValueError(f"No flow job '{job_id}' (recent jobs: {recent}).")
+        return job
+
+    def wait(self, job_id: str, seconds: float) -> FlowJob:
+        """Waits up to `seconds` for a job to finish; returns it either way."""
+        job = self.get(job_id)
+        if seconds > 0:
+            job.done.wait(seconds)
+        return job
+
+    def cancel(self, job_id: str) -> FlowJob:
+        """Cancels a queued job, or kills a running one."""
+        with self._lock:
+            job = self.get(job_id)
+            if job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested = True
+            process = job.process
+            if job.status == "queued":
+                self._queue.remove(job)
+        if job.status == "queued":
+            self._finish(job, "cancelled")
+        elif process is not None:
+            self._kill(process)
+        job.done.wait(10)
+        return job
+
+    def tail(self, job_id: str, lines: int = None) -> str:
+        """The last lines a job has written to its log so far."""
+        return tail_file(self.get(job_id).log_path, self.tail_lines if lines is None else int(lines))
+
+    def jobs(self) -> list:
+        """Every remembered job, newest first."""
+        return [job.describe() for job in reversed(list(self._jobs.values()))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {**self._stats, **counts, "warm_idle": len(self._idle)}
+
+    def close(self):
+        """Cancels queued and running jobs and stops the workers and warm interpreters."""
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+            active = [job.id for job in self._jobs.values() if job.status in ("queued", "running")]
+            idle, self._idle = list(self._idle), deque()
+        for job_id in active:
+            self.cancel(job_id)
+        for process in idle:
+            self._kill(process)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Defaults for the per-source `http` block in the YAML file.
+HTTP_DEFAULTS = {
+    'timeout': 30,            # Seconds to wait for a response.
+    'connect_timeout': 5,     # Seconds to wait for the TCP/TLS connection.
+    'retries': 3,             # Retries for connection errors and 429/5xx on idempotent methods.
+    'backoff_factor': 0.3,    # Exponential backoff between retries.
+    'pool_maxsize': 10,       # Keep-alive connections per host.
+    'spec_cache_ttl': 300,    # Seconds a fetched OpenAPI spec is used without revalidation.
+    'rate_limit': None,       # Optional max requests per second per host.
+    'rate_burst': None,       # Requests allowed back-to-back before the rate applies (default: rate_limit).
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """A thread-safe token bucket: `rate` requests per second with bursts of up to `burst`."""
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class CachedSpec:
+    """A fetched spec document with its validators and parsed form."""
+    def __init__(self, text: str, etag: str = None, last_modified: str = None):
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.checked_at = time.monotonic()
+        self._parsed = None
+
+    @property
+    def parsed(self):
+        """The spec parsed as JSON (or YAML), computed once."""
+        if self._parsed is None:
+            try:
+                self._parsed = json.loads(self.text)
+            except json.JSONDecodeError:
+                self._parsed = yaml.safe_load(self.text)
+        return self._parsed
+
+
+class HttpClient:
+    """
+    A pooled HTTP client for one data source.
+
+    Wraps a `requests.Session`, so TCP/TLS connections are kept alive between calls, and
+    applies default timeouts and retries with exponential backoff. Specs fetched with
+    `get_spec()` are cached and revalidated with ETag / Last-Modified conditional requests.
+    With `rate_limit` set, requests to each host are throttled by a token bucket.
+    """
+    def __init__(self, name: str, timeout: float = 30, connect_timeout: float = 5, retries: int = 3,
+                 backoff_factor: float = 0.3, pool_maxsize: int = 10, spec_cache_ttl: float = 300,
+                 rate_limit: float = None, rate_burst: float = None):
+        self.name = name
+        self.timeout = (connect_timeout, timeout)
+        self.spec_cache_ttl = spec_cache_ttl
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self._limiters = {}
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._specs = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "spec_hits": 0, "spec_not_modified": 0, "spec_downloads": 0,
+                       "rate_limited_seconds": 0.0}
+
+    def _limiter(self, url: str):
+        if not self.rate_limit:
+            return None
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate_limit, self.rate_burst)
+        return limiter
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends a request on the pooled session with the client's default timeout and rate limit."""
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self._limiter(url)
+        waited = limiter.acquire() if limiter else 0.0
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["rate_limited_seconds"] += waited
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def get_spec(self, url: str, refresh: bool = False) -> CachedSpec:
+        """
+        Returns the document at `url`, downloading it at most once per `spec_cache_ttl`.
+        After the TTL the cached copy is revalidated with a conditional request and only
+        downloaded again if the server reports a change.
+        """
+        cached = self._specs.get(url)
+        if cached and not refresh and time.monotonic() - cached.checked_at < self.spec_cache_ttl:
+            with self._lock:
+                self._stats["spec_hits"] += 1
+            return cached
+
+        headers = {}
+        if cached and not refresh:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        response = self.get(url, headers=headers)
+        if cached and response.status_code == 304:
+            cached.checked_at = time.monotonic()
+            with self._lock:
+                self._stats["spec_not_modified"] += 1
+            return cached
+        response.raise_for_status()
+
+        spec = CachedSpec(response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        if cached and cached.digest == spec.digest:
+            # Unchanged content from a server without validators: keep the parsed copy.
+            cached.checked_at = spec.checked_at
+            spec = cached
+        self._specs[url] = spec
+        with self._lock:
+            self._stats["spec_downloads"] += 1
+        return spec
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.session.close()
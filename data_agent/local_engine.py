@@ -0,0 +1,373 @@
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from .file_reader import TOO_LARGE, ByteSource, JsonReader, decode_chunks, is_url, iter_lines, normalize_json_path
+
+# Defaults for the per-source `local_engine` block of 'file' and 'json' sources.
+LOCAL_ENGINE_DEFAULTS = {
+    'format': None,           # 'json', 'ndjson', 'csv' or 'parquet'; detected from the path/content if unset.
+    'table': None,            # Table name for a single-table source (default: the file name).
+    'json_path': None,        # Optional path of the JSON array holding the rows, e.g. 'data.items'.
+    'batch_size': 5000,       # Rows per bulk insert.
+    'infer_rows': 1000,       # Rows used to infer column types.
+    'refresh_interval': 60,   # Seconds between change checks for URLs (local files are checked on every use).
+}
+FORMATS = ('json', 'ndjson', 'csv', 'parquet')
+EXTENSIONS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv', '.tsv': 'csv',
+              '.parquet': 'parquet'}
+INTEGER = re.compile(r"^[+-]?\d+$")
+REAL = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+MAX_ROW_BYTES = 10000000
+
+
+def table_name_for(name: str) -> str:
+    """Turns a file name or JSON key into a plain SQL identifier."""
+    name = re.sub(r"[^0-9A-Za-z_]+", "_", name).strip("_").lower() or "data"
+    return f"t_{name}" if name[0].isdigit() else name
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def flatten_record(record, prefix: str = "") -> dict:
+    """Flattens nested objects into `parent_child` columns; lists are kept as JSON text."""
+    if not isinstance(record, dict):
+        return {prefix or "value": record}
+    flat = {}
+    for key, value in record.items():
+        column = f"{prefix}_{key}" if prefix else str(key)
+        if isinstance(value, dict) and value:
+            flat.update(flatten_record(value, column))
+        elif isinstance(value, (list, dict)):
+            flat[column] = json.dumps(value, ensure_ascii=False)
+        else:
+            flat[column] = value
+    return flat
+
+
+def _value_type(value, text_values: bool = False) -> str:
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    if isinstance(value, str) and text_values:
+        if INTEGER.match(value):
+            return "INTEGER"
+        if REAL.match(value):
+            return "REAL"
+    return "TEXT"
+
+
+def _merge_types(current: str, new: str) -> str:
+    if current is None or current == new:
+        return new or current
+    if new is None:
+        return current
+    if {current, new} == {"INTEGER", "REAL"}:
+        return "REAL"
+    return "TEXT"
+
+
+class TableWriter:
+    """
+    Bulk-loads records into one SQLite table. Column types are inferred from the first
+    `infer_rows` records (numeric text becomes INTEGER/REAL through column affinity), and
+    columns first seen later are added on the fly. With `text_values` (CSV files, where every
+    value is text), numeric-looking columns are typed as numbers and empty values stored as NULL.
+    """
+    def __init__(self, conn, name: str, batch_size: int = 5000, infer_rows: int = 1000, text_values: bool = False,
+                 schema: str = None):
+        self.conn = conn
+        self.name = name
+        self.target = f"{_quote(schema)}.{_quote(name)}" if schema else _quote(name)
+        self.batch_size = batch_size
+        self.infer_rows = infer_rows
+        self.text_values = text_values
+        self.columns = {}
+        self.rows = 0
+        self._pending = []
+        self._created = False
+
+    def add(self, record: dict):
+        self._pending.append(record)
+        if len(self._pending) >= (self.batch_size if self._created else self.infer_rows):
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        new_columns = {}
+        for record in self._pending:
+            for column, value in record.items():
+                if column not in self.columns:
+                    new_columns[column] = _merge_types(new_columns.get(column), _value_type(value, self.text_values))
+        if not self._created:
+            definitions = ", ".join(f"{_quote(c)} {t or 'TEXT'}" for c, t in new_columns.items()) or '"value" TEXT'
+            self.conn.execute(f"CREATE TABLE {self.target} ({definitions})")
+            self._created = True
+        else:
+            for column, column_type in new_columns.items():
+                self.conn.execute(f"ALTER TABLE {self.target} ADD COLUMN {_quote(column)} {column_type or 'TEXT'}")
+        self.columns.update({c: t or "TEXT" for c, t in new_columns.items()})
+
+        columns = list(self.columns)
+        if columns:
+            statement = (f"INSERT INTO {self.target} ({', '.join(_quote(c) for c in columns)}) "
+                         f"VALUES ({', '.join('?' for _ in columns)})")
+            if self.text_values:
+                rows = (tuple(None if record.get(c) == "" else record.get(c) for c in columns) for record in self._pending)
+            else:
+                rows = (tuple(record.get(c) for c in columns) for record in self._pending)
+            self.conn.executemany(statement, rows)
+        self.rows += len(self._pending)
+        self._pending = []
+
+    def close(self) -> int:
+        self.flush()
+        if not self._created:
+            self.conn.execute(f'CREATE TABLE {self.target} ("value" TEXT)')
+            self._created = True
+        return self.rows
+
+
+def detect_format(source: ByteSource) -> str:
+    """Picks the file format from the path's extension, or else from the first line."""
+    extension = os.path.splitext(source.path.split('?')[0])[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    with source.chunks() as chunks:
+        first_line = next(iter_lines(chunks), "").lstrip('\ufeff \t')
+    if first_line.startswith('{'):
+        try:
+            json.loads(first_line)
+            return 'ndjson'
+        except ValueError:
+            return 'json'
+    if first_line.startswith('['):
+        return 'json'
+    if any(delimiter in first_line for delimiter in ",;\t|"):
+        return 'csv'
+    raise ValueError(f"'{source.path}' is not a JSON, NDJSON, CSV or Parquet file and cannot be queried with SQL.")
+
+
+def _text_lines(chunks):
+    """Yields decoded lines with their line endings, as `csv.reader` expects."""
+    pending = ""
+    for text in decode_chunks(chunks):
+        pending += text
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _load_csv(conn, source: ByteSource, table: str, settings: dict) -> dict:
+    with source.chunks() as chunks:
+        lines = _text_lines(chunks)
+        header_line = next(lines, "")
+        if source.path.split('?')[0].lower().endswith('.tsv'):
+            delimiter = "\t"
+        else:
+            try:
+                delimiter = csv.Sniffer().sniff(header_line, delimiters=",;\t|").delimiter
+            except csv.Error:
+                delimiter = ","
+        header = [h.strip() or f"column_{i + 1}" for i, h in enumerate(next(csv.reader([header_line], delimiter=delimiter), []))]
+        writer = TableWriter(conn, table, int(settings['batch_size']), int(settings['infer_rows']), text_values=True)
+        for row in csv.reader(lines, delimiter=delimiter):
+            if row:
+                writer.add(dict(zip(header, row)))
+        return {table: writer.close()}
+
+
+def _load_ndjson(conn, source: ByteSource, table: str, settings: dict) -> dict:
+    writer = TableWriter(conn, table, int(settings['batch_size']), int(settings['infer_rows']))
+    with source.chunks() as chunks:
+        for number, line in enumerate(iter_lines(chunks)):
+            if line.strip():
+                try:
+                    writer.add(flatten_record(json.loads(line)))
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON on line {number + 1}: {e}") from None
+    return {table: writer.close()}
+
+
+def _read_json_row(reader: JsonReader, event: str, value):
+    if event in ("start_map", "start_array"):
+        value = reader.read_value(MAX_ROW_BYTES)
+        if value is TOO_LARGE:
+            raise ValueError(f"A JSON row is larger than {MAX_ROW_BYTES} bytes.")
+    return value
+
+
+def _load_json_array(conn, reader: JsonReader, prefix: str, table: str, settings: dict) -> int:
+    """Loads the items of the array whose start event was just read."""
+    writer = TableWriter(conn, table, int(settings['batch_size']), int(settings['infer_rows']))
+    for item_prefix, event, value in reader.events:
+        if event == "end_array" and item_prefix == prefix:
+            break
+        writer.add(flatten_record(_read_json_row(reader, event, value)))
+    return writer.close()
+
+
+def _load_json(conn, source: ByteSource, table: str, settings: dict) -> dict:
+    """
+    Loads a JSON document: a top-level array becomes one table; in a top-level object, each
+    array member becomes a table named after its key and the other members one row of `table`.
+    With `json_path`, only the array at that path is loaded.
+    """
+    tables = {}
+    with source.chunks() as chunks:
+        reader = JsonReader(chunks)
+        events = reader.events
+        if settings.get('json_path'):
+            prefix = normalize_json_path(settings['json_path'])
+            for event_prefix, event, _ in events:
+                if event_prefix == prefix and event == "start_array":
+                    return {table: _load_json_array(conn, reader, prefix, table, settings)}
+            raise ValueError(f"JSON path '{settings['json_path']}' is not an array in '{source.path}'.")
+
+        prefix, event, value = next(events, ("", None, None))
+        if event == "start_array":
+            return {table: _load_json_array(conn, reader, "", table, settings)}
+        if event != "start_map":
+            raise ValueError(f"'{source.path}' holds a single JSON value, not rows.")
+        members = {}
+        key = None
+        for prefix, event, value in events:
+            if event == "end_map" and prefix == "":
+                break
+            if event == "map_key":
+                key = value
+            elif event == "start_array":
+                name = table_name_for(key)
+                if name in tables or name == table:
+                    name = f"{table}_{name}"
+                tables[name] = _load_json_array(conn, reader, prefix, name, settings)
+            else:
+                members.update(flatten_record(_read_json_row(reader, event, value), key))
+    if members or not tables:
+        writer = TableWriter(conn, table)
+        writer.add(members)
+        tables[table] = writer.close()
+    return tables
+
+
+def _load_parquet(conn, source: ByteSource, table: str, settings: dict) -> dict:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Querying Parquet files requires the 'pyarrow' package.") from None
+    if is_url(source.path):
+        raise ValueError("Parquet sources must be local files.")
+    writer = TableWriter(conn, table, int(settings['batch_size']), int(settings['infer_rows']))
+    for batch in pq.ParquetFile(source.path).iter_batches(batch_size=int(settings['batch_size'])):
+        for record in batch.to_pylist():
+            writer.add(flatten_record(record))
+    return {table: writer.close()}
+
+
+LOADERS = {'json': _load_json, 'ndjson': _load_ndjson, 'csv': _load_csv, 'parquet': _load_parquet}
+
+
+class LocalDatabase:
+    """An in-memory SQLite database holding one loaded version of a file source."""
+    def __init__(self, uri: str, keeper, fingerprint, tables: dict, load_seconds: float):
+        self.uri = uri
+        self.keeper = keeper            # Keeps the shared in-memory database alive.
+        self.fingerprint = fingerprint
+        self.tables = tables
+        self.load_seconds = load_seconds
+        self.checked_at = time.monotonic()
+
+
+class LocalEngine:
+    """
+    Loads 'file' and 'json' sources (JSON, NDJSON, CSV, Parquet) into in-memory SQLite
+    databases so they can be queried with SQL.
+
+    Each source is loaded once with bulk inserts into a shared-cache in-memory database that
+    any number of connections can open by URI. The load is cached by the file's mtime and
+    size (ETag / Last-Modified / Content-Length for URLs) and redone only when those change.
+    """
+    def __init__(self):
+        self._databases = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, source: ByteSource):
+        if not is_url(source.path):
+            stat = os.stat(source.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        response = source.http_client.request("HEAD", source.path, allow_redirects=True)
+        headers = response.headers if response.ok else {}
+        validators = (headers.get("ETag"), headers.get("Last-Modified"), headers.get("Content-Length"))
+        # Without validators the content is reloaded once per refresh interval.
+        return validators if any(validators) else time.monotonic()
+
+    def database(self, name: str, source: ByteSource, settings: dict):
+        """
+        Returns `(database, reloaded)` for a source, loading it on first use and reloading it
+        if the file changed since it was loaded.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            current = self._databases.get(name)
+            if current and is_url(source.path) and time.monotonic() - current.checked_at < float(settings['refresh_interval']):
+                return current, False
+            fingerprint = self._fingerprint(source)
+            if current and current.fingerprint == fingerprint:
+                current.checked_at = time.monotonic()
+                return current, False
+            database = self._load(name, source, settings, fingerprint)
+            self._databases[name] = database
+        if current:
+            current.keeper.close()
+        return database, current is not None
+
+    def _load(self, name: str, source: ByteSource, settings: dict, fingerprint) -> LocalDatabase:
+        file_format = settings.get('format') or detect_format(source)
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown format '{file_format}' for data source '{name}'. Use one of {FORMATS}.")
+        table = settings.get('table') or table_name_for(os.path.splitext(os.path.basename(source.path.split('?')[0]))[0])
+        uri = f"file:local_{table_name_for(name)}_{uuid.uuid4().hex[:8]}?mode=memory&cache=shared"
+        start = time.perf_counter()
+        keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        try:
+            with keeper:
+                tables = LOADERS[file_format](keeper, source, table, settings)
+        except Exception:
+            keeper.close()
+            raise
+        elapsed = time.perf_counter() - start
+        print(f"Loaded data source '{name}' ({file_format}) into the local engine: "
+              f"{', '.join(f'{t} ({n} rows)' for t, n in tables.items())} in {elapsed:.2f}s")
+        return LocalDatabase(uri, keeper, fingerprint, tables, elapsed)
+
+    def drop(self, name: str):
+        """Forgets a source's database; it is loaded again on next use."""
+        with self._lock:
+            database = self._databases.pop(name, None)
+        if database:
+            database.keeper.close()
+
+    def stats(self) -> dict:
+        return {name: {"tables": db.tables, "load_seconds": round(db.load_seconds, 3)}
+                for name, db in list(self._databases.items())}
+
+    def close(self):
+        with self._lock:
+            databases, self._databases = self._databases, {}
+        for database in databases.values():
+            database.keeper.close()
@@ -0,0 +1,234 @@
+from dataclasses import dataclass, field
+
+HTTP_METHODS = ("get", "put", "post", "delete", "patch", "head", "options")
+MAX_REF_DEPTH = 8
+MAX_DESCRIPTION_LENGTH = 160
+
+
+def resolve_refs(node, spec: dict, depth: int = 0, seen: tuple = ()):
+    """
+    Returns a copy of `node` with local `$ref`s ("#/components/...") inlined.
+    Recursive references are cut off and left as `{"$ref": ...}`.
+    """
+    if isinstance(node, list):
+        return [resolve_refs(item, spec, depth, seen) for item in node]
+    if not isinstance(node, dict):
+        return node
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/"):
+        if ref in seen or depth >= MAX_REF_DEPTH:
+            return {"$ref": ref}
+        target = spec
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(target, dict) or part not in target:
+                return {"$ref": ref}
+            target = target[part]
+        siblings = {k: v for k, v in node.items() if k != "$ref"}
+        resolved = resolve_refs(target, spec, depth + 1, seen + (ref,))
+        return {**resolved, **resolve_refs(siblings, spec, depth, seen)} if isinstance(resolved, dict) else resolved
+    return {key: resolve_refs(value, spec, depth, seen) for key, value in node.items()}
+
+
+def _short(text, limit: int = MAX_DESCRIPTION_LENGTH) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def schema_type(schema: dict) -> str:
+    """Returns a compact type label for a (resolved) JSON schema."""
+    if not isinstance(schema, dict) or not schema:
+        return "any"
+    if "$ref" in schema:
+        return schema["$ref"].rsplit("/", 1)[-1]
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if combinator in schema:
+            options = [schema_type(option) for option in schema[combinator]]
+            return " | ".join(dict.fromkeys(o for o in options if o != "null")) or "null"
+    kind = schema.get("type", "object" if "properties" in schema else "any")
+    if kind == "object" and schema.get("title") and schema.get("properties"):
+        return schema["title"]
+    if isinstance(kind, list):
+        kind = " | ".join(k for k in kind if k != "null")
+    if kind == "array":
+        return f"{schema_type(schema.get('items', {}))}[]"
+    if schema.get("format"):
+        return f"{kind}({schema['format']})"
+    if schema.get("enum"):
+        return f"{kind} enum{list(schema['enum'])[:8]}"
+    return kind
+
+
+def schema_fields(schema: dict, max_depth: int = 1, prefix: str = "") -> list:
+    """Flattens an object schema into `name: type` entries, descending `max_depth` levels."""
+    if not isinstance(schema, dict):
+        return []
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            options = [o for o in schema[combinator] if isinstance(o, dict) and (o.get("properties") or o.get("items"))]
+            return schema_fields(options[0], max_depth, prefix) if options else []
+    if schema.get("type") == "array" or "items" in schema:
+        return schema_fields(schema.get("items", {}), max_depth, prefix + "[]")
+    if "allOf" in schema:
+        merged = {"properties": {}, "required": []}
+        for part in schema["allOf"]:
+            if isinstance(part, dict):
+                merged["properties"].update(part.get("properties", {}))
+                merged["required"] += part.get("required", [])
+        schema = merged
+    required = set(schema.get("required", []))
+    fields = []
+    for name, prop in (schema.get("properties") or {}).items():
+        label = f"{prefix}.{name}" if prefix else name
+        fields.append(f"{label}{'*' if name in required else ''}: {schema_type(prop)}")
+        if max_depth > 1 and isinstance(prop, dict) and any(k in prop for k in ("properties", "items", "anyOf", "oneOf")):
+            fields += schema_fields(prop, max_depth - 1, label)
+    return fields
+
+
+def _json_schema(container: dict):
+    """Returns the JSON body schema of an OpenAPI 3 requestBody/response, or a Swagger 2 response."""
+    if not isinstance(container, dict):
+        return None
+    if "schema" in container:
+        return container["schema"]
+    content = container.get("content") or {}
+    for media_type, body in content.items():
+        if "json" in media_type and isinstance(body, dict):
+            return body.get("schema")
+    for body in content.values():
+        if isinstance(body, dict) and "schema" in body:
+            return body["schema"]
+    return None
+
+
+@dataclass
+class Operation:
+    """One API operation with its `$ref`s resolved."""
+    method: str
+    path: str
+    operation_id: str
+    summary: str
+    description: str = ""
+    parameters: list = field(default_factory=list)
+    request_body: dict = None
+    responses: dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.method.upper()} {self.path}"
+
+    def success_schema(self):
+        for status in sorted(self.responses, key=str):
+            if str(status).startswith("2"):
+                return _json_schema(self.responses[status])
+        return _json_schema(self.responses.get("default"))
+
+    def to_line(self) -> str:
+        """A one-line summary for the operation index."""
+        line = f"- {self.key}"
+        if self.operation_id:
+            line += f" [{self.operation_id}]"
+        if self.summary:
+            line += f": {_short(self.summary, 100)}"
+        params = [f"{p['name']}{'*' if p.get('required') else ''}({p.get('in', '?')})" for p in self.parameters]
+        body = _json_schema(self.request_body) if self.request_body else None
+        if body is not None:
+            params.append(f"body: {schema_type(body)}")
+        if params:
+            line += f"\n    params: {', '.join(params)}"
+        fields = schema_fields(self.success_schema() or {})
+        if fields:
+            line += f"\n    returns: {', '.join(fields)}"
+        return line
+
+    def describe(self) -> str:
+        """A detailed description of the operation: parameters, body and response fields."""
+        lines = [f"{self.key}"]
+        if self.operation_id:
+            lines.append(f"Operation ID: {self.operation_id}")
+        if self.summary:
+            lines.append(f"Summary: {_short(self.summary)}")
+        if self.description and self.description != self.summary:
+            lines.append(f"Description: {_short(self.description, 600)}")
+        if self.parameters:
+            lines.append("Parameters:")
+            for p in self.parameters:
+                schema = p.get("schema", p)
+                constraints = {k: schema[k] for k in ("minLength", "maxLength", "minimum", "maximum", "pattern", "default")
+                               if k in schema}
+                line = f"  - {p['name']} ({p.get('in', '?')}, {schema_type(schema)}{', required' if p.get('required') else ''})"
+                if constraints:
+                    line += f" {constraints}"
+                if p.get("description"):
+                    line += f": {_short(p['description'])}"
+                lines.append(line)
+        body = _json_schema(self.request_body) if self.request_body else None
+        if body is not None:
+            lines.append(f"Request body ({schema_type(body)}):")
+            lines += [f"  - {f}" for f in schema_fields(body, max_depth=3)]
+        for status, response in sorted(self.responses.items(), key=lambda item: str(item[0])):
+            description = _short(response.get("description", "")) if isinstance(response, dict) else ""
+            lines.append(f"Response {status}: {description}")
+            schema = _json_schema(response)
+            if schema is not None:
+                lines += [f"  - {f}" for f in schema_fields(schema, max_depth=3)]
+        return "\n".join(lines)
+
+
+class OpenAPIIndex:
+    """A compact, LLM-friendly index of the operations in an OpenAPI (or Swagger 2) spec."""
+    def __init__(self, spec: dict):
+        if not isinstance(spec, dict) or "paths" not in spec:
+            raise ValueError("The document is not an OpenAPI specification (no 'paths').")
+        info = spec.get("info") or {}
+        self.title = info.get("title", "")
+        self.version = info.get("version", "")
+        self.description = _short(info.get("description", ""), 300)
+        self.operations = []
+        for path, item in (spec.get("paths") or {}).items():
+            if not isinstance(item, dict):
+                continue
+            item = resolve_refs(item, spec)
+            shared_params = item.get("parameters", [])
+            for method in HTTP_METHODS:
+                op = item.get(method)
+                if not isinstance(op, dict):
+                    continue
+                params = {(p.get("name"), p.get("in")): p for p in shared_params + op.get("parameters", [])
+                          if isinstance(p, dict) and p.get("name")}
+                body_params = [p for p in params.values() if p.get("in") == "body"]
+                self.operations.append(Operation(
+                    method=method,
+                    path=path,
+                    operation_id=op.get("operationId", ""),
+                    summary=op.get("summary") or op.get("description") or "",
+                    description=op.get("description") or "",
+                    parameters=[p for p in params.values() if p.get("in") != "body"],
+                    request_body=op.get("requestBody") or (body_params[0] if body_params else None),
+                    responses=op.get("responses") or {},
+                ))
+
+    def to_text(self) -> str:
+        header = f"API: {self.title} (version {self.version})".strip()
+        if self.description:
+            header += f"\n{self.description}"
+        lines = [header, "", f"Operations ({len(self.operations)}); * marks required parameters/fields:"]
+        lines += [op.to_line() for op in self.operations]
+        return "\n".join(lines) + "\n"
+
+    def find(self, operation: str) -> Operation:
+        """Looks an operation up by operationId, 'METHOD /path' or path (when unambiguous)."""
+        wanted = operation.strip()
+        for op in self.operations:
+            if op.operation_id and op.operation_id == wanted:
+                return op
+        parts = wanted.split(None, 1)
+        if len(parts) == 2 and parts[0].lower() in HTTP_METHODS:
+            for op in self.operations:
+                if op.method == parts[0].lower() and op.path.rstrip("/") == parts[1].rstrip("/"):
+                    return op
+        matches = [op for op in self.operations if op.path.rstrip("/") == wanted.rstrip("/")]
+        if len(matches) == 1:
+            return matches[0]
+        raise ValueError(f"Operation '{operation}' not found. Use an operation ID or 'METHOD /path' from the API index.")
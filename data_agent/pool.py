@@ -0,0 +1,214 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(ConnectionError):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of database connections for a single data source.
+
+    Connections are created lazily by `factory` up to `max_size`, handed out with
+    `acquire()`/`release()` (or the `connection()` context manager) and closed once
+    they have been idle for longer than `idle_timeout` seconds. Every checkout runs
+    the connection's `ping()` health check, and broken connections are recycled.
+
+    With `per_thread=True` an idle connection is only handed back to the thread that
+    last used it, which is what SQLite handles need.
+    """
+    def __init__(self, name: str, factory, max_size: int = 5, idle_timeout: float = 300.0,
+                 checkout_timeout: float = 30.0, per_thread: bool = False):
+        if max_size < 1:
+            raise ValueError(f"Pool for '{name}' must allow at least one connection (max_size={max_size}).")
+        self.name = name
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.per_thread = per_thread
+
+        self._cond = threading.Condition()
+        self._idle = {}  # key -> list of (connection, last_used)
+        self._total = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats = {"created": 0, "recycled": 0, "waits": 0, "checkouts": 0}
+
+    def _key(self):
+        return threading.get_ident() if self.per_thread else None
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Error closing pooled connection for '{self.name}': {e}")
+
+    def _sweep_expired(self) -> list:
+        """Removes idle connections past their idle timeout. Must hold the lock."""
+        now = time.monotonic()
+        expired = []
+        for key, entries in list(self._idle.items()):
+            keep = []
+            for conn, last_used in entries:
+                if now - last_used > self.idle_timeout:
+                    expired.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        self._total -= len(expired)
+        self._stats["recycled"] += len(expired)
+        return expired
+
+    def _evict_foreign_idle(self):
+        """Frees a slot held by another thread's idle connection. Must hold the lock."""
+        oldest_key, oldest_index, oldest_time = None, None, None
+        for key, entries in self._idle.items():
+            for index, (_, last_used) in enumerate(entries):
+                if oldest_time is None or last_used < oldest_time:
+                    oldest_key, oldest_index, oldest_time = key, index, last_used
+        if oldest_key is None:
+            return None
+        conn, _ = self._idle[oldest_key].pop(oldest_index)
+        if not self._idle[oldest_key]:
+            del self._idle[oldest_key]
+        self._total -= 1
+        self._stats["recycled"] += 1
+        return conn
+
+    def acquire(self):
+        """Checks out a healthy connection, creating one if the pool has room."""
+        deadline = time.monotonic() + self.checkout_timeout
+        key = self._key()
+        waited = False
+        while True:
+            conn, create, to_close = None, False, []
+            with self._cond:
+                if self._closed:
+                    raise ConnectionError(f"Connection pool for '{self.name}' is closed.")
+                to_close.extend(self._sweep_expired())
+                entries = self._idle.get(key)
+                if entries:
+                    conn, _ = entries.pop()
+                    if not entries:
+                        del self._idle[key]
+                    self._in_use += 1
+                elif self._total < self.max_size:
+                    self._total += 1
+                    self._in_use += 1
+                    create = True
+                elif self.per_thread and self._idle:
+                    to_close.append(self._evict_foreign_idle())
+                    self._total += 1
+                    self._in_use += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.checkout_timeout}s waiting for a connection to '{self.name}' "
+                            f"({self._in_use}/{self.max_size} in use)."
+                        )
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            for stale in to_close:
+                self._close_quietly(stale)
+
+            if create:
+                try:
+                    conn = self.factory()
+                except BaseException:
+                    with self._cond:
+                        self._total -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["created"] += 1
+                    self._stats["checkouts"] += 1
+                return conn
+
+            if self._is_healthy(conn):
+                with self._cond:
+                    self._stats["checkouts"] += 1
+                return conn
+
+            self._close_quietly(conn)
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._stats["recycled"] += 1
+                self._cond.notify()
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            return conn.ping()
+        except Exception:
+            return False
+
+    def release(self, conn, discard: bool = False):
+        """Returns a connection to the pool, or closes it if `discard` is set."""
+        if not discard:
+            try:
+                conn.reset()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._total -= 1
+                if discard:
+                    self._stats["recycled"] += 1
+            else:
+                self._idle.setdefault(self._key(), []).append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of a `with` block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except ConnectionError:
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the pool's usage counters."""
+        with self._cond:
+            idle = sum(len(entries) for entries in self._idle.values())
+            return {
+                "max_size": self.max_size,
+                "size": self._total,
+                "in_use": self._in_use,
+                "idle": idle,
+                **self._stats,
+            }
+
+    def close(self):
+        """Closes all idle connections; connections still in use are closed on release."""
+        with self._cond:
+            self._closed = True
+            to_close = [conn for entries in self._idle.values() for conn, _ in entries]
+            self._total -= len(to_close)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in to_close:
+            self._close_quietly(conn)
@@ -0,0 +1,266 @@
+import re
+from dataclasses import dataclass, field
+
+from .cache import is_read_only_query
+from .db import PostgresDB
+
+# Defaults for the per-source `query_guard` block in the YAML file.
+QUERY_GUARD_DEFAULTS = {
+    'enabled': True,                # Check the plan of every statement before it runs.
+    'max_cost': 10000000,           # Largest Postgres planner cost accepted.
+    'max_rows': 1000000,            # Largest estimated result accepted (Postgres).
+    'max_scan_rows': 50000000,      # Largest estimated number of rows read (SQLite has no cost model).
+    'on_exceed': 'limit',           # 'limit': add a LIMIT when that brings a SELECT under budget; 'reject'.
+    'limit': 1000,                  # The LIMIT added in 'limit' mode.
+    'index_hint_rows': 100000,      # Suggest indexes for filtered full scans of tables this large.
+    'statement_timeout_ms': 60000,  # Cancel statements that run longer (0 disables).
+}
+GUARD_ACTIONS = ('limit', 'reject')
+EXPLAINABLE = ('SELECT', 'WITH', 'VALUES', 'TABLE', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+MAX_PLAN_LINES = 25
+
+NAME = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+KEYWORDS = {'from', 'where', 'join', 'on', 'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural', 'group',
+            'order', 'limit', 'offset', 'set', 'using', 'union', 'intersect', 'except', 'having', 'window',
+            'values', 'select', 'as', 'default'}
+TABLE_ALIAS = re.compile(
+    rf'(?:\b(?:FROM|JOIN|UPDATE|INTO)|,)\s+((?:{NAME}\s*\.\s*)?{NAME})'
+    rf'(?:\s+(?:AS\s+)?(?!(?:{"|".join(KEYWORDS)})\b)({NAME}))?', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+INNERMOST_PARENS = re.compile(r'\([^()]*\)')
+TRAILING_CLAUSES = re.compile(r'\b(?:LIMIT|OFFSET|FETCH|FOR\s+(?:UPDATE|SHARE|NO\s+KEY|KEY))\b', re.IGNORECASE)
+AGGREGATION = re.compile(
+    r'\b(?:count|sum|avg|min|max|total|group_concat|string_agg|array_agg)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b',
+    re.IGNORECASE)
+SQLITE_LOOP = re.compile(r'^(SCAN|SEARCH)(?: TABLE)? ("[^"]+"|\S+)(?: AS (\S+))?(.*)$')
+FILTER_COLUMN = re.compile(r'(?<![\w\'":.])"?([A-Za-z_][\w$]*)"?\)?(?:::[A-Za-z ]+)?\s*(?:=|<>|<=|>=|<|>|!?~~\*?)\s')
+PG_CONDITIONS = ('Index Cond', 'Hash Cond', 'Merge Cond', 'Join Filter', 'Filter')
+
+
+def _unquote(name: str) -> str:
+    return name[1:-1] if name.startswith('"') else name
+
+
+def _top_level(query: str) -> str:
+    """The query without string literals and parenthesized parts (subqueries, function arguments)."""
+    text = STRING_LITERAL.sub("''", query)
+    while True:
+        stripped = INNERMOST_PARENS.sub(' ', text)
+        if stripped == text:
+            return text
+        text = stripped
+
+
+def can_add_limit(query: str) -> bool:
+    """True for read-only queries returning rows whose top level has no LIMIT/OFFSET/FETCH/FOR yet."""
+    first = (query.split() or [""])[0].upper()
+    return first in ('SELECT', 'WITH', 'VALUES') and is_read_only_query(query) \
+        and not TRAILING_CLAUSES.search(_top_level(query))
+
+
+def add_limit(query: str, limit: int) -> str:
+    return f"{query.rstrip().rstrip(';').rstrip()}\nLIMIT {int(limit)}"
+
+
+def table_aliases(query: str) -> dict:
+    """Maps the (lower-cased) tables and aliases named in FROM/JOIN/UPDATE/INTO clauses to table names."""
+    aliases = {}
+    for name, alias in TABLE_ALIAS.findall(query):
+        table = _unquote(re.split(r'\s*\.\s*', name)[-1])
+        if table.lower() in KEYWORDS:
+            continue
+        aliases.setdefault(table.lower(), table)
+        if alias and _unquote(alias).lower() not in KEYWORDS:
+            aliases[_unquote(alias).lower()] = table
+    return aliases
+
+
+@dataclass
+class PlanEstimate:
+    """The planner's view of a query: its estimated cost, a compact plan and tuning hints."""
+    cost: float = None        # Postgres planner cost units.
+    rows: float = None        # Estimated result rows (Postgres).
+    scan_rows: float = None   # Estimated rows read (SQLite).
+    plan: list = field(default_factory=list)
+    hints: list = field(default_factory=list)
+
+    def over_budget(self, settings: dict) -> list:
+        """Returns the reasons the estimate exceeds the thresholds in `settings` (empty if it doesn't)."""
+        reasons = []
+        if self.cost is not None and settings.get('max_cost') and self.cost > settings['max_cost']:
+            reasons.append(f"estimated cost {self.cost:,.0f} exceeds max_cost {settings['max_cost']:,}")
+        if self.rows is not None and settings.get('max_rows') and self.rows > settings['max_rows']:
+            reasons.append(f"estimated {self.rows:,.0f} result rows exceed max_rows {settings['max_rows']:,}")
+        if self.scan_rows is not None and settings.get('max_scan_rows') and self.scan_rows > settings['max_scan_rows']:
+            reasons.append(f"estimated {self.scan_rows:,.0f} rows read exceed max_scan_rows {settings['max_scan_rows']:,}")
+        return reasons
+
+    def to_text(self) -> str:
+        figures = []
+        if self.cost is not None:
+            figures.append(f"cost {self.cost:,.0f}")
+        if self.rows is not None:
+            figures.append(f"{self.rows:,.0f} result rows")
+        if self.scan_rows is not None:
+            figures.append(f"~{self.scan_rows:,.0f} rows read")
+        lines = [f"Plan estimate: {', '.join(figures) or 'unknown'}"]
+        lines += [f"  {line}" for line in self.plan[:MAX_PLAN_LINES]]
+        if len(self.plan) > MAX_PLAN_LINES:
+            lines.append(f"  ... {len(self.plan) - MAX_PLAN_LINES} more plan lines")
+        lines += [f"Hint: {hint}" for hint in self.hints]
+        return "\n".join(lines)
+
+
+def _pg_relations(node: dict) -> list:
+    relations = [node['Relation Name']] if node.get('Relation Name') else []
+    for child in node.get('Plans', []):
+        relations += _pg_relations(child)
+    return relations
+
+
+def _pg_has_condition(node: dict) -> bool:
+    return any(node.get(key) for key in ('Index Cond', 'Join Filter', 'Hash Cond', 'Merge Cond')) \
+        or any(_pg_has_condition(child) for child in node.get('Plans', []))
+
+
+def explain_postgres(db, query: str, settings: dict) -> PlanEstimate:
+    """Estimates a Postgres query with `EXPLAIN (FORMAT JSON)`; nothing is executed."""
+    root = db.explain(query)
+    sizes = db.estimate_table_rows(set(_pg_relations(root)))
+    estimate = PlanEstimate(cost=root['Total Cost'], rows=root['Plan Rows'])
+
+    def visit(node, depth):
+        kind, relation = node['Node Type'], node.get('Relation Name')
+        label = kind
+        if relation:
+            label += f" on {relation}"
+            if node.get('Alias') and node['Alias'] != relation:
+                label += f" {node['Alias']}"
+        label += f" (cost={node['Total Cost']:,.0f} rows={node['Plan Rows']:,.0f})"
+        for key in PG_CONDITIONS:
+            if node.get(key):
+                label += f" {key.lower()}: {node[key]}"
+        estimate.plan.append("  " * depth + label)
+
+        size = sizes.get(relation, 0)
+        if kind == 'Seq Scan' and node.get('Filter') and size >= settings['index_hint_rows']:
+            columns = list(dict.fromkeys(FILTER_COLUMN.findall(node['Filter'])))
+            if columns:
+                estimate.hints.append(
+                    f"Seq Scan reads all ~{size:,} rows of {relation} to apply its filter; an index such as "
+                    f"CREATE INDEX ON {relation} ({', '.join(columns)}) would avoid that, or filter on an indexed column.")
+        children = node.get('Plans', [])
+        if kind == 'Nested Loop' and len(children) == 2 and not node.get('Join Filter') \
+                and not _pg_has_condition(children[1]):
+            outer, inner = _pg_relations(children[0]), _pg_relations(children[1])
+            if outer and inner:
+                estimate.hints.append(
+                    f"Nested Loop without a join condition pairs every row of {', '.join(outer)} with every row of "
+                    f"{', '.join(inner)} (a cartesian product); add the missing join condition.")
+        for child in children:
+            visit(child, depth + 1)
+
+    visit(root, 0)
+    return estimate
+
+
+def explain_sqlite(db, query: str, settings: dict) -> PlanEstimate:
+    """
+    Estimates a SQLite query from `EXPLAIN QUERY PLAN`. SQLite reports no costs, so the rows
+    read are estimated from the nested loops: a SCAN reads the whole table for every row of
+    the loops outside it, an indexed SEARCH a few rows (a quarter of the table for ranges).
+    """
+    rows = db.explain(query)
+    aliases = table_aliases(query)
+    sizes = {name.lower(): size for name, size in db.estimate_table_rows(set(aliases.values())).items()}
+    estimate = PlanEstimate(scan_rows=0)
+    depths, loops = {}, {}
+    streaming = True
+    filtered = re.search(r'\bWHERE\b', query, re.IGNORECASE) is not None
+    for node_id, parent, detail in rows:
+        depth = depths[node_id] = depths.get(parent, -1) + 1
+        line = detail
+        match = SQLITE_LOOP.match(detail)
+        if detail.startswith('USE TEMP B-TREE'):
+            streaming = False
+        if match:
+            kind, name, alias, rest = match.groups()
+            table = aliases.get(_unquote(name).lower(), _unquote(name))
+            size = sizes.get(table.lower())
+            if kind == 'SCAN':
+                per_loop = size if size is not None else 1
+            elif 'AUTOMATIC' in rest:
+                # SQLite builds a temporary index on the table first: a missing index.
+                per_loop = 10
+                estimate.scan_rows += size or 0
+                columns = re.findall(r'(\w+)[=<>]', rest)
+                estimate.hints.append(
+                    f"SQLite builds a temporary index on {table} for every run of this query; "
+                    f"CREATE INDEX ON {table} ({', '.join(columns)}) would make it permanent.")
+            elif re.search(r'[<>]', rest):
+                per_loop = (size or 4) / 4
+            else:
+                per_loop = 1 if 'PRIMARY KEY' in rest else min(size or 10, 10)
+            group = loops.setdefault(parent, [])
+            outer_rows = 1
+            for _, outer in group:
+                outer_rows *= max(outer, 1)
+            estimate.scan_rows += outer_rows * per_loop
+            group.append((table, per_loop))
+            if size is not None:
+                line += f" (~{size:,} rows)"
+            if kind == 'SCAN' and size and size >= settings['index_hint_rows'] and len(group) == 1 and filtered:
+                estimate.hints.append(
+                    f"{detail} reads all ~{size:,} rows of {table}; if the WHERE clause filters that table, "
+                    f"filter on an indexed column or add an index on the filtered columns.")
+        estimate.plan.append("  " * depth + line)
+
+    for group in loops.values():
+        scanned = [table for table, per_loop in group if per_loop > 10]
+        if len(scanned) > 1:
+            estimate.hints.append(
+                f"The nested full scans of {' and '.join(scanned)} pair every row of one with every row of the other "
+                f"(a cartesian product or a join that cannot use an index); check the join condition.")
+
+    top_level = _top_level(query)
+    limit = re.search(r'\bLIMIT\s+(\d+)', top_level, re.IGNORECASE)
+    if limit and streaming and not AGGREGATION.search(query):
+        # Rows are produced as they are read, so SQLite stops once the LIMIT is reached.
+        estimate.scan_rows = min(estimate.scan_rows, int(limit.group(1)) * max(1, len(loops.get(0, []))))
+    return estimate
+
+
+def explain_query(db, query: str, settings: dict) -> PlanEstimate:
+    """Returns the plan estimate of a query on a pooled `PostgresDB` or `SQLiteDB` connection."""
+    if isinstance(db, PostgresDB):
+        return explain_postgres(db, query, settings)
+    return explain_sqlite(db, query, settings)
+
+
+def guard_query(db, query: str, settings: dict) -> tuple:
+    """
+    Checks the plan of a statement against the source's thresholds before it runs.
+
+    Returns `(query, note)`: the statement to run, with a LIMIT added if that brings an
+    over-budget SELECT under budget (in 'limit' mode), and a note for the LLM about the
+    rewrite. Raises ValueError with the reasons and the plan summary when the statement
+    is over budget, so the agent can rewrite it without running it.
+    """
+    if not settings.get('enabled') or (query.split() or [""])[0].upper() not in EXPLAINABLE:
+        return query, ""
+    if settings['on_exceed'] not in GUARD_ACTIONS:
+        raise ValueError(f"Unknown query_guard on_exceed '{settings['on_exceed']}'. Choose one of {GUARD_ACTIONS}.")
+    estimate = explain_query(db, query, settings)
+    reasons = estimate.over_budget(settings)
+    if not reasons:
+        return query, ""
+    if settings['on_exceed'] == 'limit' and can_add_limit(query):
+        limited = add_limit(query, settings['limit'])
+        if not explain_query(db, limited, settings).over_budget(settings):
+            note = (f"Note: the query was over budget ({'; '.join(reasons)}), so only the first "
+                    f"{int(settings['limit']):,} rows were requested (LIMIT added). Aggregate or filter in SQL "
+                    f"for complete answers.\n")
+            return limited, note
+    raise ValueError(
+        f"Query rejected before running: {'; '.join(reasons)}.\n{estimate.to_text()}\n"
+        f"Rewrite the query (join conditions, filters on indexed columns, aggregation or a LIMIT) and try again.")
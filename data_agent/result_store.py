@@ -0,0 +1,331 @@
+import itertools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .federation import _convert
+from .local_engine import TableWriter, _merge_types, _quote, _value_type, flatten_record
+from .results import render_result
+
+# Defaults for the top-level `result_store` block in the YAML file.
+RESULT_STORE_DEFAULTS = {
+    'max_results': 50,                  # Stored results; the least recently used are dropped beyond this.
+    'max_bytes': 256 * 1024 * 1024,     # Approximate size of all stored results together.
+    'max_rows': 1000000,                # Rows stored from one tool result.
+    'ttl': 3600,                        # Seconds a result is kept after its last use.
+    'preview_rows': 10,                 # Rows shown with a new handle.
+}
+FILTER_OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "in", "not in", "like", "is null", "is not null")
+AGGREGATE_FUNCTIONS = ("count", "count_distinct", "sum", "avg", "min", "max")
+JOIN_TYPES = ("inner", "left")
+
+
+class StoredResult:
+    __slots__ = ("handle", "columns", "rows", "bytes", "origin", "note", "used_at")
+
+    def __init__(self, handle: str, columns: list, rows: int, size: int, origin: str, note: str = ""):
+        self.handle = handle
+        self.columns = columns
+        self.rows = rows
+        self.bytes = size
+        self.origin = origin
+        self.note = note
+        self.used_at = time.monotonic()
+
+    def column(self, name: str) -> str:
+        if name not in self.columns:
+            raise ValueError(f"Column '{name}' is not in {self.handle} (columns: {', '.join(self.columns)}).")
+        return name
+
+
+class ResultStore:
+    """
+    Keeps tool results in the process, so the agent can filter, aggregate, sort and join
+    them by handle instead of reading the rows and copying them into later tool calls.
+
+    Each result is a table in a private in-memory SQLite database (the engine the local
+    engine and federated queries use), and every operation is one `CREATE TABLE ... AS
+    SELECT` run by SQLite, which stores its output as a new result. Operations take column
+    names and values, not SQL; columns are checked against the result and values are bound
+    as parameters. Results are dropped least recently used first when there are more than
+    `max_results`, when together they exceed `max_bytes`, or `ttl` seconds after their last use.
+    """
+    def __init__(self, max_results: int = 50, max_bytes: int = 256 * 1024 * 1024, max_rows: int = 1000000,
+                 ttl: float = 3600, preview_rows: int = 10):
+        self.max_results = int(max_results)
+        self.max_bytes = int(max_bytes)
+        self.max_rows = int(max_rows)
+        self.ttl = float(ttl)
+        self.preview_rows = int(preview_rows)
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        self._results = OrderedDict()     # handle -> StoredResult, least recently used first
+        self._counter = itertools.count(1)
+        self._stats = {"stored": 0, "derived": 0, "evictions": 0}
+
+    def _size(self, handle: str, columns: list) -> int:
+        """Bytes of the stored values (text and blobs by length, numbers by their text length)."""
+        if not columns:
+            return 0
+        total = " + ".join(f"coalesce(length(CAST({_quote(c)} AS BLOB)), 0)" for c in columns)
+        return self._conn.execute(f"SELECT coalesce(sum({total}), 0) + count(*) * {len(columns)} "
+                                  f"FROM {_quote(handle)}").fetchone()[0]
+
+    def _register(self, handle: str, origin: str, note: str = "") -> StoredResult:
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({_quote(handle)})")]
+        rows = self._conn.execute(f"SELECT count(*) FROM {_quote(handle)}").fetchone()[0]
+        result = StoredResult(handle, columns, rows, self._size(handle, columns), origin, note)
+        if result.bytes > self.max_bytes:
+            self._conn.execute(f"DROP TABLE {_quote(handle)}")
+            raise ValueError(f"The result is too large to store (about {result.bytes / 2**20:,.0f} MB, the limit is "
+                             f"{self.max_bytes / 2**20:,.0f} MB). Filter or aggregate it in the query first.")
+        self._results[handle] = result
+        self._evict(keep=handle)
+        return result
+
+    def _evict(self, keep: str = None):
+        now = time.monotonic()
+        total = sum(result.bytes for result in self._results.values())
+        for handle, result in list(self._results.items()):
+            if handle == keep:
+                continue
+            if (len(self._results) <= self.max_results and total <= self.max_bytes
+                    and now - result.used_at < self.ttl):
+                continue
+            self._conn.execute(f"DROP TABLE IF EXISTS {_quote(handle)}")
+            del self._results[handle]
+            total -= result.bytes
+            self._stats["evictions"] += 1
+
+    def _new_handle(self) -> str:
+        return f"r{next(self._counter)}"
+
+    def get(self, handle: str) -> StoredResult:
+        """Returns a stored result, raising ValueError (with the handles there are) if it is gone."""
+        result = self._results.get(handle)
+        if result is None or time.monotonic() - result.used_at >= self.ttl:
+            available = ", ".join(self._results) or "none"
+            raise ValueError(f"No stored result '{handle}' (it may have expired; stored results: {available}). "
+                             f"Run the query again with store_result=True.")
+        result.used_at = time.monotonic()
+        self._results.move_to_end(handle)
+        return result
+
+    def store_rows(self, column_names: list, batches, origin: str) -> StoredResult:
+        """
+        Stores a streamed query result (batches of row tuples), up to `max_rows` rows. Batches
+        are fetched outside the lock, which is only held to write each one, so a slow query
+        doesn't block other sessions' handle operations.
+        """
+        with self._lock:
+            handle = self._new_handle()
+        columns = []
+        for name in column_names:
+            name, suffix = str(name or "column"), 2
+            while name in columns:
+                name = f"{name}_{suffix}"
+                suffix += 1
+            columns.append(name)
+        created, stored, note = False, 0, ""
+        statement = f"INSERT INTO {_quote(handle)} VALUES ({', '.join('?' for _ in columns)})"
+        try:
+            for batch in batches:
+                # Postgres values SQLite can't bind (Decimal, dates, JSON) are converted, in every
+                # batch: a column that is all NULL in one batch may have them in the next.
+                batch = [tuple(_convert(v) for v in row) for row in batch]
+                if stored + len(batch) > self.max_rows:
+                    batch = batch[:self.max_rows - stored]
+                    note = f"only the first {self.max_rows:,} rows were stored"
+                with self._lock:
+                    if not created:
+                        # Declared types (from the first batch) give numeric comparisons and sorting.
+                        types = [None] * len(columns)
+                        for row in batch:
+                            types = [_merge_types(t, _value_type(v)) for t, v in zip(types, row)]
+                        definitions = ", ".join(f"{_quote(c)} {t or ''}".rstrip() for c, t in zip(columns, types))
+                        self._conn.execute(f"CREATE TABLE {_quote(handle)} ({definitions})")
+                        created = True
+                    self._conn.executemany(statement, batch)
+                stored += len(batch)
+                if note:
+                    break
+        except BaseException:
+            with self._lock:
+                self._conn.execute(f"DROP TABLE IF EXISTS {_quote(handle)}")
+            raise
+        finally:
+            if hasattr(batches, "close"):
+                batches.close()
+        with self._lock:
+            if not created:
+                self._conn.execute(f"CREATE TABLE {_quote(handle)} ({', '.join(_quote(c) for c in columns)})")
+            self._stats["stored"] += 1
+            return self._register(handle, origin, note)
+
+    def store_records(self, records, origin: str) -> StoredResult:
+        """Stores JSON objects as rows; nested objects become `parent_child` columns."""
+        with self._lock:
+            handle = self._new_handle()
+            writer = TableWriter(self._conn, handle)
+            note = ""
+            for number, record in enumerate(records):
+                if number == self.max_rows:
+                    note = f"only the first {self.max_rows:,} rows were stored"
+                    break
+                writer.add(flatten_record(record))
+            writer.close()
+            self._stats["stored"] += 1
+            return self._register(handle, origin, note)
+
+    def store_tables(self, load, origin: str) -> list:
+        """
+        Stores the tables a local-engine loader creates: `load(conn, table)` loads into the
+        store's database and returns `{table: rows}`. Returns one result per table.
+        """
+        with self._lock:
+            base = "loading"
+            try:
+                tables = load(self._conn, base)
+            except BaseException:
+                for (table,) in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                                   "AND (name = ? OR name LIKE ?)", (base, f"{base}_%")).fetchall():
+                    self._conn.execute(f"DROP TABLE {_quote(table)}")
+                raise
+            results = []
+            for table in tables:
+                handle = self._new_handle()
+                self._conn.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(handle)}")
+                name = table.removeprefix(f"{base}_") if table != base else ""
+                results.append(self._register(handle, f"{origin} ({name})" if name else origin))
+                self._stats["stored"] += 1
+            return results
+
+    def _derive(self, select: str, params: list, origin: str) -> StoredResult:
+        handle = self._new_handle()
+        self._conn.execute(f"CREATE TABLE {_quote(handle)} AS {select}", params)
+        self._stats["derived"] += 1
+        return self._register(handle, origin)
+
+    def filter(self, handle: str, conditions: list, columns: list = None) -> StoredResult:
+        """Keeps the rows matching every condition ({"column", "op", "value"}), and optionally some columns."""
+        with self._lock:
+            source = self.get(handle)
+            clauses, params = [], []
+            for condition in conditions or []:
+                if not isinstance(condition, dict):
+                    raise ValueError(f"A condition must be an object with 'column', 'op' and 'value', got {condition!r}.")
+                column = _quote(source.column(condition.get("column")))
+                op = str(condition.get("op", "=")).lower().strip()
+                value = condition.get("value")
+                if op not in FILTER_OPERATORS:
+                    raise ValueError(f"Unknown operator '{op}'. Use one of {', '.join(FILTER_OPERATORS)}.")
+                if op in ("is null", "is not null"):
+                    clauses.append(f"{column} {op.upper()}")
+                elif op in ("in", "not in"):
+                    values = value if isinstance(value, list) else [value]
+                    if not values:
+                        raise ValueError(f"'{op}' needs a list of values.")
+                    clauses.append(f"{column} {op.upper()} ({', '.join('?' for _ in values)})")
+                    params += values
+                else:
+                    clauses.append(f"{column} {op.upper()} ?")
+                    params.append(value)
+            selected = ", ".join(_quote(source.column(c)) for c in columns) if columns else "*"
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            return self._derive(f"SELECT {selected} FROM {_quote(handle)}{where}", params,
+                                f"filter of {handle}")
+
+    def aggregate(self, handle: str, group_by: list, aggregates: list) -> StoredResult:
+        """Groups by columns and computes aggregates ({"function", "column", "as"}), one row per group."""
+        with self._lock:
+            source = self.get(handle)
+            groups = [_quote(source.column(c)) for c in group_by or []]
+            outputs = list(groups)
+            for aggregate in aggregates or [{"function": "count"}]:
+                if not isinstance(aggregate, dict):
+                    raise ValueError(f"An aggregate must be an object with 'function' and 'column', got {aggregate!r}.")
+                function = str(aggregate.get("function", "")).lower()
+                if function not in AGGREGATE_FUNCTIONS:
+                    raise ValueError(f"Unknown aggregate '{function}'. Use one of {', '.join(AGGREGATE_FUNCTIONS)}.")
+                column = aggregate.get("column")
+                if column in (None, "", "*"):
+                    if function != "count":
+                        raise ValueError(f"'{function}' needs a column.")
+                    expression, default_name = "count(*)", "count"
+                else:
+                    quoted = _quote(source.column(column))
+                    expression = f"count(DISTINCT {quoted})" if function == "count_distinct" else f"{function}({quoted})"
+                    default_name = f"{function}_{column}"
+                outputs.append(f"{expression} AS {_quote(aggregate.get('as') or default_name)}")
+            group = f" GROUP BY {', '.join(groups)} ORDER BY {', '.join(groups)}" if groups else ""
+            return self._derive(f"SELECT {', '.join(outputs)} FROM {_quote(handle)}{group}", [],
+                                f"aggregate of {handle}")
+
+    def sort(self, handle: str, order_by: list, limit: int = 0) -> StoredResult:
+        """Sorts by columns ({"column", "descending"}); with `limit`, keeps the top rows (top-k)."""
+        with self._lock:
+            source = self.get(handle)
+            keys = []
+            for key in order_by or []:
+                if isinstance(key, str):
+                    key = {"column": key}
+                keys.append(f"{_quote(source.column(key.get('column')))} {'DESC' if key.get('descending') else 'ASC'}")
+            if not keys:
+                raise ValueError("Give at least one column to sort by.")
+            limit_clause = f" LIMIT {int(limit)}" if limit and int(limit) > 0 else ""
+            return self._derive(f"SELECT * FROM {_quote(handle)} ORDER BY {', '.join(keys)}{limit_clause}", [],
+                                f"{'top ' + str(int(limit)) + ' of ' if limit_clause else 'sort of '}{handle}")
+
+    def join(self, left_handle: str, right_handle: str, left_on: list, right_on: list = None,
+             how: str = "inner") -> StoredResult:
+        """Joins two results on equal key columns; right columns whose names clash get the right handle as suffix."""
+        with self._lock:
+            left, right = self.get(left_handle), self.get(right_handle)
+            right_on = right_on or left_on
+            if not left_on or len(left_on) != len(right_on):
+                raise ValueError("Give the same number of key columns for both sides (left_on, right_on).")
+            how = str(how).lower()
+            if how not in JOIN_TYPES:
+                raise ValueError(f"Unknown join type '{how}'. Use one of {', '.join(JOIN_TYPES)}.")
+            condition = " AND ".join(f"l.{_quote(left.column(a))} = r.{_quote(right.column(b))}"
+                                     for a, b in zip(left_on, right_on))
+            outputs = [f"l.{_quote(c)}" for c in left.columns]
+            for column in right.columns:
+                if column in right_on and left_on[right_on.index(column)] == column:
+                    continue    # The same key under the same name: keep the left one only.
+                name = f"{column}_{right_handle}" if column in left.columns else column
+                outputs.append(f"r.{_quote(column)} AS {_quote(name)}")
+            join = "LEFT JOIN" if how == "left" else "JOIN"
+            return self._derive(f"SELECT {', '.join(outputs)} FROM {_quote(left_handle)} l "
+                                f"{join} {_quote(right_handle)} r ON {condition}", [],
+                                f"{how} join of {left_handle} and {right_handle}")
+
+    def page(self, handle: str, offset: int = 0, limit: int = 50) -> tuple:
+        """Returns `(result, rows)` for rows `offset` to `offset + limit` of a stored result."""
+        with self._lock:
+            result = self.get(handle)
+            rows = self._conn.execute(f"SELECT * FROM {_quote(handle)} LIMIT ? OFFSET ?",
+                                      (int(limit), max(0, int(offset)))).fetchall()
+            return result, rows
+
+    def describe(self, result: StoredResult, max_bytes: int = 4000) -> str:
+        """The text returned for a new handle: its size, origin and the first rows."""
+        _, rows = self.page(result.handle, 0, self.preview_rows)
+        note = f" Note: {result.note}." if result.note else ""
+        preview = render_result(result.columns, iter([rows]), max_rows=self.preview_rows, max_bytes=max_bytes,
+                                max_scan_rows=self.preview_rows)
+        shown = f"first {len(rows)} rows" if result.rows > len(rows) else "all rows"
+        return (f"Stored result {result.handle}: {result.rows:,} row{'s' if result.rows != 1 else ''}, {len(result.columns)} column{'s' if len(result.columns) != 1 else ''} "
+                f"({result.origin}).{note}\nPreview ({shown}):\n{preview}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "results": len(self._results),
+                    "bytes": sum(result.bytes for result in self._results.values())}
+
+    def clear(self):
+        with self._lock:
+            for handle in self._results:
+                self._conn.execute(f"DROP TABLE IF EXISTS {_quote(handle)}")
+            self._results.clear()
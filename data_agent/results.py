@@ -0,0 +1,91 @@
+import csv
+import io
+import os
+import re
+import time
+from contextlib import closing, nullcontext
+
+# Defaults for the per-source `result_limits` block in the YAML file.
+RESULT_LIMIT_DEFAULTS = {
+    'max_rows': 200,          # Rows rendered back to the LLM.
+    'max_bytes': 20000,       # Characters rendered back to the LLM.
+    'fetch_size': 1000,       # Rows pulled from the database per round trip.
+    'max_scan_rows': 100000,  # Rows read past the budget just to count them (when not spilling).
+    'spill': False,           # Also write the full result to a CSV file.
+    'spill_dir': 'results',
+}
+
+
+def _render_row(row) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(['NULL' if cell is None else cell for cell in row])
+    return buffer.getvalue()
+
+
+def spill_file_path(spill_dir: str, source_name: str) -> str:
+    """Returns a fresh CSV path under `spill_dir` for a result of `source_name`."""
+    safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", source_name)
+    return os.path.join(spill_dir, f"{safe_name}_{time.strftime('%Y%m%d_%H%M%S')}_{time.monotonic_ns() % 10**6}.csv")
+
+
+def render_result(column_names, batches, max_rows: int = 200, max_bytes: int = 20000,
+                  max_scan_rows: int = 100000, spill_path: str = None) -> str:
+    """
+    Renders a streamed query result as compact CSV text within a row and byte budget.
+
+    Rows are consumed batch by batch and never held all at once. Once the budget is used up,
+    the remaining rows are only counted (up to `max_scan_rows` in total) or, if `spill_path`
+    is set, written in full to that CSV file, and a truncation summary is appended.
+
+    Args:
+        column_names (list): The result's column names.
+        batches: An iterable of row lists, e.g. from `stream_query()`.
+        spill_path (str): Optional CSV file to receive the full result.
+    """
+    header = _render_row(column_names)
+    output = [header]
+    used_bytes = len(header)
+    shown = total = 0
+    truncated = scan_capped = False
+
+    spill_file = spill_writer = None
+    if spill_path:
+        os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+        spill_file = open(spill_path, "w", newline="", encoding="utf-8")
+        spill_writer = csv.writer(spill_file)
+        spill_writer.writerow(column_names)
+
+    try:
+        with closing(batches) if hasattr(batches, "close") else nullcontext(batches) as rows_iter:
+            for batch in rows_iter:
+                if spill_writer:
+                    spill_writer.writerows(batch)
+                for row in batch:
+                    total += 1
+                    if truncated:
+                        continue
+                    line = _render_row(row)
+                    if shown < max_rows and used_bytes + len(line) <= max_bytes:
+                        output.append(line)
+                        used_bytes += len(line)
+                        shown += 1
+                    else:
+                        truncated = True
+                if truncated and not spill_writer and total >= max_scan_rows:
+                    scan_capped = True
+                    break
+    finally:
+        if spill_file:
+            spill_file.close()
+
+    if not truncated:
+        output.append(f"({total} row{'s' if total != 1 else ''})\n")
+    elif scan_capped:
+        output.append(f"... truncated, showing {shown} of at least {total} rows "
+                      f"({total - shown}+ more rows). Add filters, aggregation or a LIMIT to narrow the result.\n")
+    else:
+        output.append(f"... truncated, showing {shown} of {total} rows ({total - shown} more rows).\n")
+    if spill_path:
+        output.append(f"Full result ({total} rows) saved to: {spill_path}\n")
+    return "".join(output)
+
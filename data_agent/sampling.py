@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for the per-source `sampling` block in the YAML file.
+SAMPLING_DEFAULTS = {
+    'postgres': {'mode': 'batched', 'limit': 10, 'max_workers': 4, 'statement_timeout_ms': 5000, 'tablesample_percent': None},
+    'sqlite': {'mode': 'serial', 'limit': 10, 'max_workers': 4, 'statement_timeout_ms': 5000, 'tablesample_percent': None},
+    'local': {'mode': 'serial', 'limit': 10, 'max_workers': 4, 'statement_timeout_ms': 5000, 'tablesample_percent': None},
+}
+SAMPLING_MODES = ('serial', 'parallel', 'batched')
+
+
+def format_table_samples(samples: dict) -> str:
+    """
+    Renders sampled rows as text for the LLM.
+
+    Args:
+        samples (dict): Maps each table name to either a `(column_names, rows)` tuple
+            or the exception raised while sampling it.
+    """
+    output_text = ""
+    for table_name, sample in samples.items():
+        output_text += f"--- Sample data from table: {table_name} ---\n"
+        if isinstance(sample, Exception):
+            output_text += f"[Could not retrieve samples for table {table_name}: {sample}]\n\n"
+            continue
+        column_names, rows = sample
+        output_text += ", ".join(column_names) + "\n"
+        for row in rows:
+            output_text += ", ".join([str(cell) if cell is not None else 'NULL' for cell in row]) + "\n"
+        output_text += "\n"
+    return output_text
+
+
+def sample_tables_parallel(borrow_connection, tables: list, limit: int = 10, max_workers: int = 4,
+                           statement_timeout_ms=None, tablesample_percent=None) -> dict:
+    """
+    Samples tables concurrently, each worker on its own borrowed connection.
+
+    Args:
+        borrow_connection: A zero-argument callable returning a context manager that
+            yields a database connection (e.g. `lambda: manager.connection(name)`).
+        tables (list): The table names to sample.
+        max_workers (int): Upper bound on concurrent sampling queries.
+
+    Returns:
+        dict: Table name -> `(column_names, rows)` or the exception raised, in input order.
+    """
+    def sample(table_name):
+        try:
+            with borrow_connection() as db:
+                return db.sample_table(table_name, limit=limit, statement_timeout_ms=statement_timeout_ms,
+                                       tablesample_percent=tablesample_percent)
+        except Exception as e:
+            return e
+
+    if not tables:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tables)))) as executor:
+        results = list(executor.map(sample, tables))
+    return dict(zip(tables, results))
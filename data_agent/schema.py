@@ -0,0 +1,114 @@
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class ColumnInfo:
+    """A single column of a table."""
+    name: str
+    data_type: str
+    nullable: bool = True
+    primary_key: bool = False
+    comment: Optional[str] = None
+
+
+@dataclass
+class ForeignKey:
+    """A foreign key from `columns` to `ref_columns` of `ref_table`."""
+    columns: list
+    ref_table: str
+    ref_columns: list
+
+
+@dataclass
+class TableInfo:
+    """The structure of one table, plus its original DDL when the database keeps it."""
+    name: str
+    columns: list = field(default_factory=list)
+    foreign_keys: list = field(default_factory=list)
+    ddl: Optional[str] = None
+    comment: Optional[str] = None
+
+    @property
+    def primary_key(self) -> list:
+        return [c.name for c in self.columns if c.primary_key]
+
+
+@dataclass
+class DatabaseSchema:
+    """The structured schema of a database source."""
+    dialect: str
+    tables: dict = field(default_factory=dict)
+
+    def without(self, ignore_tables) -> "DatabaseSchema":
+        """Returns a copy of the schema without the given tables."""
+        ignore = set(ignore_tables or ())
+        if not ignore:
+            return self
+        return DatabaseSchema(
+            dialect=self.dialect,
+            tables={name: t for name, t in self.tables.items() if name not in ignore},
+        )
+
+    def subset(self, table_names) -> "DatabaseSchema":
+        """Returns a copy of the schema with only the given tables, in schema order."""
+        keep = set(table_names)
+        return DatabaseSchema(
+            dialect=self.dialect,
+            tables={name: t for name, t in self.tables.items() if name in keep},
+        )
+
+    def neighbors(self, table_name: str) -> set:
+        """Returns the tables linked to `table_name` by a foreign key in either direction."""
+        linked = set()
+        table = self.tables.get(table_name)
+        if table:
+            linked.update(fk.ref_table for fk in table.foreign_keys)
+        for other in self.tables.values():
+            if any(fk.ref_table == table_name for fk in other.foreign_keys):
+                linked.add(other.name)
+        linked.discard(table_name)
+        return {name for name in linked if name in self.tables}
+
+    def to_text(self) -> str:
+        """Renders the schema in the text format handed to the LLM."""
+        if self.dialect == 'sqlite':
+            if not self.tables:
+                return "No tables found in the database."
+            schema_str = "Database Schema:\n\n"
+            for table in self.tables.values():
+                schema_str += f"-- Schema for table: {table.name}\n"
+                schema_str += f"{table.ddl};\n\n"
+            return schema_str
+
+        schema_text = ""
+        for table in self.tables.values():
+            schema_text += f"Table: {table.name}\n"
+            if table.comment:
+                schema_text += f"Description: {table.comment}\n"
+            schema_text += "Columns:\n"
+            for column in table.columns:
+                schema_text += f"  - {column.name} ({column.data_type})"
+                schema_text += f" -- {column.comment}\n" if column.comment else "\n"
+            if table.primary_key:
+                schema_text += f"Primary key: {', '.join(table.primary_key)}\n"
+            for fk in table.foreign_keys:
+                schema_text += f"Foreign key: ({', '.join(fk.columns)}) -> {fk.ref_table}({', '.join(fk.ref_columns)})\n"
+            schema_text += "\n"
+        return schema_text
+
+
+@dataclass
+class CachedSchema:
+    """A schema cache entry: the structured schema, its fingerprint and rendered text."""
+    schema: DatabaseSchema
+    fingerprint: str
+    checked_at: float = field(default_factory=time.monotonic)
+    texts: dict = field(default_factory=dict)
+
+    def text(self, ignore_tables=()) -> str:
+        key = tuple(sorted(ignore_tables or ()))
+        if key not in self.texts:
+            self.texts[key] = self.schema.without(key).to_text()
+        return self.texts[key]
@@ -0,0 +1,109 @@
+import math
+import re
+from collections import Counter
+
+from .schema import DatabaseSchema
+
+# How many times each kind of term is repeated in a table's document, so that a
+# match on a table name outweighs a match on a column name or a sample value.
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+MAX_SAMPLE_VALUE_LENGTH = 64
+
+_TOKEN_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "get", "give", "how", "in", "is",
+    "it", "list", "me", "many", "much", "of", "on", "or", "show", "the", "to", "what", "which",
+    "who", "with", "all", "each", "every", "per", "their", "this", "that", "our", "my",
+}
+
+
+def tokenize(text: str) -> list:
+    """Splits text and identifiers (snake_case, camelCase) into lowercase, crudely singularized terms."""
+    terms = []
+    for token in _TOKEN_RE.findall(str(text)):
+        token = token.lower()
+        if token in _STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class SchemaIndex:
+    """
+    An offline BM25 index over the tables of one database source.
+
+    Each table is a document made of its name, comment, column names, column comments
+    and the string values of its sample rows. `select_tables()` returns the top-k tables
+    for a question plus their foreign-key neighbors, so joins stay possible.
+    """
+    def __init__(self, schema: DatabaseSchema, samples: dict = None, k1: float = 1.5, b: float = 0.75):
+        self.schema = schema
+        self.samples = samples or {}
+        self.k1 = k1
+        self.b = b
+        self._docs = {name: Counter(self._document_terms(name)) for name in schema.tables}
+        self._doc_lengths = {name: sum(terms.values()) for name, terms in self._docs.items()}
+        self._avg_length = (sum(self._doc_lengths.values()) / len(self._docs)) if self._docs else 0.0
+        document_frequency = Counter()
+        for terms in self._docs.values():
+            document_frequency.update(terms.keys())
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def _document_terms(self, table_name: str) -> list:
+        table = self.schema.tables[table_name]
+        terms = tokenize(table_name) * TABLE_NAME_WEIGHT
+        if table.comment:
+            terms += tokenize(table.comment)
+        for column in table.columns:
+            terms += tokenize(column.name) * COLUMN_NAME_WEIGHT
+            if column.comment:
+                terms += tokenize(column.comment)
+        sample = self.samples.get(table_name)
+        if sample and not isinstance(sample, Exception):
+            _, rows = sample
+            for row in rows:
+                for cell in row:
+                    if isinstance(cell, str) and len(cell) <= MAX_SAMPLE_VALUE_LENGTH:
+                        terms += tokenize(cell)
+        return terms
+
+    def search(self, question: str, top_k: int = 5) -> list:
+        """Returns up to `top_k` `(table_name, score)` pairs with a positive score, best first."""
+        query_terms = set(tokenize(question))
+        scores = []
+        for name, terms in self._docs.items():
+            length_norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[name] / (self._avg_length or 1))
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+            if score > 0:
+                scores.append((name, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:top_k]
+
+    def select_tables(self, question: str, top_k: int = 5, include_neighbors: bool = True) -> list:
+        """
+        Returns the names of the best matching tables, followed by their foreign-key neighbors.
+        Neighbors are added (referenced tables first) until the list holds `2 * top_k` tables.
+        """
+        selected = [name for name, _ in self.search(question, top_k)]
+        if include_neighbors:
+            max_tables = 2 * top_k
+            for name in list(selected):
+                table = self.schema.tables[name]
+                referenced = sorted({fk.ref_table for fk in table.foreign_keys})
+                referencing = sorted(self.schema.neighbors(name) - set(referenced))
+                for neighbor in referenced + referencing:
+                    if len(selected) >= max_tables:
+                        return selected
+                    if neighbor not in selected and neighbor in self.schema.tables:
+                        selected.append(neighbor)
+        return selected
@@ -0,0 +1,304 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+# Defaults for the top-level `session_store` block in the YAML file.
+SESSION_STORE_DEFAULTS = {
+    'enabled': True,
+    'path': "sessions.db",          # SQLite file holding every session's state and events.
+    'max_sessions': 100,            # Sessions kept in memory; the least recently used are evicted.
+    'idle_timeout': 1800,           # Seconds before an idle session is evicted from memory.
+    'retention': 30 * 24 * 3600,    # Seconds a session is kept in the file after its last update.
+    'keep_turns': 1,                # Most recent turns whose tool outputs stay in full.
+    'max_output_chars': 2000,       # Older tool outputs larger than this are compacted.
+    'preview_chars': 300,           # Characters of a compacted output kept as a preview.
+}
+
+
+def compact_output(name: str, response: dict, size: int, preview_chars: int) -> dict:
+    """The short stand-in for a large tool output from an earlier turn."""
+    text = response.get("result") if isinstance(response.get("result"), str) else json.dumps(response, default=str)
+    preview = text[:preview_chars].rstrip()
+    return {"result": (
+        f"[Output of an earlier {name} call, compacted: {size:,} characters, {text.count(chr(10)) + 1:,} lines. "
+        f"It began:\n{preview}\n...\nCall {name} again with the same arguments if the full output is needed.]"
+    )}
+
+
+class _CachedSession:
+    __slots__ = ("session", "bytes", "compacted_upto", "used_at")
+
+    def __init__(self, session: Session, size: int, compacted_upto: int = 0):
+        self.session = session
+        self.bytes = size                     # Serialized size of the events: what the model is sent.
+        self.compacted_upto = compacted_upto  # Events before this position have been compacted.
+        self.used_at = time.monotonic()
+
+
+class SessionStore(BaseSessionService):
+    """
+    A session service for the ADK runner that keeps memory bounded in long-running processes.
+
+    Every session and event is written through to a SQLite file. Only recently used sessions
+    are kept in memory (at most `max_sessions`, none idle for longer than `idle_timeout`);
+    others are loaded from the file when a chat continues. When a new turn starts, large tool
+    outputs from turns before the last `keep_turns` are replaced in the history by a short
+    summary, so they are neither kept in memory nor sent to the model on every later call.
+    """
+    def __init__(self, path: str = "sessions.db", max_sessions: int = 100, idle_timeout: float = 1800,
+                 retention: float = 30 * 24 * 3600, keep_turns: int = 1, max_output_chars: int = 2000,
+                 preview_chars: int = 300, enabled: bool = True):
+        self.max_sessions = int(max_sessions)
+        self.idle_timeout = float(idle_timeout)
+        self.keep_turns = int(keep_turns)
+        self.max_output_chars = int(max_output_chars)
+        self.preview_chars = int(preview_chars)
+        self._sessions = OrderedDict()    # (app_name, user_id, session_id) -> _CachedSession, LRU order
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "evictions": 0, "compacted_outputs": 0, "compacted_bytes": 0}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Losing the last events in a crash is fine; an fsync per event is not.
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "app_name TEXT NOT NULL, user_id TEXT NOT NULL, id TEXT NOT NULL, state TEXT NOT NULL, "
+            "last_update_time REAL NOT NULL, compacted_upto INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (app_name, user_id, id))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL, position INTEGER NOT NULL, "
+            "event TEXT NOT NULL, PRIMARY KEY (app_name, user_id, session_id, position))"
+        )
+        # 'app:' state (user_id '') and 'user:' state, shared by all of an app's / user's sessions.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            "app_name TEXT NOT NULL, user_id TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (app_name, user_id))"
+        )
+        expired = self._db.execute("SELECT app_name, user_id, id FROM sessions WHERE last_update_time < ?",
+                                   (time.time() - float(retention),)).fetchall()
+        for key in expired:
+            self._delete_rows(key)
+        self._db.commit()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "SessionStore":
+        return cls(**{**SESSION_STORE_DEFAULTS, **(settings or {})})
+
+    def _delete_rows(self, key: tuple):
+        self._db.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+        self._db.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+
+    def _shared_state(self, app_name: str, user_id: str) -> dict:
+        state = {}
+        for scope, prefix in (("", State.APP_PREFIX), (user_id, State.USER_PREFIX)):
+            row = self._db.execute("SELECT state FROM shared_state WHERE app_name = ? AND user_id = ?",
+                                   (app_name, scope)).fetchone()
+            if row:
+                state.update({prefix + k: v for k, v in json.loads(row[0]).items()})
+        return state
+
+    @staticmethod
+    def _own_state(state: dict) -> dict:
+        return {k: v for k, v in state.items()
+                if not k.startswith((State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX))}
+
+    def _load(self, key: tuple) -> Optional[_CachedSession]:
+        row = self._db.execute("SELECT state, last_update_time, compacted_upto FROM sessions "
+                               "WHERE app_name = ? AND user_id = ? AND id = ?", key).fetchone()
+        if row is None:
+            return None
+        rows = [event for (event,) in self._db.execute(
+            "SELECT event FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY position", key)]
+        session = Session(app_name=key[0], user_id=key[1], id=key[2], state=json.loads(row[0]),
+                          events=[Event.model_validate_json(event) for event in rows], last_update_time=row[1])
+        self._stats["loads"] += 1
+        return _CachedSession(session, sum(len(event) for event in rows), row[2])
+
+    def _cached(self, key: tuple) -> Optional[_CachedSession]:
+        """Returns a session from memory, or from the file (caching it again); None if it doesn't exist."""
+        entry = self._sessions.get(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._sessions[key] = entry
+        self._sessions.move_to_end(key)
+        entry.used_at = time.monotonic()
+        self._evict()
+        return entry
+
+    def _evict(self):
+        """Drops idle and least recently used sessions from memory; the file has all their events."""
+        now = time.monotonic()
+        while self._sessions:
+            key, entry = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - entry.used_at < self.idle_timeout:
+                break
+            del self._sessions[key]
+            self._stats["evictions"] += 1
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=self._own_state(state or {}),
+                          last_update_time=time.time())
+        with self._lock:
+            self._delete_rows(key)
+            self._db.execute("INSERT INTO sessions (app_name, user_id, id, state, last_update_time) "
+                             "VALUES (?, ?, ?, ?, ?)", (*key, json.dumps(session.state), session.last_update_time))
+            self._save_shared_state(app_name, user_id, state)
+            self._db.commit()
+            self._sessions[key] = _CachedSession(session, 0)
+            self._evict()
+            session.state.update(self._shared_state(app_name, user_id))
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        """
+        Returns the session itself rather than a copy (a long history is not duplicated per
+        call), or a shallow copy with fewer events when `config` asks for them.
+        """
+        with self._lock:
+            entry = self._cached((app_name, user_id, session_id))
+            if entry is None:
+                return None
+            session = entry.session
+            session.state.update(self._shared_state(app_name, user_id))
+        if config and (config.num_recent_events or config.after_timestamp):
+            events = session.events
+            if config.num_recent_events:
+                events = events[-config.num_recent_events:]
+            if config.after_timestamp:
+                events = [event for event in events if event.timestamp >= config.after_timestamp]
+            session = session.model_copy(update={"events": events})
+        return session
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            shared = self._shared_state(app_name, user_id)
+            rows = self._db.execute("SELECT id, state, last_update_time FROM sessions "
+                                    "WHERE app_name = ? AND user_id = ?", (app_name, user_id)).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, state={**json.loads(state), **shared},
+                    last_update_time=last_update_time)
+            for session_id, state, last_update_time in rows])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            self._sessions.pop(key, None)
+            self._delete_rows(key)
+            self._db.commit()
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None and event.author == "user":
+                self._compact(key, entry)
+        if entry is None:
+            print(f"Warning: session '{session.id}' is not in the session store; the event is not saved.")
+            return await super().append_event(session=session, event=event)
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        if entry.session is not session:
+            # The caller holds a copy (or a session evicted while in use); keep both current.
+            await super().append_event(session=entry.session, event=event)
+            entry.session.last_update_time = event.timestamp
+        with self._lock:
+            serialized = event.model_dump_json(exclude_none=True)
+            entry.bytes += len(serialized)
+            self._db.execute("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                             (*key, len(entry.session.events) - 1, serialized))
+            self._db.execute("UPDATE sessions SET state = ?, last_update_time = ?, compacted_upto = ? "
+                             "WHERE app_name = ? AND user_id = ? AND id = ?",
+                             (json.dumps(self._own_state(entry.session.state), default=str), event.timestamp,
+                              entry.compacted_upto, *key))
+            self._save_shared_state(session.app_name, session.user_id,
+                                    event.actions.state_delta if event.actions else None)
+            self._db.commit()
+        return event
+
+    def _save_shared_state(self, app_name: str, user_id: str, delta: Optional[dict]):
+        """Merges the 'app:' and 'user:' keys of a state delta into the shared state."""
+        if not delta:
+            return
+        for scope, prefix in (("", State.APP_PREFIX), (user_id, State.USER_PREFIX)):
+            changes = {k.removeprefix(prefix): v for k, v in delta.items() if k.startswith(prefix)}
+            if changes:
+                row = self._db.execute("SELECT state FROM shared_state WHERE app_name = ? AND user_id = ?",
+                                       (app_name, scope)).fetchone()
+                state = {**(json.loads(row[0]) if row else {}), **changes}
+                self._db.execute("INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                                 (app_name, scope, json.dumps(state, default=str)))
+
+    def _compact(self, key: tuple, entry: _CachedSession):
+        """
+        Compacts the large tool outputs of the turns before the last `keep_turns`, which a
+        new turn is about to start after. Each event is looked at once.
+        """
+        events = entry.session.events
+        turn_starts = [i for i in range(entry.compacted_upto, len(events)) if events[i].author == "user"]
+        if len(turn_starts) < self.keep_turns or not turn_starts:
+            return
+        boundary = turn_starts[-self.keep_turns] if self.keep_turns else len(events)
+        for position in range(entry.compacted_upto, boundary):
+            event = events[position]
+            changed = False
+            for part in (event.content.parts or []) if event.content else []:
+                call = part.function_response
+                if call is None or not isinstance(call.response, dict):
+                    continue
+                size = len(json.dumps(call.response, default=str))
+                if size <= self.max_output_chars:
+                    continue
+                call.response = compact_output(call.name, call.response, size, self.preview_chars)
+                saved = size - len(json.dumps(call.response))
+                entry.bytes -= saved
+                self._stats["compacted_outputs"] += 1
+                self._stats["compacted_bytes"] += saved
+                changed = True
+            if changed:
+                self._db.execute("UPDATE events SET event = ? WHERE app_name = ? AND user_id = ? "
+                                 "AND session_id = ? AND position = ?",
+                                 (event.model_dump_json(exclude_none=True), *key, position))
+        entry.compacted_upto = boundary
+
+    def session_stats(self, app_name: str, user_id: str, session_id: str) -> dict:
+        """The size of one session's history: roughly what is sent to the model on each call."""
+        with self._lock:
+            entry = self._sessions.get((app_name, user_id, session_id))
+            if entry is None:
+                return {"in_memory": False}
+            return {"in_memory": True, "events": len(entry.session.events), "history_bytes": entry.bytes}
+
+    def stats(self) -> dict:
+        """Sessions and history bytes held in memory, sessions in the file, and eviction/compaction counters."""
+        with self._lock:
+            stored = self._db.execute("SELECT count(*) FROM sessions").fetchone()[0]
+            return {
+                **self._stats,
+                "sessions_in_memory": len(self._sessions),
+                "memory_bytes": sum(entry.bytes for entry in self._sessions.values()),
+                "stored_sessions": stored,
+            }
+
+    def close(self):
+        with self._lock:
+            self._sessions.clear()
+            self._db.close()
@@ -0,0 +1,565 @@
+import difflib
+import functools
+import re
+import sqlite3
+
+from .cache import normalize_sql
+
+# Defaults for the per-source `sql_dialect` block in the YAML file.
+SQL_DIALECT_DEFAULTS = {
+    'transpile': True,   # Rewrite syntax of the other dialect (Postgres <-> SQLite) before running.
+    'validate': True,    # Check table and qualified column names against the cached schema first.
+}
+
+TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<name>[A-Za-z_][\w$]*)
+  | (?P<space>\s+)
+  | (?P<op>::|\|\||<=|>=|<>|!=|\S)
+""", re.S | re.X)
+COMMENT_OR_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.S)
+
+# Names that are never tables, aliases or columns.
+KEYWORDS = {
+    'select', 'from', 'where', 'join', 'on', 'using', 'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural',
+    'lateral', 'group', 'by', 'order', 'having', 'limit', 'offset', 'fetch', 'union', 'intersect', 'except', 'all',
+    'distinct', 'as', 'and', 'or', 'not', 'in', 'is', 'null', 'like', 'ilike', 'between', 'exists', 'case', 'when',
+    'then', 'else', 'end', 'with', 'recursive', 'values', 'window', 'over', 'partition', 'asc', 'desc', 'nulls',
+    'first', 'last', 'set', 'into', 'update', 'delete', 'insert', 'returning', 'default', 'filter', 'true', 'false',
+}
+# Keywords directly followed by '(' that are not function calls, so they keep a space before it.
+SPACED_KEYWORDS = KEYWORDS - {'left', 'right', 'filter', 'values'}
+CLAUSE_ENDS = {'where', 'group', 'order', 'having', 'limit', 'offset', 'fetch', 'union', 'intersect', 'except',
+               'window', 'returning', 'on', 'using', 'set', 'values', 'select'}
+JOIN_WORDS = {'join', 'left', 'right', 'inner', 'outer', 'full', 'cross', 'natural', 'lateral'}
+TYPE_WORDS = {'precision', 'varying', 'with', 'without', 'time', 'zone'}
+
+# SQLite 3.44 added concat() and string_agg(); older versions need them rewritten.
+SQLITE_HAS_CONCAT = sqlite3.sqlite_version_info >= (3, 44)
+
+SQLITE_CAST_TYPES = {
+    'int': 'INTEGER', 'integer': 'INTEGER', 'bigint': 'INTEGER', 'smallint': 'INTEGER', 'int4': 'INTEGER',
+    'int8': 'INTEGER', 'boolean': 'INTEGER', 'bool': 'INTEGER', 'numeric': 'REAL', 'decimal': 'REAL',
+    'real': 'REAL', 'float': 'REAL', 'float8': 'REAL', 'double': 'REAL', 'money': 'REAL', 'text': 'TEXT',
+    'varchar': 'TEXT', 'char': 'TEXT', 'character': 'TEXT', 'uuid': 'TEXT', 'json': 'TEXT', 'jsonb': 'TEXT',
+}
+# Date parts: SQLite strftime() codes, Postgres to_char() patterns.
+DATE_FORMATS = [('%Y', 'YYYY'), ('%m', 'MM'), ('%d', 'DD'), ('%H', 'HH24'), ('%M', 'MI'), ('%S', 'SS'), ('%j', 'DDD')]
+EXTRACT_FORMATS = {'year': '%Y', 'month': '%m', 'day': '%d', 'hour': '%H', 'minute': '%M', 'second': '%S',
+                   'dow': '%w', 'doy': '%j', 'epoch': '%s'}
+INTERVAL_UNITS = {'second', 'minute', 'hour', 'day', 'month', 'year'}
+# What to use instead, for functions the other dialect has.
+FUNCTION_HINTS = {
+    'sqlite': {
+        'now': "CURRENT_TIMESTAMP or datetime('now')", 'date_trunc': "date(x, 'start of month') or strftime()",
+        'extract': "strftime('%Y', x)", 'to_char': "strftime('%Y-%m', x)", 'string_agg': 'group_concat(x, sep)',
+        'array_agg': 'group_concat(x)', 'left': 'substr(x, 1, n)', 'right': 'substr(x, -n)',
+        'greatest': 'max(a, b)', 'least': 'min(a, b)', 'position': 'instr(string, substring)',
+        'concat': 'a || b', 'age': "julianday(a) - julianday(b)", 'to_date': "date(x)",
+    },
+    'postgres': {
+        'ifnull': 'COALESCE(a, b)', 'group_concat': "string_agg(x::text, ',')", 'instr': 'strpos(string, substring)',
+        'strftime': "to_char(x, 'YYYY-MM')", 'datetime': 'now() or x::timestamp', 'julianday': 'extract(epoch from x)',
+        'total': 'COALESCE(sum(x), 0)',
+    },
+}
+
+
+def dialect_of(source_type: str) -> str:
+    """The SQL dialect of a source type: Postgres, or SQLite (also for file/json sources)."""
+    return 'postgres' if source_type == 'postgres' else 'sqlite'
+
+
+def _lex(text: str) -> list:
+    """Tokens `(kind, text)` of a SQL text, without whitespace and comments."""
+    return [(m.lastgroup, m.group()) for m in TOKEN.finditer(text) if m.lastgroup not in ('space', 'comment')]
+
+
+def normalize(query: str) -> str:
+    """The query without comments, normalized like result cache keys (case, whitespace, `;`)."""
+    return normalize_sql(COMMENT_OR_LITERAL.sub(lambda m: " " if m.group()[0] in "-/" else m.group(), query))
+
+
+@functools.lru_cache(maxsize=1024)
+def parse(normalized: str) -> tuple:
+    """The tokens of a normalized query; cached, so repeated and retried queries are lexed once."""
+    return tuple(_lex(normalized))
+
+
+def _render(tokens) -> str:
+    parts, previous = [], None
+    for kind, text in tokens:
+        if previous is not None and not (
+                text in (')', ',', '.', '::') or previous[1] in ('(', '.', '::')
+                or (text == '(' and previous[0] == 'name' and previous[1].lower() not in SPACED_KEYWORDS)):
+            parts.append(' ')
+        parts.append(text)
+        previous = (kind, text)
+    return ''.join(parts)
+
+
+def _closing(tokens, start: int) -> int:
+    """The index of the parenthesis closing the one at `start`."""
+    depth = 0
+    for i in range(start, len(tokens)):
+        depth += {'(': 1, ')': -1}.get(tokens[i][1], 0)
+        if depth == 0:
+            return i
+    raise ValueError("Unbalanced parentheses in the query.")
+
+
+def _arguments(tokens) -> list:
+    """Splits tokens at top-level commas."""
+    args, current, depth = [], [], 0
+    for token in tokens:
+        depth += {'(': 1, ')': -1}.get(token[1], 0)
+        if token[1] == ',' and depth == 0:
+            args.append(current)
+            current = []
+        else:
+            current.append(token)
+    return args + [current] if current or args else args
+
+
+def _operand_start(tokens) -> int:
+    """Where the operand ending the token list starts: a literal, a dotted name or a call/parenthesis."""
+    i = len(tokens) - 1
+    if i < 0:
+        raise ValueError("An operator is missing its operand.")
+    if tokens[i][1] == ')':
+        depth = 0
+        while i >= 0:
+            depth += {')': 1, '(': -1}.get(tokens[i][1], 0)
+            if depth == 0:
+                break
+            i -= 1
+        if i > 0 and tokens[i - 1][0] == 'name' and tokens[i - 1][1].lower() not in KEYWORDS:
+            i -= 1
+        return i
+    while i >= 2 and tokens[i - 1][1] == '.' and tokens[i - 2][0] in ('name', 'quoted'):
+        i -= 2
+    return i
+
+
+def _join(*parts) -> list:
+    """Concatenates token lists and SQL snippets (lexed)."""
+    tokens = []
+    for part in parts:
+        tokens.extend(_lex(part) if isinstance(part, str) else part)
+    return tokens
+
+
+def _literal(token) -> str:
+    """The value of a string literal token, or None."""
+    return token[1][1:-1].replace("''", "'") if token[0] == 'string' else None
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _interval_modifiers(text: str) -> list:
+    """SQLite date modifiers for a Postgres interval ('1 month 2 days' -> ['1 months', '2 days'])."""
+    parts = re.findall(r'(-?\d+(?:\.\d+)?)\s*([a-z]+)', text.lower())
+    modifiers = []
+    for amount, unit in parts:
+        unit = unit.rstrip('s')
+        if unit == 'week':
+            amount, unit = str(float(amount) * 7).rstrip('0').rstrip('.'), 'day'
+        if unit not in INTERVAL_UNITS:
+            return []
+        modifiers.append(f"{amount} {unit}s")
+    return modifiers
+
+
+def _to_sqlite_call(name: str, args: list, changes: set):
+    """The SQLite replacement of a Postgres-only function call, or None to keep it."""
+    n = len(args)
+    if name == 'now' and n == 0:
+        changes.add("now() -> CURRENT_TIMESTAMP")
+        return _join("CURRENT_TIMESTAMP")
+    if name == 'date_trunc' and n == 2 and _literal(args[0][0] if args[0] else ('', '')):
+        unit = _literal(args[0][0]).lower()
+        modifier = {'year': 'start of year', 'month': 'start of month', 'day': None}.get(unit, False)
+        if modifier is not False:
+            changes.add("date_trunc() -> date(x, 'start of ...')")
+            return _join("date(", args[1], f", {_quote_literal(modifier)})" if modifier else ")")
+        if unit in ('hour', 'minute'):
+            changes.add("date_trunc() -> strftime()")
+            pattern = '%Y-%m-%d %H:00:00' if unit == 'hour' else '%Y-%m-%d %H:%M:00'
+            return _join(f"strftime({_quote_literal(pattern)}, ", args[1], ")")
+    if name == 'extract' and n == 1:
+        field, rest = args[0][:1], args[0][1:]
+        if field and rest and rest[0][1].lower() == 'from' and field[0][1].lower() in EXTRACT_FORMATS:
+            changes.add("EXTRACT(... FROM x) -> strftime()")
+            code = EXTRACT_FORMATS[field[0][1].lower()]
+            return _join(f"CAST(strftime({_quote_literal(code)}, ", rest[1:], ") AS INTEGER)")
+    if name == 'position' and n == 1:
+        words = [t[1].lower() for t in args[0]]
+        if 'in' in words:
+            split = words.index('in')
+            changes.add("position(a IN b) -> instr(b, a)")
+            return _join("instr(", args[0][split + 1:], ", ", args[0][:split], ")")
+    if name == 'left' and n == 2:
+        changes.add("left() -> substr()")
+        return _join("substr(", args[0], ", 1, ", args[1], ")")
+    if name == 'right' and n == 2:
+        changes.add("right() -> substr()")
+        return _join("substr(", args[0], ", -(", args[1], "))")
+    if name in ('greatest', 'least') and n >= 2:
+        changes.add(f"{name}() -> {'max' if name == 'greatest' else 'min'}()")
+        return _join('max(' if name == 'greatest' else 'min(', *[part for i, arg in enumerate(args)
+                                                                 for part in ((", ", arg) if i else (arg,))], ")")
+    if name == 'to_char' and n == 2 and _literal(args[1][0] if args[1] else ('', '')) is not None:
+        pattern = _literal(args[1][0])
+        for code, pg_pattern in sorted(DATE_FORMATS, key=lambda f: -len(f[1])):
+            pattern = pattern.replace(pg_pattern, code)
+        changes.add("to_char() -> strftime()")
+        return _join(f"strftime({_quote_literal(pattern)}, ", args[0], ")")
+    if name == 'string_agg' and n == 2 and not SQLITE_HAS_CONCAT:
+        changes.add("string_agg() -> group_concat()")
+        return _join("group_concat(", args[0], ", ", args[1], ")")
+    if name == 'concat' and n >= 1 and not SQLITE_HAS_CONCAT:
+        changes.add("concat() -> ||")
+        parts = [part for i, arg in enumerate(args) for part in ((" || ", "coalesce(", arg, ", '')") if i
+                                                                  else ("coalesce(", arg, ", '')"))]
+        return _join("(", *parts, ")")
+    return None
+
+
+def _to_postgres_call(name: str, args: list, changes: set):
+    """The Postgres replacement of a SQLite-only function call, or None to keep it."""
+    n = len(args)
+    if name == 'ifnull' and n == 2:
+        changes.add("ifnull() -> COALESCE()")
+        return _join("COALESCE(", args[0], ", ", args[1], ")")
+    if name == 'group_concat' and n in (1, 2):
+        value = args[0]
+        distinct = _lex("DISTINCT") if value and value[0][1].lower() == 'distinct' else []
+        changes.add("group_concat() -> string_agg()")
+        return _join("string_agg(", distinct, "CAST(", value[len(distinct):], " AS TEXT), ",
+                     args[1] if n == 2 else "','", ")")
+    if name == 'instr' and n == 2:
+        changes.add("instr() -> strpos()")
+        return _join("strpos(", args[0], ", ", args[1], ")")
+    if name in ('datetime', 'date') and n >= 1:
+        value = _literal(args[0][0]) if len(args[0]) == 1 else None
+        modifiers = [_literal(arg[0]) if len(arg) == 1 else None for arg in args[1:]]
+        # date(x) and date('now') are valid Postgres (a cast to date); datetime() is not.
+        if name == 'datetime' and not modifiers:
+            if value is not None and value.lower() == 'now':
+                changes.add("datetime('now') -> now()")
+                return _join("now()")
+            changes.add("datetime(x) -> CAST(x AS TIMESTAMP)")
+            return _join("CAST(", args[0], " AS TIMESTAMP)")
+        if name == 'date' and len(modifiers) == 1 and modifiers[0] in ('start of month', 'start of year'):
+            changes.add("date(x, 'start of ...') -> date_trunc()")
+            return _join(f"CAST(date_trunc('{modifiers[0].split()[-1]}', CAST(", args[0], " AS TIMESTAMP)) AS DATE)")
+    if name == 'strftime' and n == 2 and _literal(args[0][0] if args[0] else ('', '')) is not None:
+        pattern = _literal(args[0][0])
+        if re.search(r'%[^YmdHMSj]', pattern):
+            return None
+        for code, pg_pattern in DATE_FORMATS:
+            pattern = pattern.replace(code, pg_pattern)
+        value = _literal(args[1][0]) if len(args[1]) == 1 else None
+        changes.add("strftime() -> to_char()")
+        operand = _join("now()") if value is not None and value.lower() == 'now' else _join("CAST(", args[1], " AS TIMESTAMP)")
+        return _join("to_char(", operand, f", {_quote_literal(pattern)})")
+    return None
+
+
+def _cast_type(tokens, i: int) -> int:
+    """The end (exclusive) of the type name starting at `i`, e.g. `double precision` or `numeric(10, 2)`."""
+    end = i + 1
+    while end < len(tokens) and tokens[end][0] == 'name' and tokens[end][1].lower() in TYPE_WORDS:
+        end += 1
+    if end < len(tokens) and tokens[end][1] == '(':
+        end = _closing(tokens, end) + 1
+    return end
+
+
+def _rewrite(tokens, dialect: str, changes: set) -> list:
+    out, i = [], 0
+    call = _to_sqlite_call if dialect == 'sqlite' else _to_postgres_call
+    while i < len(tokens):
+        kind, text = tokens[i]
+        lower = text.lower()
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else None
+        if kind == 'name' and following == '(' and not (out and out[-1][1] == '.'):
+            end = _closing(tokens, i + 1)
+            args = [_rewrite(arg, dialect, changes) for arg in _arguments(tokens[i + 2:end])]
+            replacement = call(lower, args, changes)
+            if replacement is None:
+                replacement = _join([(kind, text), ('op', '(')],
+                                    *[part for n, arg in enumerate(args) for part in (([('op', ',')], arg) if n else (arg,))],
+                                    [('op', ')')])
+            out.extend(replacement)
+            i = end + 1
+            continue
+        if dialect == 'sqlite':
+            if text == '::' and i + 1 < len(tokens):
+                end = _cast_type(tokens, i + 1)
+                type_name = tokens[i + 1][1].lower()
+                start = _operand_start(out)
+                operand, out = out[start:], out[:start]
+                if type_name in ('date', 'timestamp', 'timestamptz'):
+                    out.extend(_join("date(" if type_name == 'date' else "datetime(", operand, ")"))
+                else:
+                    out.extend(_join("CAST(", operand, f" AS {SQLITE_CAST_TYPES.get(type_name, 'TEXT')})"))
+                changes.add("x::type -> CAST(x AS type)")
+                i = end
+                continue
+            if lower in ('ilike',):
+                out.append(('name', 'LIKE'))
+                changes.add("ILIKE -> LIKE (case-insensitive for ASCII in SQLite)")
+                i += 1
+                continue
+            if lower == 'interval' and out and out[-1][1] in ('+', '-') and i + 1 < len(tokens) \
+                    and tokens[i + 1][0] == 'string' and _interval_modifiers(_literal(tokens[i + 1])):
+                sign = out.pop()[1]
+                start = _operand_start(out)
+                operand, out = out[start:], out[:start]
+                modifiers = []
+                for modifier in _interval_modifiers(_literal(tokens[i + 1])):
+                    amount, unit = modifier.split()
+                    amount = amount[1:] if amount.startswith('-') else f"-{amount}" if sign == '-' else amount
+                    modifiers.append(", " + _quote_literal(f"{'+' if not amount.startswith('-') else ''}{amount} {unit}"))
+                out.extend(_join("datetime(", operand, *modifiers, ")"))
+                changes.add("x +/- INTERVAL '...' -> datetime(x, '...')")
+                i += 2
+                continue
+            if lower == 'fetch' and i + 4 < len(tokens) and tokens[i + 1][1].lower() in ('first', 'next') \
+                    and tokens[i + 2][0] == 'number' and [t[1].lower() for t in tokens[i + 3:i + 5]] in (
+                        ['rows', 'only'], ['row', 'only']):
+                out.extend(_join(f"LIMIT {tokens[i + 2][1]}"))
+                changes.add("FETCH FIRST n ROWS ONLY -> LIMIT n")
+                i += 5
+                continue
+        else:
+            if kind == 'quoted' and text.startswith('`'):
+                out.append(('quoted', '"' + text[1:-1].replace('"', '""') + '"'))
+                changes.add("`name` -> \"name\"")
+                i += 1
+                continue
+            if lower == 'limit' and i + 3 < len(tokens) and tokens[i + 1][0] == 'number' and tokens[i + 2][1] == ',' \
+                    and tokens[i + 3][0] == 'number':
+                out.extend(_join(f"LIMIT {tokens[i + 3][1]} OFFSET {tokens[i + 1][1]}"))
+                changes.add("LIMIT offset, n -> LIMIT n OFFSET offset")
+                i += 4
+                continue
+        out.append((kind, text))
+        i += 1
+    return out
+
+
+@functools.lru_cache(maxsize=1024)
+def _transpile(normalized: str, dialect: str) -> tuple:
+    changes = set()
+    tokens = _rewrite(list(parse(normalized)), dialect, changes)
+    return (_render(tokens) if changes else None), tuple(sorted(changes))
+
+
+def transpile(query: str, dialect: str) -> tuple:
+    """
+    Rewrites constructs of the other dialect (Postgres casts, ILIKE, date functions, ... for
+    SQLite; ifnull, group_concat, strftime, backticks, ... for Postgres) that the source's
+    dialect doesn't accept. Returns `(query, changes)`: the original query when nothing needs
+    rewriting, otherwise the rewritten (normalized) query and what was changed.
+    """
+    if not query.strip():
+        return query, ()
+    rewritten, changes = _transpile(normalize(query), dialect)
+    return (rewritten, changes) if rewritten else (query, ())
+
+
+def _unquote(text: str) -> str:
+    return text[1:-1] if text[:1] in ('"', '`') else text
+
+
+def references(query: str) -> dict:
+    """
+    The tables a query reads (alias -> (schema or None, table)), the names its CTEs and
+    subqueries define, and its qualified column references `(qualifier, column)`.
+    """
+    tokens = parse(normalize(query))
+    tables, defined, columns = {}, set(), []
+    names = [(_unquote(t[1]).lower() if t[0] in ('name', 'quoted') else None) for t in tokens]
+    for i, token in enumerate(tokens):
+        # CTEs: WITH [RECURSIVE] name [(columns)] AS (
+        if names[i] in ('with', 'recursive') or token[1] == ',':
+            j = i + 1
+            if j < len(tokens) and names[j] and names[j] not in KEYWORDS:
+                k = _closing(tokens, j + 1) + 1 if j + 1 < len(tokens) and tokens[j + 1][1] == '(' else j + 1
+                if k + 1 < len(tokens) and names[k] == 'as' and tokens[k + 1][1] == '(':
+                    defined.add(names[j])
+    depth_in_from = set()
+    depth = 0
+    expect_table = False
+    i = 0
+    while i < len(tokens):
+        text, name = tokens[i][1], names[i]
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth_in_from.discard(depth)
+            depth -= 1
+        elif name == 'into' and (i == 0 or names[i - 1] not in ('insert', 'replace', 'merge', 'ignore', 'abort',
+                                                                 'fail', 'rollback')):
+            # SELECT ... INTO [TEMP] [TABLE] name creates the table rather than reading it.
+            j = i + 1
+            while j < len(tokens) and names[j] in ('temp', 'temporary', 'unlogged', 'table'):
+                j += 1
+            if j < len(tokens) and names[j]:
+                defined.add(names[j])
+            i = j + 1
+            continue
+        elif name == 'from' or name == 'join' or (name in ('update', 'into') and depth not in depth_in_from):
+            expect_table = True
+            if name == 'from':
+                depth_in_from.add(depth)
+            i += 1
+            continue
+        elif text == ',' and depth in depth_in_from:
+            expect_table = True
+            i += 1
+            continue
+        elif name in CLAUSE_ENDS or name in JOIN_WORDS - {'join', 'lateral'}:
+            if name in CLAUSE_ENDS:
+                depth_in_from.discard(depth)
+        if expect_table and name == 'lateral':
+            i += 1
+            continue
+        if expect_table:
+            expect_table = False
+            if text == '(':
+                # A subquery: skip it and remember its alias.
+                end = _closing(tokens, i)
+                depth -= 1
+                j = end + 1 + (1 if end + 1 < len(tokens) and names[end + 1] == 'as' else 0)
+                if j < len(tokens) and names[j] and names[j] not in KEYWORDS:
+                    defined.add(names[j])
+                i = end + 1
+                continue
+            if name and name not in KEYWORDS:
+                schema, table, j = None, tokens[i][1], i + 1
+                if j + 1 < len(tokens) and tokens[j][1] == '.' and names[j + 1]:
+                    schema, table, j = table, tokens[j + 1][1], j + 2
+                if j < len(tokens) and tokens[j][1] == '(':
+                    i = j  # A table function, e.g. generate_series(...).
+                    continue
+                entry = (_unquote(schema) if schema else None, _unquote(table))
+                tables.setdefault(entry[1].lower(), entry)
+                k = j + (1 if j < len(tokens) and names[j] == 'as' else 0)
+                if k < len(tokens) and names[k] and names[k] not in KEYWORDS and tokens[k][1] != '(':
+                    tables[names[k]] = entry
+                    i = k + 1
+                    continue
+                i = j
+                continue
+        i += 1
+    for i in range(len(tokens) - 2):
+        if names[i] and tokens[i + 1][1] == '.' and names[i + 2] and (i == 0 or tokens[i - 1][1] != '.') \
+                and not (i + 3 < len(tokens) and tokens[i + 3][1] in ('(', '.')):
+            columns.append((names[i], _unquote(tokens[i + 2][1])))
+    return {"tables": tables, "defined": defined, "columns": columns}
+
+
+def _suggest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(name.lower(), [c.lower() for c in candidates], n=3, cutoff=0.6)
+    by_lower = {c.lower(): c for c in candidates}
+    return f" Did you mean {', '.join(repr(by_lower[m]) for m in matches)}?" if matches else ""
+
+
+def _tables_with_column(schema, column: str) -> list:
+    return [t.name for t in schema.tables.values() if any(c.name.lower() == column.lower() for c in t.columns)]
+
+
+def validate(query: str, schema) -> list:
+    """
+    Problems with the tables and qualified columns a query names, checked against a cached
+    `DatabaseSchema`, each with a fix hint. Tables in other schemas, system tables, CTEs and
+    subquery aliases are not checked, nor are unknown tables of SQLite sources (their schema
+    has no views; the database's own error gets the hints instead).
+    """
+    refs = references(query)
+    tables = {name.lower(): table for name, table in schema.tables.items()}
+    default_schema = 'public' if schema.dialect == 'postgres' else 'main'
+    problems = []
+    for alias, (table_schema, table) in refs["tables"].items():
+        if table_schema not in (None, default_schema) or table.lower() in refs["defined"] \
+                or table.lower().startswith(('sqlite_', 'pg_')) or schema.dialect == 'sqlite':
+            continue
+        if table.lower() not in tables and alias == table.lower():
+            problems.append(f"Table '{table}' does not exist.{_suggest(table, schema.tables)} "
+                            f"Tables: {', '.join(list(schema.tables)[:30])}.")
+    for qualifier, column in refs["columns"]:
+        entry = refs["tables"].get(qualifier)
+        if entry is None or entry[0] not in (None, default_schema):
+            continue
+        table = tables.get(entry[1].lower())
+        if table is None or any(c.name.lower() == column.lower() for c in table.columns):
+            continue
+        hint = _suggest(column, [c.name for c in table.columns])
+        elsewhere = [t for t in _tables_with_column(schema, column) if t != table.name]
+        if elsewhere:
+            hint += f" '{column}' is a column of {', '.join(elsewhere)}."
+        problems.append(f"Column '{qualifier}.{column}' does not exist: {table.name} has no column '{column}'.{hint} "
+                        f"Columns of {table.name}: {', '.join(c.name for c in table.columns)}.")
+    return problems
+
+
+def fix_hints(error: str, query: str, dialect: str, schema=None) -> str:
+    """Hints for a database error, from the query and the schema (missing names, functions, syntax)."""
+    message = str(error)
+    hints = []
+    column = re.search(r'no such column: (?:[\w"]+\.)?"?([\w$]+)"?|column "?(?:[\w$]+\.)?([\w$]+)"? does not exist',
+                       message)
+    table = re.search(r'no such table: (?:\w+\.)?"?([\w$]+)"?|relation "(?:\w+\.)?([\w$]+)" does not exist', message)
+    function = re.search(r'no such function: ([\w$]+)|function ([\w$]+)\(.*?\) does not exist', message)
+    if column and schema is not None:
+        name = column.group(1) or column.group(2)
+        read = [t for _, t in references(query)["tables"].values() if t in schema.tables]
+        for table_name in dict.fromkeys(read):
+            columns = [c.name for c in schema.tables[table_name].columns]
+            hints.append(f"{table_name} columns: {', '.join(columns)}.{_suggest(name, columns)}")
+        elsewhere = [t for t in _tables_with_column(schema, name) if t not in read]
+        if elsewhere:
+            hints.append(f"'{name}' is a column of {', '.join(elsewhere)}; join it.")
+    if table and schema is not None:
+        name = table.group(1) or table.group(2)
+        hints.append(f"Tables: {', '.join(list(schema.tables)[:30])}.{_suggest(name, schema.tables)}")
+    if function:
+        name = (function.group(1) or function.group(2)).lower()
+        other = FUNCTION_HINTS[dialect].get(name)
+        hints.append(f"This is a {dialect} source: use {other} instead of {name}()." if other
+                     else f"{name}() is not available in {dialect}.")
+    if 'operator does not exist' in message:
+        hints.append("Cast one side so both have the same type, e.g. CAST(x AS NUMERIC) or x::text.")
+    if not hints and 'syntax error' in message.lower():
+        hints.append(f"This is a {dialect} source; check for syntax of the other dialect "
+                     + ("(e.g. backticks, LIMIT a, b)." if dialect == 'postgres' else "(e.g. ::casts, ILIKE, INTERVAL)."))
+    return ("\nHint: " + "\nHint: ".join(hints)) if hints else ""
+
+
+def prepare_query(query: str, dialect: str, settings: dict, schema=None) -> tuple:
+    """
+    Gets a query ready for a source before it runs: transpiles syntax of the other dialect
+    and checks the names it uses against the cached schema.
+
+    Returns `(query, note)`: the statement to run and, if it was rewritten, a note for the
+    LLM with the rewrite. Raises ValueError with fix hints when the query names tables or
+    columns that don't exist, so the agent can correct it without a round trip to the database.
+    """
+    note = ""
+    if settings.get('transpile'):
+        query, changes = transpile(query, dialect)
+        if changes:
+            note = f"Note: the query was rewritten for {dialect} ({'; '.join(changes)}):\n{query}\n"
+    if settings.get('validate') and schema is not None:
+        problems = validate(query, schema)
+        if problems:
+            raise ValueError("Query checked before running: " + " ".join(problems))
+    return query, note
@@ -1,8 +1,18 @@
 from google.adk.agents import Agent
+from ...executor import async_tool
+from ...tracing import agent_callbacks
 from .tools import (
     run_sql_query,
+    explain_sql_query,
+    run_federated_query,
     run_api_query,
+    run_api_batch,
     read_json_data_source,
+    filter_result,
+    aggregate_result,
+    sort_result,
+    join_results,
+    show_result,
 )
 
 query_agent = Agent(
@@ -11,12 +21,31 @@ query_agent = Agent(
     description="An agent that can query various data sources",
     instruction=(
         "Your goal is the execute the plan of the parent agent and answer the user's query. "
-        "If you can try to complete the task without asking questions from the user, do so."
+        "If you can try to complete the task without asking questions from the user, do so. "
+        "When the same API endpoint has to be called for many values (e.g. every customer), "
+        "use run_api_batch with all the requests instead of calling run_api_query repeatedly. "
+        "When the answer needs data from more than one source (e.g. transactions joined with a blacklist file "
+        "or with credit scores from an API), use run_federated_query to join them in a single query "
+        "instead of copying data between tool calls. "
+        "If run_sql_query rejects a query as too expensive, read the plan and hints it returns and rewrite the query "
+        "(add the missing join condition, filter on indexed columns, aggregate) instead of retrying it unchanged. "
+        "When a result has to be processed in further steps (filtered, aggregated, sorted or joined with another "
+        "result), run the query with store_result=True and work on the returned handle with filter_result, "
+        "aggregate_result, sort_result and join_results; show only the final rows with show_result."
     ),
     tools=[
-        run_sql_query,
-        run_api_query,
-        read_json_data_source,
+        async_tool(run_sql_query),
+        async_tool(explain_sql_query),
+        async_tool(run_federated_query),
+        async_tool(run_api_query),
+        async_tool(run_api_batch),
+        async_tool(read_json_data_source),
+        async_tool(filter_result),
+        async_tool(aggregate_result),
+        async_tool(sort_result),
+        async_tool(join_results),
+        async_tool(show_result),
     ],
+    **agent_callbacks(),
     
 )
\ No newline at end of file
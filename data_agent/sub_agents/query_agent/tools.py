@@ -1,75 +1,345 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-import psycopg2
 import requests
 import sqlite3
-from ...data_source_manager import DataSourceManager
+from ...cache import FEDERATED_SOURCE, is_read_only_query, normalize_sql
+from ...data_source_manager import SQL_SOURCE_TYPES, DataSourceManager
+from ...db import QueryError, postgres_error
+from ...federation import FederatedQuery
+from ...file_reader import ByteSource, is_url, read_source
+from ...local_engine import LOADERS, LOCAL_ENGINE_DEFAULTS
+from ...query_guard import can_add_limit, explain_query, guard_query
+from ...results import RESULT_LIMIT_DEFAULTS, render_result, spill_file_path
+from ...sql_dialect import dialect_of, fix_hints, prepare_query
 import json
 
-def run_sql_query(data_source_name: str, query: str) -> str:
+def _prepare_sql(manager, data_source_name: str, query: str) -> tuple:
+    """Transpiles and validates a query for a source (see `sql_dialect.prepare_query`)."""
+    settings = manager.get_sql_dialect_settings(data_source_name)
+    dialect = dialect_of(manager.get_source(data_source_name).get('type'))
+    if not settings['validate']:
+        return prepare_query(query, dialect, settings)
+    try:
+        return prepare_query(query, dialect, settings, manager.get_schema(data_source_name))
+    except ValueError:
+        # The cached schema may predate a table created since; re-read it before rejecting the query.
+        return prepare_query(query, dialect, settings, manager.get_schema(data_source_name, refresh=True))
+
+
+def _sql_error(manager, data_source_name: str, query: str, error) -> str:
+    """A database error with fix hints from the source's cached schema."""
+    try:
+        schema = manager.get_schema(data_source_name)
+    except (ValueError, ConnectionError, OSError, postgres_error(), sqlite3.Error):
+        schema = None
+    dialect = dialect_of(manager.get_source(data_source_name).get('type'))
+    return f"Error: {error}{fix_hints(error, query, dialect, schema)}"
+
+
+def run_sql_query(data_source_name: str, query: str, store_result: bool = False) -> str:
     """
     Run a SQL query against a specific data source.
+    Besides databases, 'file' and 'json' sources (JSON, NDJSON, CSV or Parquet files) can be
+    queried too: they are loaded into local SQLite tables (see `get_db_schema_and_sample_data`).
+    The result is returned as CSV text with a header row. Large results are truncated to the
+    source's row/size budget with a summary of how many rows were left out, so prefer
+    aggregations and filters over selecting whole tables.
+    The query's plan is checked before it runs: queries estimated to be too expensive
+    (e.g. joins without a join condition) are rejected with the plan and hints, or run with
+    a LIMIT added, and long-running statements are cancelled. Syntax of the other dialect
+    (e.g. Postgres `::` casts or ILIKE on a SQLite source) is rewritten automatically, and
+    unknown tables or columns are reported with suggestions before the query runs.
+    With `store_result`, the full result is kept on the server instead and a handle (e.g. 'r3')
+    is returned with a preview; use it with filter_result, aggregate_result, sort_result,
+    join_results and show_result.
     Args:
         data_source_name (str): The name of the data source as defined in the YAML config.
         query (str): The SQL query string to execute.
+        store_result (bool): Store the result and return a handle instead of the rows.
     """
-    db = None
     try:
         manager = DataSourceManager()
         source_config = manager.get_source(data_source_name)
-        db = manager.get_db_connection(source_name=data_source_name)
-        
         db_type = source_config.get('type')
+        if db_type not in SQL_SOURCE_TYPES:
+            return f"Error: Cannot run SQL query on source type '{db_type}'."
+        limits = manager.get_result_limits(data_source_name)
+
+        # Only read-only statements are served from (and stored in) the result cache;
+        # anything else may change the data, so it drops the source's cached results.
+        cache_key = "sql:" + normalize_sql(query)
+        read_only = is_read_only_query(query)
+        if not read_only:
+            manager.result_cache.invalidate_source(data_source_name)
+        elif not store_result:
+            cached = manager.result_cache.get(data_source_name, cache_key)
+            if cached is not None:
+                return cached
 
-        if db_type == 'postgres':
-            # Assumes the PostgresDB class has a 'query' method
-            result = db.query(query)
-        elif db_type == 'sqlite':
-            # Assumes the SQLiteDB class has an 'execute_query' method
-            result = db.execute_query(query)
+        query, dialect_note = _prepare_sql(manager, data_source_name, query)
+        guard = manager.get_query_guard_settings(data_source_name)
+        with manager.connection(data_source_name) as db:
+            # The plan is checked first, so runaway queries are rejected (or limited) before they run.
+            statement, note = guard_query(db, query, guard)
+            note = dialect_note + note
+            column_names, batches = db.stream_query(statement, fetch_size=int(limits['fetch_size']),
+                                                    statement_timeout_ms=guard['statement_timeout_ms'])
+            if column_names is None:
+                return f"Query executed successfully. Rows affected: {batches}."
+            if store_result:
+                stored = manager.result_store.store_rows(column_names, batches, f"run_sql_query on {data_source_name}")
+                return note + manager.result_store.describe(stored, int(limits['max_bytes']))
+            spill_path = spill_file_path(limits['spill_dir'], data_source_name) if limits['spill'] else None
+            result = render_result(
+                column_names, batches,
+                max_rows=int(limits['max_rows']),
+                max_bytes=int(limits['max_bytes']),
+                max_scan_rows=int(limits['max_scan_rows']),
+                spill_path=spill_path,
+            )
+        result = note + result
+        if read_only:
+            manager.result_cache.put(data_source_name, cache_key, result, manager.get_cache_ttl(data_source_name))
+        return result
+    except (postgres_error(), sqlite3.Error, QueryError) as e:
+        return _sql_error(manager, data_source_name, query, e)
+    except (ValueError, ConnectionError, OSError) as e:
+        return f"Error: {e}"
+
+def explain_sql_query(data_source_name: str, query: str) -> str:
+    """
+    Show the estimated plan of a SQL query without running it: the estimated cost and rows,
+    how each table is read (full scan or index), tuning hints, and whether run_sql_query
+    would accept it. Use it to check an expensive-looking query before running it.
+    Args:
+        data_source_name (str): The name of the data source as defined in the YAML config.
+        query (str): The SQL query string to explain.
+    """
+    try:
+        manager = DataSourceManager()
+        db_type = manager.get_source(data_source_name).get('type')
+        if db_type not in SQL_SOURCE_TYPES:
+            return f"Error: Cannot explain a SQL query on source type '{db_type}'."
+        query, note = _prepare_sql(manager, data_source_name, query)
+        guard = manager.get_query_guard_settings(data_source_name)
+        with manager.connection(data_source_name) as db:
+            estimate = explain_query(db, query, guard)
+        reasons = estimate.over_budget(guard)
+        if not reasons:
+            verdict = "Within this source's budget; run_sql_query will run it as is."
+        elif guard['on_exceed'] == 'limit' and can_add_limit(query):
+            verdict = (f"Over budget ({'; '.join(reasons)}); run_sql_query will add LIMIT {guard['limit']} "
+                       f"if that brings it under budget, and reject it otherwise.")
         else:
-            return f"Error: Cannot run SQL query on source type '{db_type}'."
+            verdict = f"Over budget ({'; '.join(reasons)}); run_sql_query will reject it."
+        return f"{note}{estimate.to_text()}\n{verdict}"
+    except (postgres_error(), sqlite3.Error, QueryError) as e:
+        return _sql_error(manager, data_source_name, query, e)
+    except (ValueError, ConnectionError, OSError) as e:
+        return f"Error: {e}"
+
+# Defaults for the per-source `batch` block in the YAML file (used by `run_api_batch`).
+API_BATCH_DEFAULTS = {
+    'max_concurrency': 8,     # Upper bound on parallel requests, whatever the agent asks for.
+    'max_requests': 500,      # Requests accepted in one batch.
+}
+
 
-        return str(result)
-    except (ValueError, ConnectionError, psycopg2.Error, sqlite3.Error) as e:
+def run_federated_query(query: str, api_tables: Optional[list[dict]] = None) -> str:
+    """
+    Run one read-only SQL query that joins tables from several data sources.
+    Refer to tables as <SOURCE_NAME>.<table>, e.g.
+    `SELECT t.* FROM LOCAL_BANK_DB.transactions t JOIN BLACKLIST.blacklist b ON b.value = t.name`.
+    The query runs in SQLite, so use SQLite syntax. Simple WHERE conditions on Postgres
+    tables (col = 'x', col > 5, col IN (...)) are applied by Postgres before its rows are
+    copied, so filter those tables as much as possible.
+    API results are joined by declaring them in `api_tables`; each entry becomes the table
+    <source>.<table>, e.g. {"source": "CREDIT_API", "table": "scores",
+    "endpoint": "/credit-score/?customer_name={name}",
+    "for_each": "SELECT DISTINCT name FROM LOCAL_BANK_DB.customers"} calls the endpoint once
+    per row of the `for_each` query, filling the {column} placeholders.
+    Args:
+        query (str): The SQL query, using <SOURCE_NAME>.<table> table names.
+        api_tables (list[dict]): Optional API tables: source, table, endpoint, and optionally
+            method, data and for_each.
+    """
+    try:
+        if not is_read_only_query(query):
+            return "Error: Federated queries are read-only; run writes against the source with run_sql_query."
+        manager = DataSourceManager()
+        settings = manager.get_federation_settings()
+        limits = {**RESULT_LIMIT_DEFAULTS, **(settings.get('result_limits') or {})}
+
+        federated = FederatedQuery(manager, query, api_tables, settings)
+        try:
+            sources = set(federated.referenced_tables()) | {spec.get('source') for spec in api_tables or [] if spec.get('source')}
+            if not sources:
+                return "Error: The query does not reference any <SOURCE_NAME>.<table>; use run_sql_query for a single source."
+            cache_key = f"federated:{normalize_sql(query)} {json.dumps(api_tables, sort_keys=True)}"
+            cached = manager.result_cache.get(FEDERATED_SOURCE, cache_key)
+            if cached is not None:
+                return cached
+
+            federated.prepare()
+            cursor = federated.conn.execute(query)
+            column_names = [d[0] for d in cursor.description]
+            batches = iter(lambda: cursor.fetchmany(int(limits['fetch_size'])), [])
+            result = render_result(
+                column_names, batches,
+                max_rows=int(limits['max_rows']),
+                max_bytes=int(limits['max_bytes']),
+                max_scan_rows=int(limits['max_scan_rows']),
+            )
+        finally:
+            federated.close()
+        result = "Sources:\n" + "\n".join(f"- {line}" for line in federated.report) + "\n\n" + result
+        ttl = min((manager.get_cache_ttl(name) for name in sources if name in manager.sources), default=0)
+        manager.result_cache.put(FEDERATED_SOURCE, cache_key, result, ttl)
+        return result
+    except (ValueError, ConnectionError, OSError, postgres_error(), sqlite3.Error, requests.exceptions.RequestException) as e:
         return f"Error: {e}"
-    finally:
-        if db:
-            if hasattr(db, 'disconnect'):
-                db.disconnect()
-            elif hasattr(db, 'close'):
-                db.close()
 
-def run_api_query(data_source_name: str, endpoint: str, method: str = "GET", data: Optional[dict] = None) -> str:
+
+def run_api_query(data_source_name: str, endpoint: str, method: str = "GET", data: Optional[dict] = None,
+                  store_result: bool = False) -> str:
     """
     Run a query against a specific API data source.
+    With `store_result`, a JSON array response (or object) is kept on the server as rows and a
+    handle is returned with a preview, for filter_result, aggregate_result, sort_result,
+    join_results and show_result.
     Args:
         data_source_name (str): The name of the API data source as defined in the YAML config.
         endpoint (str): The endpoint to query (e.g., 'users/1').
         method (str): The HTTP method (GET, POST, etc.).
         data (dict): The JSON data for POST/PUT requests.
+        store_result (bool): Store the response and return a handle instead of the text.
     """
     try:
-        source_config = DataSourceManager().get_source(data_source_name)
+        manager = DataSourceManager()
+        source_config = manager.get_source(data_source_name)
         if source_config['type'] != 'openapi':
             return f"Error: Data source '{data_source_name}' is not an OpenAPI source."
-        
-        base_url = source_config['base_url']
-        full_url = f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}"
-        
-        response = requests.request(method, full_url, json=data)
-        response.raise_for_status()
-        return response.text
+        text = manager.call_api(data_source_name, endpoint, method, data)
+        if not store_result:
+            return text
+        value = json.loads(text)
+        if not isinstance(value, (list, dict)):
+            return f"Error: The response of '{endpoint}' is a single JSON value, not rows; run it without store_result."
+        stored = manager.result_store.store_records(value if isinstance(value, list) else [value],
+                                                    f"run_api_query {method.upper()} {endpoint} on {data_source_name}")
+        return manager.result_store.describe(stored, int(manager.get_result_limits(data_source_name)['max_bytes']))
     except (ValueError, requests.exceptions.RequestException) as e:
         return f"Error executing API query for '{data_source_name}': {e}"
 
 
+def _format_batch_results(results: list, limits: dict) -> str:
+    """
+    Aggregates (endpoint, response text) pairs. When every response is a JSON object the
+    results become one CSV table with an `endpoint` column; otherwise one line per request.
+    """
+    parsed = []
+    for endpoint, text in results:
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = None
+        parsed.append((endpoint, value))
+
+    if parsed and all(isinstance(value, dict) for _, value in parsed):
+        columns = ["endpoint"]
+        for _, value in parsed:
+            columns += [key for key in value if key not in columns]
+        rows = [tuple([endpoint] + [value.get(c) if not isinstance(value.get(c), (dict, list)) else json.dumps(value.get(c))
+                                    for c in columns[1:]])
+                for endpoint, value in parsed]
+        return render_result(
+            columns, iter([rows]),
+            max_rows=int(limits['max_rows']),
+            max_bytes=int(limits['max_bytes']),
+            max_scan_rows=len(rows),
+        )
+
+    lines, size = [], 0
+    for i, (endpoint, text) in enumerate(results):
+        line = f"{endpoint}: {' '.join(text.split())}"
+        if size + len(line) > int(limits['max_bytes']):
+            lines.append(f"... truncated, showing {i} of {len(results)} responses.")
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+def run_api_batch(data_source_name: str, calls: list[dict], max_concurrency: int = 8) -> str:
+    """
+    Run many queries against one API data source in a single call, e.g. the same endpoint for
+    every customer. Requests run concurrently (bounded by the source's limits and rate limit)
+    and the responses are aggregated: JSON objects become one CSV table with an `endpoint`
+    column, failed requests are listed after it.
+    Args:
+        data_source_name (str): The name of the API data source as defined in the YAML config.
+        calls (list[dict]): The requests, each {"endpoint": "...", "method": "GET", "data": {...}};
+            only "endpoint" is required.
+        max_concurrency (int): How many requests to run in parallel.
+    """
+    try:
+        manager = DataSourceManager()
+        source_config = manager.get_source(data_source_name)
+        if source_config['type'] != 'openapi':
+            return f"Error: Data source '{data_source_name}' is not an OpenAPI source."
+        settings = {**API_BATCH_DEFAULTS, **(source_config.get('batch') or {})}
+        if not calls:
+            return "Error: No requests given."
+        if len(calls) > int(settings['max_requests']):
+            return (f"Error: {len(calls)} requests exceed the batch limit of {settings['max_requests']} "
+                    f"for '{data_source_name}'. Split them into several batches.")
+        for item in calls:
+            if not isinstance(item, dict) or not item.get('endpoint'):
+                return f"Error: Every request needs an 'endpoint', got {item!r}."
+
+        def call(item):
+            return manager.call_api(data_source_name, item['endpoint'], item.get('method', 'GET'), item.get('data'))
+
+        workers = max(1, min(int(max_concurrency), int(settings['max_concurrency']), len(calls)))
+        results, failures = [], []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"api-batch-{data_source_name}") as pool:
+            futures = [pool.submit(call, item) for item in calls]
+            for item, future in zip(calls, futures):
+                label = item['endpoint'] if item.get('method', 'GET').upper() == 'GET' else f"{item['method'].upper()} {item['endpoint']}"
+                try:
+                    results.append((label, future.result()))
+                except (ValueError, requests.exceptions.RequestException) as e:
+                    failures.append(f"- {label}: {e}")
+
+        output = f"{len(results)} of {len(calls)} requests succeeded.\n"
+        if results:
+            output += _format_batch_results(results, manager.get_result_limits(data_source_name)) + "\n"
+        if failures:
+            output += f"Failed requests ({len(failures)}):\n" + "\n".join(failures[:50])
+            if len(failures) > 50:
+                output += f"\n... and {len(failures) - 50} more."
+        return output.rstrip("\n")
+    except (ValueError, TypeError) as e:
+        return f"Error executing API batch for '{data_source_name}': {e}"
 
-def read_json_data_source(data_source_name: str) -> str:
+
+def read_json_data_source(data_source_name: str, json_path: str = "", offset: int = 0, limit: int = 0,
+                          store_result: bool = False) -> str:
     """
     Reads data from a JSON data source, which can be a local file or a URL.
+    Small documents are returned whole. For large ones the structure of the document (paths,
+    types, counts and example values) and a preview are returned; then use `json_path` (e.g.
+    'customers' or 'data.items') with `offset`/`limit` to page through the values you need.
+    With `store_result`, the array at `json_path` (or every array of the document) is kept on
+    the server as rows and handles are returned, for filter_result, aggregate_result,
+    sort_result, join_results and show_result.
     Args:
         data_source_name (str): The name of the JSON data source as defined in the YAML config.
+        json_path (str): Optional path of the JSON value (or array) to read.
+        offset (int): The first array item to return.
+        limit (int): How many array items to return.
+        store_result (bool): Store the rows and return handles instead of the JSON.
     """
     try:
         manager = DataSourceManager()
@@ -82,17 +352,110 @@ def read_json_data_source(data_source_name: str) -> str:
         if not path:
             return f"Error: JSON data source '{data_source_name}' is missing the 'path' attribute in the configuration."
 
-        # Check if the path is a URL
-        if path.startswith('http://') or path.startswith('https://'):
-            response = requests.get(path)
-            response.raise_for_status() # Raise an exception for bad status codes
-            json_data = response.json()
-        else: # Treat as a local file path
-            with open(path, 'r') as f:
-                json_data = json.load(f)
-        
-        # Return the data as a formatted JSON string
-        return json.dumps(json_data, indent=2)
+        # The document is parsed incrementally from a memory-mapped file or a streamed
+        # response, so only the selected values are ever built in memory.
+        limits = manager.get_read_limits(data_source_name)
+        http_client = manager.get_http_client(data_source_name) if is_url(path) else None
+        source = ByteSource(path, http_client, int(limits['chunk_size']))
+        if store_result:
+            settings = {**LOCAL_ENGINE_DEFAULTS, **(source_config.get('local_engine') or {}),
+                        'json_path': json_path or None}
+            stored = manager.result_store.store_tables(lambda conn, table: LOADERS['json'](conn, source, table, settings),
+                                                       f"read_json_data_source {data_source_name} {json_path}".rstrip())
+            return "\n".join(manager.result_store.describe(result, int(limits['max_bytes'])) for result in stored)
+        return read_source(source, data_source_name, limits, offset, limit, json_path, as_json=True,
+                           format_small=lambda text: json.dumps(json.loads(text), indent=2))
+
+    except (ValueError, requests.exceptions.RequestException, OSError) as e:
+        return f"Error reading JSON data source '{data_source_name}': {e}"
+
+
+def _stored(result) -> str:
+    return DataSourceManager().result_store.describe(result)
+
 
-    except (ValueError, requests.exceptions.RequestException, FileNotFoundError, json.JSONDecodeError) as e:
-        return f"Error reading JSON data source '{data_source_name}': {e}"
\ No newline at end of file
+def filter_result(handle: str, conditions: list[dict], columns: Optional[list[str]] = None) -> str:
+    """
+    Filter a stored result (from store_result=True or another *_result tool) on the server
+    and store the matching rows as a new result. Returns the new handle and a preview.
+    Args:
+        handle (str): The stored result, e.g. 'r3'.
+        conditions (list[dict]): All must hold, each {"column": "amount", "op": ">", "value": 100}.
+            Operators: =, !=, <, <=, >, >=, in, not in (with a list value), like, is null, is not null.
+        columns (list[str]): Optional columns to keep.
+    """
+    try:
+        return _stored(DataSourceManager().result_store.filter(handle, conditions, columns))
+    except (ValueError, TypeError, sqlite3.Error) as e:
+        return f"Error: {e}"
+
+
+def aggregate_result(handle: str, group_by: list[str], aggregates: list[dict]) -> str:
+    """
+    Group a stored result by columns and aggregate it on the server; stores one row per group
+    as a new result. Returns the new handle and a preview.
+    Args:
+        handle (str): The stored result, e.g. 'r3'.
+        group_by (list[str]): Columns to group by ([] for one row over the whole result).
+        aggregates (list[dict]): Each {"function": "sum", "column": "amount", "as": "total"};
+            functions: count (column optional), count_distinct, sum, avg, min, max.
+    """
+    try:
+        return _stored(DataSourceManager().result_store.aggregate(handle, group_by, aggregates))
+    except (ValueError, TypeError, sqlite3.Error) as e:
+        return f"Error: {e}"
+
+
+def sort_result(handle: str, order_by: list[dict], limit: int = 0) -> str:
+    """
+    Sort a stored result on the server and store it as a new result; with `limit`, only the
+    top rows are kept (top-k). Returns the new handle and a preview.
+    Args:
+        handle (str): The stored result, e.g. 'r3'.
+        order_by (list[dict]): Sort keys in order, each {"column": "total", "descending": true}.
+        limit (int): Keep only this many rows (0 keeps all).
+    """
+    try:
+        return _stored(DataSourceManager().result_store.sort(handle, order_by, limit))
+    except (ValueError, TypeError, sqlite3.Error) as e:
+        return f"Error: {e}"
+
+
+def join_results(left_handle: str, right_handle: str, left_on: list[str], right_on: Optional[list[str]] = None,
+                 how: str = "inner") -> str:
+    """
+    Join two stored results on equal key columns on the server and store the joined rows as a
+    new result; right columns whose names clash get the right handle as suffix (e.g. name_r4).
+    Returns the new handle and a preview.
+    Args:
+        left_handle (str): The left stored result.
+        right_handle (str): The right stored result.
+        left_on (list[str]): Key columns of the left result.
+        right_on (list[str]): Key columns of the right result, in the same order (default: left_on).
+        how (str): 'inner' or 'left'.
+    """
+    try:
+        return _stored(DataSourceManager().result_store.join(left_handle, right_handle, left_on, right_on, how))
+    except (ValueError, TypeError, sqlite3.Error) as e:
+        return f"Error: {e}"
+
+
+def show_result(handle: str, offset: int = 0, limit: int = 50) -> str:
+    """
+    Show rows of a stored result as CSV text, e.g. the final answer after filtering and
+    aggregating. Use offset/limit to page through larger results.
+    Args:
+        handle (str): The stored result, e.g. 'r3'.
+        offset (int): The first row to show.
+        limit (int): How many rows to show.
+    """
+    try:
+        result, rows = DataSourceManager().result_store.page(handle, offset, limit)
+        output = render_result(result.columns, iter([rows]), max_rows=int(limit), max_scan_rows=int(limit),
+                               max_bytes=RESULT_LIMIT_DEFAULTS['max_bytes'])
+        shown_to = int(offset) + len(rows)
+        if shown_to < result.rows or offset:
+            output += f"Rows {int(offset) + 1 if rows else int(offset)}-{shown_to} of {result.rows:,} in {handle}.\n"
+        return output
+    except (ValueError, TypeError, sqlite3.Error) as e:
+        return f"Error: {e}"
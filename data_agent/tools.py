@@ -1,25 +1,32 @@
 import os
-import sys
 import json
-import subprocess
-from typing import Optional
 
-import psycopg2
 import sqlite3 # Added for SQLite support
 import requests
+import yaml
 
-from .data_source_manager import DataSourceManager
+from .data_source_manager import LOCAL_SOURCE_TYPES, DataSourceManager
+from .db import postgres_error
+from .file_reader import ByteSource, is_url, read_source
+from .sampling import format_table_samples
 
 def list_available_data_sources() -> str:
     """Lists all available data sources from the configuration file."""
     return DataSourceManager().list_sources_as_text()
 
-def read_file_data_source(data_source_name: str) -> str:
+def read_file_data_source(data_source_name: str, offset: int = 0, limit: int = 0, json_path: str = "") -> str:
     """
     Reads content from a file data source, which can be a local file or a URL.
     This is used to provide text-based context to the LLM.
+    Small files are returned whole. For large files a summary (size and line count, or the
+    structure of a JSON document) and a preview are returned; use `offset`/`limit` to page
+    through lines (or JSON array items) and `json_path` (e.g. 'customers' or 'data.items')
+    to select part of a JSON document.
     Args:
         data_source_name (str): The name of the file data source as defined in the YAML config.
+        offset (int): The first line (or JSON item) to return.
+        limit (int): How many lines (or JSON items) to return.
+        json_path (str): Optional path of the JSON value to read.
     """
     try:
         manager = DataSourceManager()
@@ -32,16 +39,15 @@ def read_file_data_source(data_source_name: str) -> str:
         if not path:
             return f"Error: File data source '{data_source_name}' is missing the 'path' attribute in the configuration."
 
-        # Check if the path is a URL
-        if path.startswith('http://') or path.startswith('https://'):
-            response = requests.get(path)
-            response.raise_for_status() # Raise an exception for bad status codes
-            return response.text
-        else: # Treat as a local file path
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read()
+        # Local files are read through mmap and URLs are streamed, so only the part
+        # returned to the LLM is ever held in memory.
+        limits = manager.get_read_limits(data_source_name)
+        http_client = manager.get_http_client(data_source_name) if is_url(path) else None
+        source = ByteSource(path, http_client, int(limits['chunk_size']))
+        return read_source(source, data_source_name, limits, offset, limit, json_path,
+                           as_json=True if json_path else None)
 
-    except (ValueError, requests.exceptions.RequestException, FileNotFoundError) as e:
+    except (ValueError, requests.exceptions.RequestException, OSError) as e:
         return f"Error reading file data source '{data_source_name}': {e}"
 
 def get_db_schema_and_sample_data(data_source_name: str) -> str:
@@ -50,76 +56,85 @@ def get_db_schema_and_sample_data(data_source_name: str) -> str:
     Args:
         data_source_name (str): The name of the data source as defined in the YAML config.
     """
-    db = None
     try:
         manager = DataSourceManager()
         source_config = manager.get_source(data_source_name)
-        db = manager.get_db_connection(source_name=data_source_name)
-        
         db_type = source_config.get('type')
 
         if db_type == 'postgres':
-            schema_info = db.get_schema_as_text(ignore_tables=["vectors"])
-            sample_data = db.get_table_samples_as_text(ignore_tables=["vectors"])
+            schema_info = manager.get_schema_text(data_source_name, ignore_tables=["vectors"])
+            sample_data = manager.get_table_samples_text(data_source_name, ignore_tables=["vectors"])
+            return schema_info + "\n" + sample_data
+        elif db_type == 'sqlite' or db_type in LOCAL_SOURCE_TYPES:
+            # File sources are described by the tables they were loaded into.
+            schema_info = manager.get_schema_text(data_source_name)
+            sample_data = manager.get_table_samples_text(data_source_name)
             return schema_info + "\n" + sample_data
-        elif db_type == 'sqlite':
-            # The SQLiteDB class provides the schema directly.
-            # A sample data function could be added to the SQLiteDB class if needed.
-            schema_info = db.get_schema_as_text()
-            return schema_info
         else:
             return f"Error: Data source '{data_source_name}' is not a supported database type for schema retrieval."
 
-    except (ValueError, ConnectionError, psycopg2.Error, sqlite3.Error) as e:
+    except (ValueError, ConnectionError, postgres_error(), sqlite3.Error) as e:
+        return f"Error: {e}"
+
+
+def get_relevant_schema(data_source_name: str, question: str, top_k: int = 5) -> str:
+    """
+    Get the schema and sample data of only the tables relevant to a question.
+    Prefer this over `get_db_schema_and_sample_data` for databases with many tables.
+    Args:
+        data_source_name (str): The name of the data source as defined in the YAML config.
+        question (str): The user's question, used to rank tables by relevance.
+        top_k (int): How many of the best matching tables to return. Tables linked to them by
+                     foreign keys are always included as well.
+    """
+    try:
+        manager = DataSourceManager()
+        source_config = manager.get_source(data_source_name)
+        ignore_tables = ["vectors"] if source_config.get('type') == 'postgres' else []
+
+        index = manager.get_schema_index(data_source_name, ignore_tables=ignore_tables)
+        tables = index.select_tables(question, top_k=top_k)
+        if not tables:
+            return (f"No tables in '{data_source_name}' matched the question. "
+                    f"Use `get_db_schema_and_sample_data` to see the full schema.")
+
+        schema_info = index.schema.subset(tables).to_text()
+        sample_data = format_table_samples({name: index.samples[name] for name in tables if name in index.samples})
+        omitted = len(index.schema.tables) - len(tables)
+        note = f"Showing {len(tables)} of {len(index.schema.tables)} tables ({omitted} omitted as not relevant).\n\n"
+        return note + schema_info + "\n" + sample_data
+
+    except (ValueError, ConnectionError, postgres_error(), sqlite3.Error) as e:
         return f"Error: {e}"
-    finally:
-        if db:
-            # Gracefully close either a Postgres or SQLite connection
-            if hasattr(db, 'disconnect'):
-                db.disconnect()
-            elif hasattr(db, 'close'):
-                db.close()
 
 
 def get_api_schema(data_source_name: str) -> str:
     """
-    Get the OpenAPI schema for a specific API data source.
+    Get a compact index of the operations of an API data source: for each operation its
+    method, path, parameters and response fields. Use `get_api_operation` for the full
+    details of a single operation.
     Args:
         data_source_name (str): The name of the API data source as defined in the YAML config.
     """
     try:
-        source_config = DataSourceManager().get_source(data_source_name)
-        if source_config['type'] != 'openapi':
-            return f"Error: Data source '{data_source_name}' is not an OpenAPI source."
-        
-        response = requests.get(source_config['spec_url'])
-        response.raise_for_status()
-        return response.text
-    except (ValueError, requests.exceptions.RequestException) as e:
+        index = DataSourceManager().get_api_index(data_source_name)
+        return index.to_text()
+    except (ValueError, yaml.YAMLError, requests.exceptions.RequestException) as e:
         return f"Error fetching API schema for '{data_source_name}': {e}"
 
-def run_api_query(data_source_name: str, endpoint: str, method: str = "GET", data: Optional[dict] = None) -> str:
+def get_api_operation(data_source_name: str, operation: str) -> str:
     """
-    Run a query against a specific API data source.
+    Get the full details of one operation of an API data source: parameter types and
+    constraints, request body fields and response fields.
     Args:
         data_source_name (str): The name of the API data source as defined in the YAML config.
-        endpoint (str): The endpoint to query (e.g., 'users/1').
-        method (str): The HTTP method (GET, POST, etc.).
-        data (dict): The JSON data for POST/PUT requests.
+        operation (str): The operation ID or 'METHOD /path' (e.g. 'GET /credit-score/') from `get_api_schema`.
     """
     try:
-        source_config = DataSourceManager().get_source(data_source_name)
-        if source_config['type'] != 'openapi':
-            return f"Error: Data source '{data_source_name}' is not an OpenAPI source."
-        
-        base_url = source_config['base_url']
-        full_url = f"{base_url.rstrip('/')}/{endpoint.lstrip('/')}"
-        
-        response = requests.request(method, full_url, json=data)
-        response.raise_for_status()
-        return response.text
-    except (ValueError, requests.exceptions.RequestException) as e:
-        return f"Error executing API query for '{data_source_name}': {e}"
+        index = DataSourceManager().get_api_index(data_source_name)
+        return index.find(operation).describe()
+    except (ValueError, yaml.YAMLError, requests.exceptions.RequestException) as e:
+        return f"Error fetching API operation for '{data_source_name}': {e}"
 
 def get_data_source_credentials(data_source_name: str) -> str:
     """
@@ -155,6 +170,15 @@ def save_prefect_flow(flow_name: str, flow_content: str) -> str:
            (e.g., `os.getenv("BANK_DB_HOST")`, `os.getenv("BANK_DB_USER")`, etc.).
         d. Define tasks with the `@task` decorator and a flow with the `@flow` decorator.
         e. Include a main execution block (`if __name__ == "__main__":`) to run the flow.
+        f. For flows that copy growing tables between databases on a schedule (e.g. nightly
+           transaction loads), use incremental mode instead of a full reload: call
+           `incremental_sync(flow_name, source=..., target=..., table=..., watermark_column=...,
+           key_columns=[...])` from `etl` (`from etl import incremental_sync`) in a task. It takes
+           the data source names, connects with their credential mapping, copies only the rows
+           whose watermark column (an increasing id or updated-at timestamp) reached the last run's
+           value, in batches (COPY into Postgres), upserts them on `key_columns` (the target's
+           primary key or a unique index) and stores the new watermark in `etl_state.db`.
+           Pass `full_refresh=True` to copy everything again.
     3.  Call this tool (`save_prefect_flow`) with the `flow_name` and the generated `flow_content`.
 
     Args:
@@ -162,31 +186,107 @@ def save_prefect_flow(flow_name: str, flow_content: str) -> str:
                          The '.py' extension will be added automatically.
         flow_content (str): The complete Python code string representing the Prefect flow.
     """
-    FLOW_DIR = "flows"
+    runner = DataSourceManager().flow_runner
     try:
-        os.makedirs(FLOW_DIR, exist_ok=True)
+        file_path = runner.flow_path(flow_name)
+        os.makedirs(runner.flow_dir, exist_ok=True)
         if "from prefect import" not in flow_content or "@flow" not in flow_content:
             return "Error: The provided flow_content does not appear to be a valid Prefect flow."
-        file_path = os.path.join(FLOW_DIR, f"{flow_name}.py")
         with open(file_path, 'w') as f: f.write(flow_content)
         return f"✅ Prefect flow '{flow_name}.py' was successfully saved."
     except Exception as e:
         return f"❌ An error occurred while saving the Prefect flow: {e}"
 
 
-def run_prefect_flow(flow_name: str) -> str:
-    """Executes a previously saved Prefect flow Python file."""
-    FLOW_DIR = "flows"
-    file_path = os.path.join(FLOW_DIR, f"{flow_name}.py")
-    if not os.path.exists(file_path):
-        return f"❌ Error: Flow file '{flow_name}.py' not found."
+def format_flow_job(job, tail: str) -> str:
+    """A job's status line, and the end of its log."""
+    info = job.describe()
+    icon = {"succeeded": "✅", "failed": "❌", "timed_out": "❌", "cancelled": "⏹️"}.get(job.status, "⏳")
+    line = f"{icon} Job {job.id} (flow '{job.flow_name}.py'): {job.status}"
+    if info["running_s"] is not None:
+        line += f", ran {info['running_s']:,.1f}s"
+    elif job.status == "queued":
+        line += f", waiting {info['queued_s']:,.1f}s for a worker"
+    if job.exit_code is not None:
+        line += f", exit code {job.exit_code}"
+    line += f".\nLog: {job.log_path}"
+    if tail:
+        line += f"\n--- LAST LINES OF THE LOG ---\n{tail}"
+    return line
+
+
+def run_prefect_flow(flow_name: str, wait_seconds: int = 10) -> str:
+    """
+    Starts a previously saved Prefect flow as a background job and returns its job ID.
+
+    The flow runs in a separate process with no fixed time limit; its output is written to a log file.
+    If it finishes within `wait_seconds`, its result is returned right away; otherwise use
+    `get_flow_job_status` to poll it, `tail_flow_job_log` to follow its output and `cancel_flow_job` to stop it.
+
+    Args:
+        flow_name (str): The name of the saved flow (without '.py').
+        wait_seconds (int): How long to wait for the flow to finish before returning the job ID.
+    """
+    runner = DataSourceManager().flow_runner
     try:
-        python_executable = sys.executable
-        result = subprocess.run([python_executable, file_path], capture_output=True, text=True, check=True, timeout=60)
-        output = f"--- STDOUT ---\n{result.stdout}"
-        if result.stderr: output += f"\n--- STDERR ---\n{result.stderr}"
-        return f"✅ Prefect flow '{flow_name}.py' executed successfully.\n{output}"
-    except subprocess.CalledProcessError as e:
-        return f"❌ Error executing Prefect flow '{flow_name}.py'.\nExit Code: {e.returncode}\n--- STDOUT ---\n{e.stdout}\n--- STDERR ---\n{e.stderr}"
-    except Exception as e:
-        return f"❌ An unexpected error occurred: {e}"
+        job = runner.wait(runner.submit(flow_name).id, min(max(wait_seconds, 0), 60))
+        return format_flow_job(job, runner.tail(job.id))
+    except ValueError as e:
+        return f"❌ Error: {e}"
+
+
+def get_flow_job_status(job_id: str, wait_seconds: int = 0) -> str:
+    """
+    Returns the status of a flow job started by `run_prefect_flow` (queued, running, succeeded, failed,
+    cancelled or timed_out) and the last lines of its log.
+
+    Args:
+        job_id (str): The job ID returned by `run_prefect_flow`.
+        wait_seconds (int): How long to wait for the job to finish before answering.
+    """
+    runner = DataSourceManager().flow_runner
+    try:
+        job = runner.wait(job_id, min(max(wait_seconds, 0), 60))
+        return format_flow_job(job, runner.tail(job_id))
+    except ValueError as e:
+        return f"❌ Error: {e}"
+
+
+def tail_flow_job_log(job_id: str, lines: int = 50) -> str:
+    """
+    Returns the last lines a flow job has written to its log (stdout and stderr), also while it is running.
+
+    Args:
+        job_id (str): The job ID returned by `run_prefect_flow`.
+        lines (int): How many lines to return (at most 500).
+    """
+    runner = DataSourceManager().flow_runner
+    try:
+        job = runner.get(job_id)
+        tail = runner.tail(job_id, min(max(lines, 1), 500))
+        return f"Job {job_id} ({job.status}), {job.log_path}:\n{tail or '(no output yet)'}"
+    except ValueError as e:
+        return f"❌ Error: {e}"
+
+
+def cancel_flow_job(job_id: str) -> str:
+    """
+    Cancels a queued flow job, or stops a running one (with every process the flow started).
+
+    Args:
+        job_id (str): The job ID returned by `run_prefect_flow`.
+    """
+    runner = DataSourceManager().flow_runner
+    try:
+        job = runner.cancel(job_id)
+        return format_flow_job(job, runner.tail(job_id))
+    except ValueError as e:
+        return f"❌ Error: {e}"
+
+
+def list_flow_jobs() -> str:
+    """Lists the recent flow jobs (newest first) with their status."""
+    jobs = DataSourceManager().flow_runner.jobs()
+    if not jobs:
+        return "No flow jobs have been started."
+    return json.dumps(jobs, indent=2)
@@ -0,0 +1,280 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+
+from .executor import get_tool_executor
+
+# Tracing is configured through the environment, like the tool executor.
+TRACING_ENV = "DATA_AGENT_TRACING"               # "0" turns the callbacks off.
+TRACE_FILE_ENV = "DATA_AGENT_TRACE_FILE"         # JSONL file receiving one OTLP/JSON export per turn.
+OTLP_ENDPOINT_ENV = "DATA_AGENT_OTLP_ENDPOINT"   # e.g. http://localhost:4318 (an OpenTelemetry collector).
+
+SERVICE_NAME = "data-agent"
+SCOPE_NAME = "data_agent.tracing"
+MAX_ATTRIBUTE_LENGTH = 500
+MAX_OPEN_TRACES = 100
+RECENT_TRACES = 50
+# OTLP span kinds and status codes.
+SPAN_KIND_INTERNAL, SPAN_KIND_CLIENT = 1, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+ROW_COUNT = re.compile(r'^\((\d+) rows?\)$|showing \d+ of (?:at least )?(\d+) rows|^(\d+) of \d+ requests succeeded',
+                       re.MULTILINE)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _short(text: str) -> str:
+    return text if len(text) <= MAX_ATTRIBUTE_LENGTH else text[:MAX_ATTRIBUTE_LENGTH - 3] + "..."
+
+
+class Span:
+    """One timed operation of a turn, with attributes in OpenTelemetry (GenAI) naming."""
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, kind: int = SPAN_KIND_INTERNAL,
+                 attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def end(self, error: str = None, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        self.error = error
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _Trace:
+    """The spans of one invocation (chat turn) while it runs."""
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.agents = []    # Stack of open agent spans; sub-agents run nested in their parent.
+        self.open = {}      # Open model/tool spans by key.
+
+
+def otlp_export(spans: list) -> dict:
+    """Wraps spans in an OTLP/JSON `ExportTraceServiceRequest`."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": _otlp_value(SERVICE_NAME)}]},
+        "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+
+class Tracer:
+    """
+    Records a trace per chat turn from ADK agent callbacks: a span per agent run (with
+    delegations to sub-agents nested inside), per LLM call (with token counts) and per tool
+    call (with the data source, result size and row count). Finished turns are kept in
+    memory and exported off the event loop as OTLP/JSON, to a JSONL file and/or an
+    OpenTelemetry collector's OTLP/HTTP endpoint.
+    """
+    def __init__(self, path: str = None, endpoint: str = None, enabled: bool = True):
+        self.path = path
+        self.endpoint = endpoint.rstrip("/") if endpoint else None
+        self.enabled = enabled
+        self.recent = deque(maxlen=RECENT_TRACES)
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(path=os.getenv(TRACE_FILE_ENV) or None, endpoint=os.getenv(OTLP_ENDPOINT_ENV) or None,
+                   enabled=os.getenv(TRACING_ENV, "1") != "0")
+
+    def _trace(self, invocation_id: str, create: bool = False):
+        with self._lock:
+            trace = self._traces.get(invocation_id)
+            if trace is None and create:
+                trace = self._traces[invocation_id] = _Trace()
+                while len(self._traces) > MAX_OPEN_TRACES:
+                    # Turns that failed before their root agent finished.
+                    self._traces.popitem(last=False)
+            return trace
+
+    def _start(self, trace: _Trace, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Span:
+        parent = trace.agents[-1].span_id if trace.agents else None
+        span = Span(name, trace.trace_id, parent, kind, {k: v for k, v in attributes.items() if v is not None})
+        trace.spans.append(span)
+        return span
+
+    # --- ADK callbacks (see `agent_callbacks()`); they never change the agent's behaviour ---
+
+    def before_agent(self, callback_context):
+        trace = self._trace(callback_context.invocation_id, create=True)
+        attributes = {"gen_ai.operation.name": "invoke_agent", "gen_ai.agent.name": callback_context.agent_name}
+        if not trace.agents:
+            attributes["data_agent.invocation_id"] = callback_context.invocation_id
+            content = callback_context.user_content
+            text = "".join(p.text or "" for p in (content.parts or [])) if content else ""
+            if text:
+                attributes["data_agent.user_message"] = _short(text)
+        trace.agents.append(self._start(trace, f"invoke_agent {callback_context.agent_name}", **attributes))
+
+    def after_agent(self, callback_context):
+        trace = self._trace(callback_context.invocation_id)
+        if trace is None or not trace.agents:
+            return None
+        trace.agents.pop().end()
+        if trace.agents:
+            return None
+        with self._lock:
+            self._traces.pop(callback_context.invocation_id, None)
+        for span in trace.spans:
+            if span.end_ns is None:
+                span.end(error="The span was still open when the turn ended.")
+        self.recent.append(trace.spans)
+        if self.path or self.endpoint:
+            get_tool_executor().submit(self.export, trace.spans)
+        return None
+
+    def before_model(self, callback_context, llm_request):
+        trace = self._trace(callback_context.invocation_id, create=True)
+        model = llm_request.model or ""
+        span = self._start(trace, f"chat {model}".strip(), SPAN_KIND_CLIENT, **{
+            "gen_ai.operation.name": "chat",
+            "gen_ai.request.model": model or None,
+            "gen_ai.agent.name": callback_context.agent_name,
+            "data_agent.request.contents": len(llm_request.contents or []),
+        })
+        trace.open[("model", callback_context.agent_name)] = span
+        return None
+
+    def after_model(self, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        trace = self._trace(callback_context.invocation_id)
+        span = trace.open.pop(("model", callback_context.agent_name), None) if trace else None
+        if span is None:
+            return None
+        usage = llm_response.usage_metadata
+        calls = [p.function_call.name for p in (llm_response.content.parts or [])
+                 if p.function_call] if llm_response.content else []
+        span.end(
+            error=llm_response.error_message or None,
+            **{
+                "gen_ai.usage.input_tokens": usage.prompt_token_count if usage else None,
+                "gen_ai.usage.output_tokens": usage.candidates_token_count if usage else None,
+                "data_agent.usage.cached_tokens": usage.cached_content_token_count if usage else None,
+                "data_agent.response.function_calls": ", ".join(calls) or None,
+            })
+        return None
+
+    def before_tool(self, tool, args, tool_context):
+        trace = self._trace(tool_context.invocation_id, create=True)
+        span = self._start(trace, f"execute_tool {tool.name}", **{
+            "gen_ai.operation.name": "execute_tool",
+            "gen_ai.tool.name": tool.name,
+            "gen_ai.tool.call.id": tool_context.function_call_id,
+            "gen_ai.agent.name": tool_context.agent_name,
+            "data_agent.data_source": args.get("data_source_name"),
+            "data_agent.tool.arguments": _short(json.dumps(args, default=str)),
+        })
+        trace.open[("tool", tool_context.function_call_id or span.span_id)] = span
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        trace = self._trace(tool_context.invocation_id)
+        span = trace.open.pop(("tool", tool_context.function_call_id), None) if trace else None
+        if span is None:
+            return None
+        text = tool_response if isinstance(tool_response, str) else json.dumps(tool_response, default=str)
+        rows = ROW_COUNT.search(text)
+        span.end(
+            error=_short(text) if text.startswith("Error") else None,
+            **{
+                "data_agent.result.bytes": len(text.encode("utf-8")),
+                "data_agent.result.rows": int(next(g for g in rows.groups() if g)) if rows else None,
+            })
+        return None
+
+    def export(self, spans: list):
+        """Writes a finished turn to the trace file and/or posts it to the OTLP/HTTP endpoint."""
+        payload = otlp_export(spans)
+        if self.path:
+            try:
+                with self._write_lock:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(payload) + "\n")
+            except OSError as e:
+                print(f"Warning: Could not write trace to {self.path}: {e}")
+        if self.endpoint:
+            try:
+                requests.post(f"{self.endpoint}/v1/traces", json=payload, timeout=5).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"Warning: Could not export trace to {self.endpoint}: {e}")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer, configured from the environment on first use."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+
+def _callback(method_name: str):
+    def callback(**kwargs):
+        tracer = get_tracer()
+        if tracer.enabled:
+            try:
+                getattr(tracer, method_name)(**kwargs)
+            except Exception as e:
+                # Instrumentation must never break a turn.
+                print(f"Warning: Tracing callback {method_name} failed: {e}")
+        return None
+    callback.__name__ = f"trace_{method_name}"
+    return callback
+
+
+def agent_callbacks() -> dict:
+    """
+    The keyword arguments that attach tracing to an ADK `Agent`. The tracer is looked up
+    on every call, so it picks up settings loaded (e.g. from .env) after the agents are defined.
+    """
+    return {f"{name}_callback": _callback(name)
+            for name in ("before_agent", "after_agent", "before_model", "after_model", "before_tool", "after_tool")}
@@ -0,0 +1,286 @@
+"""
+Incremental (watermark-based) loads for the Prefect flows written by `save_prefect_flow`.
+
+A full reload copies a whole table on every run. In incremental mode a flow copies only
+the rows whose watermark column (an increasing id or an updated-at timestamp) is at least
+the highest value it copied last time, and upserts them into the target by key, so a run
+that is retried or overlaps the previous one doesn't duplicate rows. The watermarks are
+kept per flow, source and table in a local SQLite file (`etl_state.db`).
+
+    from etl import incremental_sync
+
+    @task
+    def sync_transactions():
+        return incremental_sync("nightly_transactions", source="BANK", target="WAREHOUSE",
+                                table="transactions", watermark_column="transaction_id",
+                                key_columns=["transaction_id"])
+
+Sources are the names in data_sources.yaml: Postgres sources connect with the environment
+variables of their credential mapping (see `get_data_source_credentials`), SQLite sources
+open their `db_file`. Rows are read with a server-side cursor (Postgres) in batches, and
+written with COPY into a staging table and one INSERT ... ON CONFLICT per batch (Postgres)
+or executemany upserts (SQLite). The target table must have a primary key or unique index
+on `key_columns`; an index on the source's watermark column keeps each run's read small.
+
+This module only needs PyYAML (and psycopg2 for Postgres), so flows can import it without
+loading the agent.
+"""
+import datetime
+import decimal
+import io
+import json
+import os
+import sqlite3
+import time
+
+import yaml
+
+# Defaults for incremental_sync; a flow passes its own values as keyword arguments.
+ETL_DEFAULTS = {
+    'config_path': 'data_sources.yaml',
+    'state_path': 'etl_state.db',  # The watermark store.
+    'batch_size': 10000,           # Rows read, upserted and committed at a time.
+}
+
+_WATERMARK_TYPES = {
+    'int': int,
+    'float': float,
+    'decimal': decimal.Decimal,
+    'datetime': datetime.datetime.fromisoformat,
+    'date': datetime.date.fromisoformat,
+    'str': str,
+}
+
+
+def _encode_watermark(value):
+    for name, kind in (('int', int), ('float', float), ('decimal', decimal.Decimal),
+                       ('datetime', datetime.datetime), ('date', datetime.date)):
+        if isinstance(value, kind) and not isinstance(value, bool):
+            return name, value.isoformat() if name in ('datetime', 'date') else str(value)
+    return 'str', str(value)
+
+
+class WatermarkStore:
+    """The highest watermark copied so far, per flow, source and table, in a SQLite file."""
+    def __init__(self, path: str = "etl_state.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks (flow TEXT, source TEXT, table_name TEXT, "
+                "watermark_column TEXT, value TEXT, value_type TEXT, rows INTEGER, updated_at REAL, "
+                "PRIMARY KEY (flow, source, table_name))")
+
+    def get(self, flow: str, source: str, table: str):
+        """The stored watermark (with its original type), or None before the first run."""
+        row = self._conn.execute("SELECT value, value_type FROM watermarks WHERE flow = ? AND source = ? "
+                                 "AND table_name = ?", (flow, source, table)).fetchone()
+        return None if row is None else _WATERMARK_TYPES[row[1]](row[0])
+
+    def set(self, flow: str, source: str, table: str, column: str, value, rows: int = 0):
+        """Records a new watermark; `rows` is added to the rows copied so far."""
+        value_type, text = _encode_watermark(value)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO watermarks VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (flow, source, table_name) "
+                "DO UPDATE SET watermark_column = excluded.watermark_column, value = excluded.value, "
+                "value_type = excluded.value_type, rows = watermarks.rows + excluded.rows, "
+                "updated_at = excluded.updated_at",
+                (flow, source, table, column, text, value_type, rows, time.time()))
+
+    def reset(self, flow: str, source: str = None, table: str = None):
+        """Forgets watermarks, so the next run of the flow copies everything again."""
+        query, params = "DELETE FROM watermarks WHERE flow = ?", [flow]
+        if source is not None:
+            query, params = query + " AND source = ?", params + [source]
+        if table is not None:
+            query, params = query + " AND table_name = ?", params + [table]
+        with self._conn:
+            self._conn.execute(query, params)
+
+    def watermarks(self, flow: str = None) -> list:
+        query = "SELECT flow, source, table_name, watermark_column, value, rows, updated_at FROM watermarks"
+        rows = self._conn.execute(query + (" WHERE flow = ?" if flow else ""), (flow,) if flow else ())
+        keys = ("flow", "source", "table", "watermark_column", "value", "rows", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+def connect(source_name: str, config_path: str = "data_sources.yaml"):
+    """Opens a connection to a Postgres or SQLite source of data_sources.yaml."""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    sources = {source['name'].lower(): source for source in config.get('data_sources') or []}
+    source = sources.get(source_name.lower())
+    if source is None:
+        raise ValueError(f"Data source '{source_name}' not found in {config_path}.")
+    if source.get('type') == 'sqlite':
+        return sqlite3.connect(source['db_file'])
+    if source.get('type') != 'postgres':
+        raise ValueError(f"Data source '{source_name}' is of type '{source.get('type')}', not a database.")
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    import psycopg2
+    cred_keys = source.get('credentials') or {}
+    db_params = {key: os.getenv(cred_keys.get(f'{key}_env') or '') for key in ('host', 'port', 'dbname', 'user', 'password')}
+    missing_params = [k for k, v in db_params.items() if v is None]
+    if missing_params:
+        raise ConnectionError(f"Missing environment variables for data source '{source_name}'. Please set: {missing_params}")
+    return psycopg2.connect(**db_params)
+
+
+def _is_sqlite(conn) -> bool:
+    return isinstance(conn, sqlite3.Connection)
+
+
+def _quote(name: str) -> str:
+    """Quotes a (possibly schema-qualified) table or column name."""
+    return ".".join('"' + part.replace('"', '""') + '"' for part in str(name).split("."))
+
+
+def extract_since(conn, table: str, watermark_column: str, since=None, columns=None, batch_size: int = 10000):
+    """
+    Yields `(column_names, rows)` batches of the rows with `watermark_column >= since` (all rows
+    if `since` is None), in watermark order. Rows equal to the watermark are read again, so
+    rows committed late with the same value aren't missed; upserts make that harmless. Rows
+    without a watermark (NULL) are never read.
+    """
+    select = ", ".join(_quote(c) for c in columns) if columns else "*"
+    marker = "?" if _is_sqlite(conn) else "%s"
+    query = f"SELECT {select} FROM {_quote(table)} WHERE {_quote(watermark_column)} IS NOT NULL"
+    params = ()
+    if since is not None:
+        query, params = query + f" AND {_quote(watermark_column)} >= {marker}", (since,)
+    query += f" ORDER BY {_quote(watermark_column)}"
+    if _is_sqlite(conn):
+        cursor = conn.cursor()
+    else:
+        # A named (server-side) cursor streams the rows; WITH HOLD keeps it open across commits.
+        cursor = conn.cursor(name=f"etl_{os.getpid()}_{time.monotonic_ns()}", withhold=True)
+        cursor.itersize = batch_size
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [column[0] for column in cursor.description], rows
+    finally:
+        cursor.close()
+
+
+def _copy_value(value) -> str:
+    """A value as a COPY (CSV) field; NULL is written as an unquoted \\N."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        value = "\\x" + bytes(value).hex()
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _sqlite_value(value):
+    """A value read from Postgres as one SQLite can store (as the federated queries convert them)."""
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return str(value)
+
+
+def upsert(conn, table: str, columns: list, rows: list, key_columns: list) -> int:
+    """
+    Inserts rows, or updates the rows with the same key. Rows repeating a key keep the last
+    one. Doesn't commit. Returns the rows written.
+    """
+    missing = [c for c in key_columns if c not in columns]
+    if missing:
+        raise ValueError(f"Key column(s) {missing} are not in the extracted columns {list(columns)}.")
+    positions = [columns.index(c) for c in key_columns]
+    rows = list({tuple(row[i] for i in positions): row for row in rows}.values())
+    if not rows:
+        return 0
+    names = ", ".join(_quote(c) for c in columns)
+    keys = ", ".join(_quote(c) for c in key_columns)
+    updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in columns if c not in key_columns)
+    on_conflict = f"ON CONFLICT ({keys}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING")
+    if _is_sqlite(conn):
+        if any(not isinstance(v, (int, float, str, bytes, type(None))) for v in rows[0]):
+            rows = [tuple(_sqlite_value(v) for v in row) for row in rows]
+        conn.executemany(f"INSERT INTO {_quote(table)} ({names}) VALUES ({', '.join('?' for _ in columns)}) "
+                         f"{on_conflict}", rows)
+        return len(rows)
+    buffer = io.StringIO()
+    buffer.writelines(",".join(_copy_value(v) for v in row) + "\n" for row in rows)
+    buffer.seek(0)
+    with conn.cursor() as cur:
+        # Only the extracted columns: (LIKE table) would copy NOT NULL constraints of the others, not their defaults.
+        cur.execute("DROP TABLE IF EXISTS etl_stage")
+        cur.execute(f"CREATE TEMP TABLE etl_stage AS SELECT {names} FROM {_quote(table)} WITH NO DATA")
+        cur.copy_expert(f"COPY etl_stage ({names}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        cur.execute(f"INSERT INTO {_quote(table)} ({names}) SELECT {names} FROM etl_stage {on_conflict}")
+        cur.execute("DROP TABLE etl_stage")
+    return len(rows)
+
+
+def incremental_sync(flow_name: str, source, target, table: str, watermark_column: str, key_columns: list,
+                     target_table: str = None, columns: list = None, full_refresh: bool = False,
+                     source_name: str = None, **settings) -> dict:
+    """
+    Copies the rows of `table` added or changed since the flow's last run into `target_table`
+    (default: the same name) and records the new watermark.
+
+    `source` and `target` are data source names, or open connections (then pass `source_name`,
+    the name the watermark is stored under). Each batch is upserted
+    and committed before its watermark is recorded, so a failed run resumes from the last
+    committed batch. `full_refresh=True` ignores the stored watermark. Returns the rows copied
+    and the watermark range.
+    """
+    settings = {**ETL_DEFAULTS, **settings}
+    source_name = source_name or (source if isinstance(source, str) else "connection")
+    source_conn = target_conn = None
+    store = WatermarkStore(settings['state_path'])
+    start = time.perf_counter()
+    since = None if full_refresh else store.get(flow_name, source_name, table)
+    copied, batches, watermark = 0, 0, since
+    try:
+        source_conn = connect(source, settings['config_path']) if isinstance(source, str) else source
+        target_conn = connect(target, settings['config_path']) if isinstance(target, str) else target
+        for names, rows in extract_since(source_conn, table, watermark_column, since, columns, settings['batch_size']):
+            if watermark_column not in names:
+                raise ValueError(f"The watermark column '{watermark_column}' is not in the extracted columns.")
+            written = upsert(target_conn, target_table or table, names, rows, key_columns)
+            target_conn.commit()
+            watermark = rows[-1][names.index(watermark_column)]
+            store.set(flow_name, source_name, table, watermark_column, watermark, written)
+            copied += written
+            batches += 1
+    except Exception:
+        if target_conn is not None:
+            target_conn.rollback()
+        raise
+    finally:
+        store.close()
+        if isinstance(source, str) and source_conn is not None:
+            source_conn.close()
+        if isinstance(target, str) and target_conn is not None:
+            target_conn.close()
+    seconds = time.perf_counter() - start
+    print(f"{flow_name}: copied {copied:,} row(s) of {table} in {batches} batch(es) in {seconds:,.1f}s "
+          f"({watermark_column} {'start' if since is None else since} -> {watermark}).")
+    return {"table": table, "rows": copied, "batches": batches, "watermark_from": since,
+            "watermark_to": watermark, "seconds": round(seconds, 2)}
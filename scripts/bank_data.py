@@ -0,0 +1,190 @@
+"""
+Synthetic bank data for the `sql/schema.sql` tables, and bulk loaders for SQLite and Postgres.
+
+Rows are generated deterministically from a seed (one customer per ten transactions) and
+streamed into the database: batched `executemany` in one transaction for SQLite, COPY for
+Postgres. Secondary indexes and constraints are created after the rows are loaded, which is
+much faster than maintaining them row by row. With 0 transactions the sample rows of
+`schema.sql` are loaded instead.
+"""
+import csv
+import io
+import itertools
+import os
+import random
+import re
+import time
+
+SCHEMA_FILE = os.path.join("sql", "schema.sql")
+TRANSACTIONS_PER_CUSTOMER = 10
+BATCH_ROWS = 100000
+
+FIRST_NAMES = ["Ariel", "Jane", "John", "Emily", "Noa", "David", "Maya", "Omer", "Sara", "Daniel", "Lior", "Tamar"]
+LAST_NAMES = ["Henryson", "Doe", "Smith", "White", "Cohen", "Levi", "Brown", "Mizrahi", "Miller", "Katz"]
+TRANSACTION_TYPES = {"credit": ["Monthly Salary", "Paycheck", "Freelance Project Payment", "Refund"],
+                     "debit": ["Grocery Shopping", "Restaurant Dinner", "Online Shopping", "Rent Payment",
+                               "Coffee Shop", "Gasoline", "Bookstore"]}
+# Precomputed so that generating a row is a few `random()` calls and list lookups
+# (`randint`/`choice` dominate the load time otherwise).
+DAYS = [f"{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+TIMES = [f"{hour:02d}:{minute:02d}:00" for hour in range(24) for minute in range(60)]
+
+CUSTOMER_COLUMNS = ("customer_id", "full_name", "email", "phone_number", "created_at")
+TRANSACTION_COLUMNS = ("transaction_id", "customer_id", "amount", "type", "description", "transaction_date")
+
+# Created once the rows are in. The UNIQUE email constraint of schema.sql becomes an index
+# here (and, for Postgres, so do the keys); transactions also get an index on customer_id.
+POST_LOAD_STATEMENTS = {
+    "sqlite": [
+        "CREATE UNIQUE INDEX customers_email_key ON customers (email)",
+        "CREATE INDEX transactions_customer_id_idx ON transactions (customer_id)",
+    ],
+    "postgres": [
+        "ALTER TABLE customers ADD PRIMARY KEY (customer_id)",
+        "ALTER TABLE customers ADD CONSTRAINT customers_email_key UNIQUE (email)",
+        "ALTER TABLE transactions ADD PRIMARY KEY (transaction_id)",
+        "ALTER TABLE transactions ADD CONSTRAINT transactions_customer_id_fkey FOREIGN KEY (customer_id) "
+        "REFERENCES customers (customer_id) ON DELETE CASCADE",
+        "CREATE INDEX transactions_customer_id_idx ON transactions (customer_id)",
+        # Ids were loaded explicitly; new rows continue after them.
+        "SELECT setval(pg_get_serial_sequence('customers', 'customer_id'), (SELECT coalesce(max(customer_id), 0) + 1 FROM customers), false)",
+        "SELECT setval(pg_get_serial_sequence('transactions', 'transaction_id'), (SELECT coalesce(max(transaction_id), 0) + 1 FROM transactions), false)",
+        "ANALYZE customers",
+        "ANALYZE transactions",
+    ],
+}
+
+
+def _read_schema() -> list:
+    with open(SCHEMA_FILE, encoding="utf-8") as f:
+        script = re.sub(r"--[^\n]*", "", f.read())
+    return [s.strip() for s in script.split(";") if s.strip()]
+
+
+def schema_statements(dialect: str = "sqlite") -> list:
+    """The DROP/CREATE statements of `sql/schema.sql`, without the constraints created after loading."""
+    statements = [s.replace("NOT NULL UNIQUE", "NOT NULL") for s in _read_schema()
+                  if re.match(r"(DROP|CREATE)\b", s, re.IGNORECASE)]
+    if dialect == "postgres":
+        statements = [re.sub(r",\s*FOREIGN KEY[^\n]*", "", s)
+                      .replace("INTEGER PRIMARY KEY AUTOINCREMENT", "BIGINT GENERATED BY DEFAULT AS IDENTITY")
+                      .replace("DROP TABLE IF EXISTS transactions", "DROP TABLE IF EXISTS transactions CASCADE")
+                      .replace("DROP TABLE IF EXISTS customers", "DROP TABLE IF EXISTS customers CASCADE")
+                      for s in statements]
+    return statements
+
+
+def sample_statements() -> list:
+    """The INSERT statements with the sample rows of `sql/schema.sql`."""
+    return [s for s in _read_schema() if re.match(r"INSERT\b", s, re.IGNORECASE)]
+
+
+def customer_count(transactions: int) -> int:
+    return max(4, transactions // TRANSACTIONS_PER_CUSTOMER)
+
+
+def customer_rows(count: int, seed: int = 7):
+    rnd = random.Random(seed).random
+    for customer_id in range(1, count + 1):
+        first = FIRST_NAMES[int(rnd() * len(FIRST_NAMES))]
+        last = LAST_NAMES[int(rnd() * len(LAST_NAMES))]
+        yield (customer_id, f"{first} {last}", f"{first.lower()}.{last.lower()}.{customer_id}@example.com",
+               f"555-{int(rnd() * 10000):04d}", f"2024-{DAYS[int(rnd() * len(DAYS))]} 09:00:00")
+
+
+def transaction_rows(count: int, customers: int, seed: int = 7):
+    rnd = random.Random(seed + 1).random
+    credits, debits = TRANSACTION_TYPES["credit"], TRANSACTION_TYPES["debit"]
+    for transaction_id in range(1, count + 1):
+        if rnd() < 0.2:
+            kind, amount, description = "credit", round(500 + 4500 * rnd(), 2), credits[int(rnd() * len(credits))]
+        else:
+            kind, amount, description = "debit", round(2 + 798 * rnd(), 2), debits[int(rnd() * len(debits))]
+        yield (transaction_id, 1 + int(rnd() * customers), amount, kind, description,
+               f"2025-{DAYS[int(rnd() * len(DAYS))]} {TIMES[int(rnd() * len(TIMES))]}")
+
+
+def batches(rows, size: int = BATCH_ROWS):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+def _timed(stats: list, step: str, rows: int, work):
+    start = time.perf_counter()
+    work()
+    stats.append((step, rows, time.perf_counter() - start))
+
+
+def insert_sqlite(conn, table: str, columns: tuple, rows) -> int:
+    """Inserts rows with `executemany`, one batch at a time, in the caller's transaction."""
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    count = 0
+    for batch in batches(rows):
+        conn.executemany(statement, batch)
+        count += len(batch)
+    return count
+
+
+def copy_postgres(cur, table: str, columns: tuple, rows) -> int:
+    """Streams rows into a Postgres table with COPY, one CSV batch at a time."""
+    count = 0
+    for batch in batches(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        count += len(batch)
+    return count
+
+
+def load_sqlite(conn, transactions: int, seed: int = 7) -> list:
+    """
+    Recreates and fills the bank tables on an open SQLite connection. Returns
+    `(step, rows, seconds)` per load step. The caller commits.
+    """
+    stats = []
+    customers = customer_count(transactions)
+    for statement in schema_statements("sqlite"):
+        conn.execute(statement)
+    if transactions:
+        _timed(stats, "customers", customers,
+               lambda: insert_sqlite(conn, "customers", CUSTOMER_COLUMNS, customer_rows(customers, seed)))
+        _timed(stats, "transactions", transactions,
+               lambda: insert_sqlite(conn, "transactions", TRANSACTION_COLUMNS,
+                                     transaction_rows(transactions, customers, seed)))
+    else:
+        _timed(stats, "sample rows", 0, lambda: [conn.execute(s) for s in sample_statements()])
+    _timed(stats, "indexes", 0, lambda: [conn.execute(s) for s in POST_LOAD_STATEMENTS["sqlite"]])
+    return stats
+
+
+def load_postgres(conn, transactions: int, seed: int = 7) -> list:
+    """Recreates and fills the bank tables through a psycopg2 connection, and commits."""
+    stats = []
+    customers = customer_count(transactions)
+    with conn.cursor() as cur:
+        for statement in schema_statements("postgres"):
+            cur.execute(statement)
+        if transactions:
+            _timed(stats, "customers", customers,
+                   lambda: copy_postgres(cur, "customers", CUSTOMER_COLUMNS, customer_rows(customers, seed)))
+            _timed(stats, "transactions", transactions,
+                   lambda: copy_postgres(cur, "transactions", TRANSACTION_COLUMNS,
+                                         transaction_rows(transactions, customers, seed)))
+        else:
+            _timed(stats, "sample rows", 0, lambda: [cur.execute(s) for s in sample_statements()])
+        _timed(stats, "indexes", 0, lambda: [cur.execute(s) for s in POST_LOAD_STATEMENTS["postgres"]])
+    conn.commit()
+    return stats
+
+
+def format_stats(stats: list) -> str:
+    """One line per load step with its throughput, and the total."""
+    lines = []
+    for step, rows, seconds in stats:
+        rate = f", {rows / seconds:,.0f} rows/s" if rows and seconds else ""
+        lines.append(f"  {step:<14} {rows:>12,} rows in {seconds:7.2f}s{rate}")
+    rows, seconds = sum(s[1] for s in stats), sum(s[2] for s in stats)
+    lines.append(f"  {'total':<14} {rows:>12,} rows in {seconds:7.2f}s" + (f", {rows / seconds:,.0f} rows/s" if rows and seconds else ""))
+    return "\n".join(lines)
@@ -1,11 +1,17 @@
-
+import argparse
 import os
 import psycopg2
 from dotenv import load_dotenv
 
+from scripts.bank_data import format_stats, load_postgres
+
 load_dotenv()
 
-def populate_db():
+def populate_db(transactions: int = 0, seed: int = 7):
+    """
+    Creates the bank tables in Postgres and populates them, either with the sample rows of
+    sql/schema.sql or with `transactions` generated transactions loaded with COPY.
+    """
     conn = None
     try:
         conn = psycopg2.connect(
@@ -15,10 +21,8 @@ def populate_db():
             password=os.getenv("DB_PASSWORD", "postgres"),
             port=os.getenv("DB_PORT", "5432")
         )
-        cur = conn.cursor()
-        with open("sql/schema.sql", "r") as f:
-            cur.execute(f.read())
-        conn.commit()
+        stats = load_postgres(conn, transactions, seed)
+        print(format_stats(stats))
         print("Database populated successfully.")
     except (Exception, psycopg2.DatabaseError) as error:
         print(error)
@@ -27,4 +31,9 @@ def populate_db():
             conn.close()
 
 if __name__ == "__main__":
-    populate_db()
+    parser = argparse.ArgumentParser(description="Create and populate the bank tables in Postgres.")
+    parser.add_argument("--transactions", type=int, default=0,
+                        help="Generate this many transactions (one customer per ten). Default: the sample rows of schema.sql.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    populate_db(args.transactions, args.seed)
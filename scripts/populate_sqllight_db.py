@@ -1,40 +1,45 @@
+import argparse
 import sqlite3
 import os
 
+from scripts.bank_data import SCHEMA_FILE, format_stats, load_sqlite
+
 # Define the name for your SQLite database file
 DB_FILE = "mydatabase.db"
-# Define the path to your SQL schema file
-SCHEMA_FILE = os.path.join("sql", "schema.sql")
 
-def populate_db():
+def populate_db(db_file: str = DB_FILE, transactions: int = 0, seed: int = 7):
     """
-    Connects to an SQLite database, creates the schema from an SQL file,
-    and populates it.
+    Creates the schema from the SQL file in an SQLite database and populates it, either
+    with the sample rows of the SQL file or with `transactions` generated transactions.
     """
-    # Check if the database file already exists. If so, you might want to delete it
+    # Check if the database file already exists. If so, delete it
     # to start with a fresh database each time the script is run.
-    if os.path.exists(DB_FILE):
-        print(f"Database file '{DB_FILE}' already exists. Removing it to start fresh.")
-        os.remove(DB_FILE)
+    if os.path.exists(db_file):
+        print(f"Database file '{db_file}' already exists. Removing it to start fresh.")
+        os.remove(db_file)
 
     conn = None
     try:
         # sqlite3.connect() will create the database file if it doesn't exist.
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        print(f"Connected to SQLite database: {DB_FILE}")
+        conn = sqlite3.connect(db_file)
+        print(f"Connected to SQLite database: {db_file}")
 
-        # Read the schema from the .sql file
-        print(f"Reading schema from '{SCHEMA_FILE}'...")
-        with open(SCHEMA_FILE, "r") as f:
-            sql_script = f.read()
+        # Load settings: a write-ahead log and no fsync per write, with a large page cache
+        # for building the indexes. A crash mid-load only loses this freshly created file.
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
 
-        # Use executescript() to run multiple SQL statements at once
-        cur.executescript(sql_script)
-        print("Successfully executed SQL script.")
+        print(f"Loading the schema from '{SCHEMA_FILE}' and "
+              + (f"{transactions:,} generated transactions..." if transactions else "its sample rows..."))
+        # All rows go in one transaction; the indexes are built after the rows.
+        with conn:
+            stats = load_sqlite(conn, transactions, seed)
+        print(format_stats(stats))
 
-        # Commit the changes to the database
-        conn.commit()
+        # Back to a rollback journal, so the database is a single file that can also be
+        # opened read-only (e.g. by federated queries).
+        conn.execute("PRAGMA journal_mode = DELETE")
         print("Database populated successfully.")
 
     except sqlite3.Error as error:
@@ -54,8 +59,15 @@ def populate_db():
             print("SQLite connection closed.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and populate the local SQLite bank database.")
+    parser.add_argument("--transactions", type=int, default=0,
+                        help="Generate this many transactions (one customer per ten). Default: the sample rows of schema.sql.")
+    parser.add_argument("--db", default=DB_FILE, help="The SQLite database file.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
     # Ensure the 'sql' directory exists before running
     if not os.path.isdir("sql"):
         print("Error: 'sql' directory not found. Please create it and add your schema.sql file.")
     else:
-        populate_db()
+        populate_db(args.db, args.transactions, args.seed)
@@ -0,0 +1,117 @@
+"""
+Summarizes the traces written by data_agent.tracing (DATA_AGENT_TRACE_FILE): latency
+percentiles per span name (each tool, each LLM model, each agent) and per turn, so the hot
+paths of a chat turn stand out.
+
+    python -m scripts.trace_report traces/spans.jsonl [--sort total|p95|count] [--last 100]
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+
+def percentile(values: list, fraction: float) -> float:
+    """The nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(fraction * len(values) + 0.5) - 1))]
+
+
+def _attribute(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return value["doubleValue"]
+    if "boolValue" in value:
+        return value["boolValue"]
+    return value.get("stringValue")
+
+
+def read_turns(path: str) -> list:
+    """Returns one list of spans per exported turn, each span as a flat dict."""
+    turns = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                export = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed line {line_number}.", file=sys.stderr)
+                continue
+            spans = []
+            for resource in export.get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        spans.append({
+                            "name": span["name"],
+                            "parent": span.get("parentSpanId"),
+                            "ms": (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6,
+                            "error": span.get("status", {}).get("code") == 2,
+                            **{a["key"]: _attribute(a["value"]) for a in span.get("attributes", [])},
+                        })
+            if spans:
+                turns.append(spans)
+    return turns
+
+
+def summarize(turns: list) -> dict:
+    """Groups span durations and result sizes by span name ('turn' for whole turns)."""
+    groups = defaultdict(lambda: {"ms": [], "errors": 0, "bytes": [], "rows": [], "input_tokens": []})
+    for spans in turns:
+        for span in spans:
+            names = [span["name"]] + (["turn"] if span["parent"] is None else [])
+            for name in names:
+                group = groups[name]
+                group["ms"].append(span["ms"])
+                group["errors"] += span["error"]
+                for key, attribute in (("bytes", "data_agent.result.bytes"), ("rows", "data_agent.result.rows"),
+                                       ("input_tokens", "gen_ai.usage.input_tokens")):
+                    if span.get(attribute) is not None:
+                        group[key].append(span[attribute])
+    for group in groups.values():
+        group["ms"].sort()
+    return groups
+
+
+def _mean(values: list) -> str:
+    return f"{sum(values) / len(values):,.0f}" if values else "-"
+
+
+def format_report(groups: dict, turn_count: int, sort: str = "total") -> str:
+    keys = {
+        "total": lambda item: -sum(item[1]["ms"]),
+        "p95": lambda item: -percentile(item[1]["ms"], 0.95),
+        "count": lambda item: -len(item[1]["ms"]),
+    }
+    header = f"{'span':<42} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'total s':>8} " \
+             f"{'avg bytes':>10} {'avg rows':>9} {'avg in tok':>10}"
+    lines = [f"{turn_count} turns", header, "-" * len(header)]
+    for name, group in sorted(groups.items(), key=keys[sort]):
+        durations = group["ms"]
+        lines.append(
+            f"{name[:42]:<42} {len(durations):>6} {group['errors']:>4} {percentile(durations, 0.5):>9,.0f} "
+            f"{percentile(durations, 0.95):>9,.0f} {durations[-1]:>9,.0f} {sum(durations) / 1000:>8,.1f} "
+            f"{_mean(group['bytes']):>10} {_mean(group['rows']):>9} {_mean(group['input_tokens']):>10}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=os.getenv("DATA_AGENT_TRACE_FILE", "traces/spans.jsonl"))
+    parser.add_argument("--sort", choices=("total", "p95", "count"), default="total")
+    parser.add_argument("--last", type=int, default=0, help="Only the last N turns.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        sys.exit(f"Trace file '{args.path}' not found. Set DATA_AGENT_TRACE_FILE when running the app.")
+    turns = read_turns(args.path)
+    if args.last:
+        turns = turns[-args.last:]
+    print(format_report(summarize(turns), len(turns), args.sort))
+
+
+if __name__ == "__main__":
+    main()